@@ -0,0 +1,55 @@
+"""
+Time of every layout statistic over a large synthetic population of
+players, with popular layouts repeated as in real data. Needs the optional
+numpy dependency.
+
+Usage: `uv run --extra numpy python benchmarks/bench_analytics.py [--players 1000000]`
+"""
+
+import time
+
+import click
+import numpy as np
+
+from bedwarsshop import analytics
+from bedwarsshop.layout import Layout, items
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+@click.command()
+@click.option("--players", default=1_000_000, show_default=True)
+@click.option("--seed", default=0, show_default=True)
+def main(players, seed):
+    rng = np.random.default_rng(seed)
+    # popular items show up in most shops, as in real player data
+    weights = 1 / np.arange(1, len(items) + 1)
+    matrix = rng.choice(len(items), (players, 21), p=weights / weights.sum())
+    matrix = matrix.astype(np.uint8)
+    matrix[rng.random(players) < 0.2] = matrix[0]
+
+    favourites = [
+        ",".join(name for row in Layout(slots.tobytes()) for name in row)
+        for slots in matrix[:100_000]
+    ]
+    encode_s = timed(lambda: [Layout.from_favourites(f) for f in favourites])
+    click.echo(f"players:        {players}")
+    click.echo(f"encoding:       {encode_s / len(favourites) * 1e6:.1f} us/layout")
+    for name in [
+        "item_frequency",
+        "slot_heatmap",
+        "slot_leaders",
+        "co_occurrence",
+        "top_pairs",
+        "top_layouts",
+    ]:
+        seconds = timed(getattr(analytics, name), matrix)
+        click.echo(f"{name + ':':<15} {seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Wall time to resolve many players sequentially with get_player_data versus
+the asyncio pipeline, against the local stand-in API with simulated latency.
+
+Usage: `uv run python -m benchmarks.bench_async_fetch [--players 500]`
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import click
+
+from bedwarsshop import constants as c
+from bedwarsshop import helpers
+from bedwarsshop.client import get_client, get_mojang_client
+from bedwarsshop.pipeline import stream_layouts
+from tests.fakeapi import FakeHypixel
+
+
+def sequential(names):
+    for name in names:
+        helpers.parse_player_data(helpers.get_player_data(name))
+
+
+async def concurrent(names, limit):
+    async for _ in stream_layouts(names, limit):
+        pass
+
+
+@click.command()
+@click.option("--players", default=500, show_default=True)
+@click.option("--latency", default=0.02, show_default=True, help="Seconds.")
+@click.option("--limit", default=c.FETCH_CONCURRENCY, show_default=True)
+def main(players, latency, limit):
+    with (
+        tempfile.TemporaryDirectory() as tmp,
+        FakeHypixel(latency=latency, quota=10**9) as api,
+    ):
+        os.chdir(tmp)
+        Path("cache").mkdir()
+        c.API_URL = api.url
+        c.MOJANG_API_URL = api.mojang_url
+        c.API_RATE_LIMIT = c.API_RATE_PERIOD = 10**9
+        c.MOJANG_RATE_LIMIT = c.MOJANG_RATE_PERIOD = 10**9
+        helpers.API_KEY = "benchmark"
+        get_client.cache_clear()
+        get_mojang_client.cache_clear()
+
+        start = time.perf_counter()
+        sequential([f"seq{i}" for i in range(players)])
+        sequential_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        asyncio.run(concurrent([f"async{i}" for i in range(players)], limit))
+        async_s = time.perf_counter() - start
+
+    click.echo(f"players:    {players} at {latency * 1000:.0f} ms latency")
+    click.echo(f"sequential: {sequential_s:.2f}s ({players / sequential_s:.0f}/s)")
+    click.echo(f"async:      {async_s:.2f}s ({players / async_s:.0f}/s), limit {limit}")
+    click.echo(f"speed-up:   {sequential_s / async_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Per-image cost of the shop background and grid, before and after caching
+the grid overlay.
+
+Usage: `uv run python benchmarks/bench_base_layer.py [--renders 300]`
+"""
+
+import time
+
+import click
+from PIL import Image, ImageChops, ImageDraw
+
+from bedwarsshop import constants as c
+from bedwarsshop.atlas import icon_atlas
+from bedwarsshop.render import draw_grid, new_canvas
+
+LAYOUT = [
+    ["stone_sword", "bridge_egg", "null", "bow", "arrow", "tnt", "end_stone"],
+    ["iron_sword", "null", "null", "wooden_pickaxe", "water_bucket", "ladder", "null"],
+    ["wool", "golden_apple", "magic_milk", "null", "diamond_boots", "null", "null"],
+]
+
+
+def paste_icons(image, icons):
+    for y, row in enumerate(LAYOUT):
+        for x, item in enumerate(row):
+            if item in icons:
+                image.paste(icons[item], (x * 320, y * 320))
+
+
+def render_before(icons):
+    """The previous approach: fresh canvas, grid drawn line by line."""
+    image = Image.new(mode="RGBA", size=(7 * 320, 3 * 320), color=c.BACKGROUND_COLOR)
+    draw = ImageDraw.Draw(image)
+    paste_icons(image, icons)
+    for x in range(0, 7):
+        draw.line((x * 320, 0, x * 320, 3 * 320), fill=c.LINE_COLOR, width=c.LINE_WIDTH)
+    draw.line(
+        (7 * 320 - c.LINE_WIDTH, 0, 7 * 320 - c.LINE_WIDTH, 3 * 320),
+        fill=c.LINE_COLOR,
+        width=c.LINE_WIDTH,
+    )
+    for y in range(0, 3):
+        draw.line((0, y * 320, 7 * 320, y * 320), fill=c.LINE_COLOR, width=c.LINE_WIDTH)
+    draw.line(
+        (0, 3 * 320 - c.LINE_WIDTH, 7 * 320, 3 * 320 - c.LINE_WIDTH),
+        fill=c.LINE_COLOR,
+        width=c.LINE_WIDTH,
+    )
+    return image
+
+
+def render_after(icons):
+    """The cached approach: filled canvas, grid overlay composited once."""
+    image = new_canvas()
+    paste_icons(image, icons)
+    draw_grid(image)
+    return image
+
+
+def per_image(render, icons, renders):
+    start = time.perf_counter()
+    for _ in range(renders):
+        render(icons)
+    return (time.perf_counter() - start) / renders
+
+
+@click.command()
+@click.option("--renders", default=300, show_default=True, help="Renders per run.")
+def main(renders):
+    icons = icon_atlas()
+    before, after = render_before(icons), render_after(icons)
+    assert ImageChops.difference(before, after).getbbox() is None
+
+    before_s = per_image(render_before, icons, renders)
+    after_s = per_image(render_after, icons, renders)
+    click.echo(f"renders:  {renders}")
+    click.echo(f"before:   {before_s * 1000:.3f} ms/image")
+    click.echo(f"after:    {after_s * 1000:.3f} ms/image")
+    click.echo(f"speed-up: {before_s / after_s:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
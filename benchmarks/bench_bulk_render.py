@@ -0,0 +1,62 @@
+"""
+Shops per second of the Pillow renderer (one render_shop call per shop)
+versus the NumPy renderer (one render_shops call per batch), at several batch
+sizes. Needs the optional numpy dependency. A batch of 256 shops is a 2.2 GB
+array, so make sure there is enough memory.
+
+Usage: `uv run --extra numpy python benchmarks/bench_bulk_render.py`
+"""
+
+import time
+from functools import partial
+
+import click
+import numpy as np
+from bench_tile_cache import random_layouts
+
+from bedwarsshop.bulkrender import render_shops, shop_shape
+from bedwarsshop.helpers import render_shop
+
+
+def shops_per_second(render, layouts, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        render(layouts)
+    return len(layouts) * rounds / (time.perf_counter() - start)
+
+
+@click.command()
+@click.option(
+    "--batch-size",
+    "batch_sizes",
+    multiple=True,
+    type=int,
+    default=[1, 32, 256],
+    show_default=True,
+)
+@click.option("--shops", default=256, show_default=True, help="Shops per size.")
+@click.option("--seed", default=0, show_default=True)
+def main(batch_sizes, shops, seed):
+    for batch_size in batch_sizes:
+        layouts = random_layouts(batch_size, seed)
+        rounds = max(1, shops // batch_size)
+        shops_array = render_shops(layouts)
+        for shop, layout in zip(shops_array, layouts, strict=True):
+            assert np.array_equal(shop, np.asarray(render_shop(layout)))
+        del shops_array
+
+        pillow = shops_per_second(
+            lambda batch: [render_shop(layout) for layout in batch], layouts, rounds
+        )
+        fresh = shops_per_second(render_shops, layouts, rounds)
+        out = np.empty((batch_size, *shop_shape()), np.uint8)
+        reused = shops_per_second(partial(render_shops, out=out), layouts, rounds)
+        del out
+        click.echo(
+            f"batch {batch_size:>4}: pillow {pillow:7.1f}/s, "
+            f"numpy {fresh:7.1f}/s, numpy reusing its array {reused:7.1f}/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Slot diffs of many snapshot pairs, as nested lists and as compact Layouts,
+and the cost of a diff image against a full render of the new layout.
+
+Usage: `uv run python benchmarks/bench_diff.py [--pairs 100000]`
+"""
+
+import random
+import time
+
+import click
+
+from bedwarsshop import constants as c
+from bedwarsshop.batch import warm_caches
+from bedwarsshop.diff import diff_layouts, diff_many, draw_changes, render_diff
+from bedwarsshop.helpers import render_shop
+from bedwarsshop.layout import Layout
+
+ITEMS = list(c.ICONS_DICT)
+
+
+def next_snapshot(layout, rng):
+    """A copy of a layout, most of the time with a few moves or changes."""
+    slots = [name for row in layout for name in row]
+    for _ in range(rng.choice([0, 0, 1, 1, 2, 3])):
+        i, j = rng.sample(range(21), 2)
+        roll = rng.random()
+        if roll < 0.5:
+            slots[i], slots[j] = slots[j], slots[i]
+        elif roll < 0.8:
+            slots[i] = rng.choice(ITEMS)
+        else:
+            slots[i] = "null"
+    return [slots[k : k + 7] for k in range(0, 21, 7)]
+
+
+def snapshot_pairs(count, rng):
+    """Random layouts and their next snapshot."""
+    pairs = []
+    for _ in range(count):
+        old = [rng.choices(ITEMS, k=7) for _ in range(3)]
+        pairs.append((old, next_snapshot(old, rng)))
+    return pairs
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+@click.command()
+@click.option("--pairs", default=100_000, show_default=True)
+@click.option("--renders", default=200, show_default=True)
+@click.option("--references", default=5, show_default=True)
+@click.option("--seed", default=0, show_default=True)
+def main(pairs, renders, references, seed):
+    rng = random.Random(seed)
+    lists = snapshot_pairs(pairs, rng)
+    layouts = [(Layout.from_rows(old), Layout.from_rows(new)) for old, new in lists]
+    click.echo(f"pairs:          {pairs}")
+    for name, data in [("lists", lists), ("Layouts", layouts)]:
+        seconds = timed(lambda data=data: list(diff_many(data)))
+        click.echo(
+            f"diff {name + ':':<10} {seconds:.2f}s ({pairs / seconds:,.0f} pairs/s)"
+        )
+
+    warm_caches()
+    # several snapshots compared with one reference layout each, such as the
+    # layout of a player at the start of a season
+    sample = [
+        (reference, next_snapshot(reference, rng))
+        for reference, _ in lists[:references]
+        for _ in range(renders // references)
+    ]
+
+    def full():
+        for old, new in sample:
+            draw_changes(render_shop(new), diff_layouts(old, new))
+
+    def cached():
+        for old, new in sample:
+            render_diff(old, new)
+
+    cached()
+    click.echo(f"full render:    {timed(full) / len(sample) * 1000:.2f} ms/image")
+    click.echo(f"render_diff:    {timed(cached) / len(sample) * 1000:.2f} ms/image")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Encode time and file size of a shop image for every cell size and encoder
+setting that can be picked per run.
+
+Usage: `uv run python benchmarks/bench_encoders.py [--cell-size 320 --cell-size 80]`
+"""
+
+import io
+import time
+
+import click
+
+from bedwarsshop import constants as c
+from bedwarsshop.helpers import encode_image, render_shop
+
+LAYOUT = [
+    ["stone_sword", "bridge_egg", "null", "bow", "arrow", "tnt", "end_stone"],
+    ["iron_sword", "null", "null", "wooden_pickaxe", "water_bucket", "ladder", "null"],
+    ["wool", "golden_apple", "magic_milk", "null", "diamond_boots", "null", "null"],
+]
+
+ENCODERS = [
+    ("png level 1", "png", {"PNG_COMPRESS_LEVEL": 1}),
+    ("png level 6", "png", {"PNG_COMPRESS_LEVEL": 6}),
+    ("png level 9", "png", {"PNG_COMPRESS_LEVEL": 9}),
+    ("png optimize", "png", {"PNG_OPTIMIZE": True}),
+    ("webp method 0", "webp", {"WEBP_METHOD": 0}),
+    ("webp method 4", "webp", {"WEBP_METHOD": 4}),
+    ("webp method 6", "webp", {"WEBP_METHOD": 6}),
+    ("png8 level 6", "png8", {"PNG_COMPRESS_LEVEL": 6}),
+]
+DEFAULTS = {"PNG_COMPRESS_LEVEL": 6, "PNG_OPTIMIZE": False, "WEBP_METHOD": 0}
+
+
+def encode(image, image_format, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        buffer = io.BytesIO()
+        encode_image(image, buffer, image_format)
+    return (time.perf_counter() - start) / rounds, buffer.tell()
+
+
+@click.command()
+@click.option(
+    "--cell-size",
+    "cell_sizes",
+    multiple=True,
+    type=int,
+    default=[320, 160, 80],
+    show_default=True,
+)
+@click.option("--rounds", default=5, show_default=True, help="Encodes per setting.")
+def main(cell_sizes, rounds):
+    for cell_size in cell_sizes:
+        c.CELL_SIZE = cell_size
+        image = render_shop(LAYOUT)
+        click.echo(f"{image.width}x{image.height} ({cell_size} px cells)")
+        for name, image_format, settings in ENCODERS:
+            for setting, value in {**DEFAULTS, **settings}.items():
+                setattr(c, setting, value)
+            seconds, size = encode(image, image_format, rounds)
+            click.echo(f"  {name:<14} {seconds * 1000:8.1f} ms {size / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Write, open, point-in-time lookup and full scan rates of the snapshot
+history, with the bytes stored per snapshot.
+
+Usage: `uv run python benchmarks/bench_history.py [--players 100000 --snapshots 10]`
+"""
+
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import click
+
+from bedwarsshop import constants as c
+from bedwarsshop.history import SnapshotStore
+
+
+def rate(count, seconds):
+    return f"{seconds:.2f}s ({count / seconds:,.0f}/s)"
+
+
+@click.command()
+@click.option("--players", default=100_000, show_default=True)
+@click.option("--snapshots", default=10, show_default=True)
+@click.option("--lookups", default=100_000, show_default=True)
+@click.option("--seed", default=0, show_default=True)
+def main(players, snapshots, lookups, seed):
+    rng = random.Random(seed)
+    items = list(c.ICONS_DICT)
+    names = [f"player_{i}" for i in range(players)]
+    layouts = {name: rng.choices(items, k=21) for name in names}
+    total = players * snapshots
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = SnapshotStore(directory)
+        start = time.perf_counter()
+        for timestamp in range(snapshots):
+            for name in names:
+                slots = layouts[name]
+                # a move and a new item, as in real snapshots that changed
+                i, j = rng.sample(range(21), 2)
+                slots[i], slots[j] = slots[j], rng.choice(items)
+                rows = [slots[0:7], slots[7:14], slots[14:21]]
+                store.record(name, rows, 1_700_000_000 + timestamp * 3600)
+        click.echo(f"write:          {rate(total, time.perf_counter() - start)}")
+        store.close()
+        size = sum(path.stat().st_size for path in Path(directory).iterdir())
+        click.echo(
+            f"size:           {size / 2**20:.1f} MiB, {size / total:.1f} bytes/snapshot"
+        )
+
+        store = SnapshotStore(directory)
+        start = time.perf_counter()
+        for index in range(store.shard_count):
+            store._shard(index)
+        click.echo(f"open (index):   {rate(total, time.perf_counter() - start)}")
+
+        start = time.perf_counter()
+        for _ in range(lookups):
+            timestamp = 1_700_000_000 + rng.randrange(snapshots * 3600)
+            store.at(rng.choice(names), timestamp)
+        click.echo(f"lookup:         {rate(lookups, time.perf_counter() - start)}")
+
+        start = time.perf_counter()
+        scanned = sum(1 for _ in store.scan())
+        click.echo(f"scan:           {rate(scanned, time.perf_counter() - start)}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
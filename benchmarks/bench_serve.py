@@ -0,0 +1,109 @@
+"""
+Load test of `bedwarsshop serve`: many clients request shop images of a few
+hot players at once, and the latency percentiles are reported. By default a
+server is started in process against the local stand-in API; pass --url to
+load an already running server instead.
+
+Usage: `uv run python -m benchmarks.bench_serve [--requests 2000 --clients 32]`
+"""
+
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+
+import click
+import requests
+
+from bedwarsshop import constants as c
+from bedwarsshop import helpers
+from bedwarsshop.client import get_client, get_mojang_client
+from bedwarsshop.server import ShopServer
+from tests.fakeapi import FakeHypixel
+
+
+def percentile(latencies, fraction):
+    return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+
+def load(url, names, count, clients, conditional, seed):
+    local = threading.local()
+    etags = {}
+    rng = random.Random(seed)
+    paths = [f"/shop/{rng.choice(names)}.png" for _ in range(count)]
+
+    def request(path):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        headers = (
+            {"If-None-Match": etags[path]} if conditional and path in etags else {}
+        )
+        start = time.perf_counter()
+        response = local.session.get(url + path, headers=headers, timeout=60)
+        latency = time.perf_counter() - start
+        if "ETag" in response.headers:
+            etags[path] = response.headers["ETag"]
+        return latency, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        results = list(pool.map(request, paths))
+    return results, time.perf_counter() - start
+
+
+@click.command()
+@click.option("--url", help="Server to load, instead of starting one.")
+@click.option("--requests", "count", default=2000, show_default=True)
+@click.option("--clients", default=32, show_default=True, help="Concurrent clients.")
+@click.option("--players", default=20, show_default=True, help="Distinct players.")
+@click.option("--workers", default=c.SERVE_WORKERS, show_default=True)
+@click.option("--latency", default=0.05, show_default=True, help="API seconds.")
+@click.option(
+    "--conditional",
+    is_flag=True,
+    help="Send the last ETag seen for a path as If-None-Match.",
+)
+@click.option("--seed", default=0, show_default=True)
+def main(url, count, clients, players, workers, latency, conditional, seed):
+    names = [f"player{i}" for i in range(players)]
+    with ExitStack() as stack:
+        server = None
+        if url is None:
+            tmp = stack.enter_context(tempfile.TemporaryDirectory())
+            os.chdir(tmp)
+            Path("cache").mkdir()
+            api = stack.enter_context(FakeHypixel(latency=latency, quota=10**9))
+            c.API_URL = api.url
+            c.MOJANG_API_URL = api.mojang_url
+            c.API_RATE_LIMIT = c.API_RATE_PERIOD = 10**9
+            c.MOJANG_RATE_LIMIT = c.MOJANG_RATE_PERIOD = 10**9
+            helpers.API_KEY = "benchmark"
+            get_client.cache_clear()
+            get_mojang_client.cache_clear()
+            server = stack.enter_context(ShopServer(port=0, workers=workers))
+            url = server.url
+        results, elapsed = load(url, names, count, clients, conditional, seed)
+
+    latencies = sorted(latency for latency, _ in results)
+    statuses = {}
+    for _, status in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    click.echo(f"requests:   {count} from {clients} clients over {players} players")
+    click.echo(f"throughput: {count / elapsed:.0f} requests/s")
+    click.echo(f"statuses:   {dict(sorted(statuses.items()))}")
+    click.echo(f"p50:        {percentile(latencies, 0.50) * 1000:.1f} ms")
+    click.echo(f"p99:        {percentile(latencies, 0.99) * 1000:.1f} ms")
+    click.echo(f"max:        {latencies[-1] * 1000:.1f} ms")
+    if server is not None:
+        click.echo(
+            f"server:     {server.fetches} fetches, {server.renders} renders, "
+            f"{server.coalesced} coalesced"
+        )
+
+
+if __name__ == "__main__":
+    main()
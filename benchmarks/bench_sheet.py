@@ -0,0 +1,50 @@
+"""
+Time and peak memory of streaming a sheet of many shops to a PNG, against
+the size the whole canvas would take in memory.
+
+Usage: `uv run python benchmarks/bench_sheet.py [--players 2000 --cell-size 40]`
+"""
+
+import random
+import resource
+import tempfile
+import time
+
+import click
+
+from bedwarsshop import constants as c
+from bedwarsshop.batch import warm_caches
+from bedwarsshop.sheet import sheet_geometry, write_sheet
+
+
+@click.command()
+@click.option("--players", default=2000, show_default=True)
+@click.option("--cell-size", default=40, show_default=True)
+@click.option("--columns", default=c.SHEET_COLUMNS, show_default=True)
+@click.option("--seed", default=0, show_default=True)
+def main(players, cell_size, columns, seed):
+    c.CELL_SIZE = cell_size
+    rng = random.Random(seed)
+    items = [*c.ICONS_DICT, "null"]
+    sheet_players = [
+        (f"player_{i}", [rng.choices(items, k=7) for _ in range(3)])
+        for i in range(players)
+    ]
+    warm_caches()
+    (width, height), _, _ = sheet_geometry(players, columns)
+
+    with tempfile.TemporaryFile() as f:
+        start = time.perf_counter()
+        write_sheet(sheet_players, f, columns)
+        seconds = time.perf_counter() - start
+        size = f.tell()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    click.echo(f"sheet:          {width}x{height}, {size / 2**20:.1f} MiB PNG")
+    click.echo(f"time:           {seconds:.2f}s ({players / seconds:.0f} players/s)")
+    click.echo(f"peak RSS:       {peak:.0f} MiB")
+    click.echo(f"whole canvas:   {width * height * 4 / 2**20:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
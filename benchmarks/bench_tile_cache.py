@@ -0,0 +1,94 @@
+"""
+Per-image cost of the shop render with and without the slot tile cache, over
+a realistic mix of layouts: mostly known items, some empty slots and a few
+items without an icon.
+
+Usage: `uv run python benchmarks/bench_tile_cache.py [--layouts 500]`
+"""
+
+import random
+import time
+
+import click
+from PIL import ImageChops
+
+from bedwarsshop import constants as c
+from bedwarsshop.atlas import icon_atlas
+from bedwarsshop.helpers import render_shop
+from bedwarsshop.render import draw_grid, draw_label, new_canvas, slot_tiles
+
+
+def random_layouts(count, seed):
+    rng = random.Random(seed)
+    items = list(c.ICONS_DICT)
+    # popular items show up in most shops, as in real player data
+    weights = [1 / (rank + 1) for rank in range(len(items))]
+    layouts = []
+    for _ in range(count):
+        layout = []
+        for _ in range(3):
+            row = []
+            for _ in range(7):
+                roll = rng.random()
+                if roll < 0.2:
+                    row.append("null")
+                elif roll < 0.23:
+                    row.append(f"unknown_item_{rng.randrange(5)}")
+                else:
+                    row.append(rng.choices(items, weights)[0])
+            layout.append(row)
+        layouts.append(layout)
+    return layouts
+
+
+def render_uncached(layout):
+    """The previous approach: icon paste and label composite per slot."""
+    image = new_canvas()
+    icons = icon_atlas()
+    for y, row in enumerate(layout):
+        for x, item in enumerate(row):
+            if item == "null":
+                continue
+            icon = icons.get(item)
+            if icon is not None:
+                image.paste(icon, (x * 320, y * 320))
+            draw_label(image, item, x, y)
+    draw_grid(image)
+    return image
+
+
+def per_image(render, layouts):
+    start = time.perf_counter()
+    for layout in layouts:
+        render(layout)
+    return (time.perf_counter() - start) / len(layouts)
+
+
+@click.command()
+@click.option("--layouts", default=500, show_default=True, help="Shops to render.")
+@click.option("--seed", default=0, show_default=True)
+def main(layouts, seed):
+    layouts = random_layouts(layouts, seed)
+    for layout in layouts[:20]:
+        difference = ImageChops.difference(render_uncached(layout), render_shop(layout))
+        assert difference.getbbox() is None
+
+    before_s = per_image(render_uncached, layouts)
+    after_s = per_image(render_shop, layouts)
+    stats = slot_tiles.stats()
+    click.echo(f"layouts:    {len(layouts)}")
+    click.echo(f"uncached:   {before_s * 1000:.3f} ms/image")
+    click.echo(f"tile cache: {after_s * 1000:.3f} ms/image")
+    click.echo(f"speed-up:   {before_s / after_s:.2f}x")
+    click.echo(
+        f"tiles:      {stats['entries']} cached, {stats['hits']} hits, "
+        f"{stats['misses']} misses, {stats['evictions']} evictions"
+    )
+    click.echo(
+        f"memory:     {stats['bytes'] / 2**20:.1f} MiB "
+        f"of {stats['max_bytes'] / 2**20:.0f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+API requests of a bulk lookup whose names include case variants and renamed
+players, against the local stand-in APIs, and the rate at which names are
+resolved through the uuid index afterwards.
+
+Usage: `uv run python -m benchmarks.bench_uuids [--players 2000]`
+"""
+
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import click
+
+from bedwarsshop import constants as c
+from bedwarsshop import helpers
+from bedwarsshop.client import get_client, get_mojang_client
+from bedwarsshop.uuids import resolve_uuids
+from tests.fakeapi import FakeHypixel, player_uuid
+
+
+@click.command()
+@click.option("--players", default=2000, show_default=True)
+@click.option("--seed", default=0, show_default=True)
+def main(players, seed):
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp, FakeHypixel(quota=10**9) as api:
+        os.chdir(tmp)
+        Path("cache").mkdir()
+        c.API_URL = api.url
+        c.MOJANG_API_URL = api.mojang_url
+        c.API_RATE_LIMIT = c.API_RATE_PERIOD = 10**9
+        c.MOJANG_RATE_LIMIT = c.MOJANG_RATE_PERIOD = 10**9
+        helpers.API_KEY = "benchmark"
+        get_client.cache_clear()
+        get_mojang_client.cache_clear()
+
+        # every player under their name, its upper case and a new name
+        names = []
+        for i in range(players):
+            name = f"player_{i}"
+            api.uuids[f"renamed_{i}"] = player_uuid(name)
+            names += [name, name.upper(), f"renamed_{i}"]
+        rng.shuffle(names)
+
+        start = time.perf_counter()
+        cached = helpers.get_cached_player_data(names)
+        for name in names:
+            if name not in cached:
+                helpers.get_player_data(name)
+        fetch_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(0, len(names), 1000):
+            resolve_uuids(names[i : i + 1000])
+        resolve_s = time.perf_counter() - start
+
+    click.echo(f"names:           {len(names)} of {players} players")
+    click.echo(f"player requests: {len(api.requests)}")
+    click.echo(f"name lookups:    {len(api.lookups)} requests")
+    click.echo(f"lookup time:     {fetch_s:.2f}s")
+    click.echo(
+        f"index resolve:   {resolve_s:.3f}s ({len(names) / resolve_s:,.0f} names/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import numpy as np
+from PIL import Image
+
+from . import constants as c
+from .atlas import icon_atlas
+from .cache import get_cache
+from .layout import Layout, items
+from .render import COLUMNS, ROWS, draw_grid, draw_slot, new_canvas
+
+SLOTS = COLUMNS * ROWS
+# layouts per step of the per-item counts, bounds their memory use
+CHUNK_ROWS = 1 << 16
+
+
+def layout_matrix(layouts):
+    """
+    Encodes layouts as one row of item ids per layout, ids of the item
+    registry in bedwarsshop.layout.
+
+    Args:
+        layouts (iterable): Layouts, in the nested list form or as Layout.
+
+    Returns:
+        np.ndarray: uint8 array of shape (len(layouts), 21).
+    """
+    slots = b"".join(
+        layout.slots if isinstance(layout, Layout) else Layout.from_rows(layout).slots
+        for layout in layouts
+    )
+    return np.frombuffer(slots, np.uint8).reshape(-1, SLOTS)
+
+
+def cached_matrix(cache=None):
+    """
+    Encodes the layout of every player in the cache, stale entries included.
+    Players without a quick shop are left out, and layouts shared by many
+    players are only parsed once.
+
+    Args:
+        cache (PlayerCache): The cache to read, defaults to get_cache().
+
+    Returns:
+        np.ndarray: uint8 array of shape (players, 21).
+    """
+    cache = cache or get_cache()
+    encoded = {}
+    chunks = []
+    for _, entry in cache.entries():
+        favourites = entry.get("favourites_2")
+        slots = encoded.get(favourites)
+        if slots is None and favourites is not None:
+            try:
+                slots = Layout.from_favourites(favourites).slots
+            except ValueError:
+                slots = b""
+            encoded[favourites] = slots
+        if slots:
+            chunks.append(slots)
+    return np.frombuffer(b"".join(chunks), np.uint8).reshape(-1, SLOTS)
+
+
+def _presence(matrix):
+    # yields one bool matrix per chunk of layouts, one column per item id,
+    # True where the layout holds the item anywhere
+    for start in range(0, len(matrix), CHUNK_ROWS):
+        chunk = matrix[start : start + CHUNK_ROWS]
+        present = np.zeros((len(chunk), len(items)), bool)
+        present[np.arange(len(chunk))[:, None], chunk] = True
+        yield present
+
+
+def item_frequency(matrix):
+    """
+    Counts the players that have each item somewhere in their quick shop.
+
+    Args:
+        matrix (np.ndarray): Layouts as from layout_matrix.
+
+    Returns:
+        dict: Mapping of item name to number of players, most popular first,
+        without "null" and items nobody has.
+    """
+    counts = sum(
+        (present.sum(axis=0) for present in _presence(matrix)),
+        np.zeros(len(items), np.int64),
+    )
+    order = np.argsort(-counts, kind="stable")
+    return {items.name(i): int(counts[i]) for i in order if i and counts[i]}
+
+
+def slot_heatmap(matrix, item=None):
+    """
+    Counts how often each slot holds an item.
+
+    Args:
+        matrix (np.ndarray): Layouts as from layout_matrix.
+        item (str): The item to count, or None to count every non-empty slot.
+
+    Returns:
+        np.ndarray: int64 counts of shape (3, 7), in shop order.
+    """
+    if item is None:
+        hits = matrix != 0
+    else:
+        hits = matrix == items.ids.get(item, -1)
+    return hits.sum(axis=0, dtype=np.int64).reshape(ROWS, COLUMNS)
+
+
+def slot_leaders(matrix):
+    """
+    Finds the most common item of every slot, empty slots excluded.
+
+    Args:
+        matrix (np.ndarray): Layouts as from layout_matrix.
+
+    Returns:
+        tuple: (layout, shares), the nested list layout of the leading items
+        and a (3, 7) float array of the share of players that have the
+        leading item in that slot.
+    """
+    # one bin per (slot, item) pair
+    bins = np.arange(SLOTS) * len(items) + matrix
+    counts = np.bincount(bins.ravel(), minlength=SLOTS * len(items))
+    counts = counts.reshape(SLOTS, len(items))
+    counts[:, 0] = 0
+    leaders = counts.argmax(axis=1)
+    shares = counts[np.arange(SLOTS), leaders] / max(len(matrix), 1)
+    names = [items.name(i) if shares[s] else "null" for s, i in enumerate(leaders)]
+    layout = [names[y * COLUMNS : (y + 1) * COLUMNS] for y in range(ROWS)]
+    return layout, shares.reshape(ROWS, COLUMNS)
+
+
+def co_occurrence(matrix):
+    """
+    Counts the players that have both items of every pair of items.
+
+    Args:
+        matrix (np.ndarray): Layouts as from layout_matrix.
+
+    Returns:
+        np.ndarray: Symmetric int64 counts of shape (items, items), indexed
+        by item id; the diagonal is item_frequency.
+    """
+    counts = np.zeros((len(items), len(items)), np.int64)
+    for present in _presence(matrix):
+        # float32 products go through BLAS and are exact up to 2**24 per chunk
+        present = present.astype(np.float32)
+        counts += (present.T @ present).astype(np.int64)
+    return counts
+
+
+def top_pairs(matrix, n=10):
+    """
+    The item pairs found together most often.
+
+    Args:
+        matrix (np.ndarray): Layouts as from layout_matrix.
+        n (int): Number of pairs.
+
+    Returns:
+        list: (item, item, players) tuples, most common first.
+    """
+    counts = co_occurrence(matrix)
+    first, second = np.triu_indices(len(counts), k=1)
+    keep = (first != 0) & (counts[first, second] > 0)
+    first, second = first[keep], second[keep]
+    pairs = counts[first, second]
+    order = np.argsort(-pairs, kind="stable")[:n]
+    return [(items.name(first[i]), items.name(second[i]), int(pairs[i])) for i in order]
+
+
+def top_layouts(matrix, n=10):
+    """
+    The most common full layouts.
+
+    Args:
+        matrix (np.ndarray): Layouts as from layout_matrix.
+        n (int): Number of layouts.
+
+    Returns:
+        list: (Layout, players) pairs, most common first.
+    """
+    rows = np.ascontiguousarray(matrix).view(np.dtype((np.void, SLOTS))).ravel()
+    unique, counts = np.unique(rows, return_counts=True)
+    order = np.argsort(-counts, kind="stable")[:n]
+    return [(Layout(unique[i].tobytes()), int(counts[i])) for i in order]
+
+
+def render_heatmap(layout, shares):
+    """
+    Draws a layout with every slot tinted in HEAT_COLOR by a share, with
+    the same slots and grid as a shop image.
+
+    Args:
+        layout (list): A 2D list of item names to draw.
+        shares (np.ndarray): (3, 7) values between 0 and 1.
+
+    Returns:
+        Image.Image: The RGBA heatmap.
+    """
+    image = new_canvas()
+    icons = icon_atlas(c.CELL_SIZE)
+    for y, row in enumerate(layout):
+        for x, item in enumerate(row):
+            if item != "null":
+                draw_slot(image, item, icons.get(item), x, y)
+    cell = (c.CELL_SIZE, c.CELL_SIZE)
+    for (y, x), share in np.ndenumerate(shares):
+        alpha = round(float(share) * c.HEAT_MAX_ALPHA)
+        if alpha:
+            tint = Image.new("RGBA", cell, (*c.HEAT_COLOR, alpha))
+            image.alpha_composite(tint, (x * c.CELL_SIZE, y * c.CELL_SIZE))
+    draw_grid(image)
+    return image
@@ -0,0 +1,178 @@
+import json
+import logging
+from functools import lru_cache
+from pathlib import Path
+
+from PIL import Image, PngImagePlugin
+
+from . import constants as c
+from .metrics import metrics
+
+ICONS_DIR = Path(__file__).parent / "assets" / "icons"
+ATLAS_PATH = Path(__file__).parent / "assets" / "icons.atlas.png"
+TILE_SIZE = 320
+ATLAS_COLUMNS = 8
+ATLAS_VERSION = 1
+
+
+def icon_files():
+    """
+    Returns the unique icon file names referenced by ICONS_DICT.
+
+    Returns:
+        list: Sorted list of icon file names, each listed once even when
+        several items share it.
+    """
+    return sorted(set(c.ICONS_DICT.values()))
+
+
+def atlas_fingerprint(files):
+    """
+    Describes the icon sources an atlas was built from, used to detect a
+    stale packed atlas.
+
+    Args:
+        files (list): Icon file names, in atlas order.
+
+    Returns:
+        dict: The atlas metadata.
+    """
+    return {
+        "version": ATLAS_VERSION,
+        "tile_size": TILE_SIZE,
+        "columns": ATLAS_COLUMNS,
+        "files": files,
+        "sizes": [(ICONS_DIR / name).stat().st_size for name in files],
+    }
+
+
+def decode_icon(name):
+    """
+    Decodes a single icon file into a TILE_SIZE x TILE_SIZE RGBA tile.
+
+    Args:
+        name (str): Icon file name inside the icons directory.
+
+    Returns:
+        Image.Image: The resized RGBA tile.
+    """
+    metrics.count("icon_decodes")
+    with Image.open(ICONS_DIR / name) as icon:
+        return icon.convert("RGBA").resize((TILE_SIZE, TILE_SIZE))
+
+
+def build_atlas(path=ATLAS_PATH):
+    """
+    Decodes every icon once and packs the tiles into a single PNG sheet, with
+    the tile order stored in a text chunk.
+
+    Args:
+        path (Path): Where to write the packed atlas.
+
+    Returns:
+        Path: The path of the written atlas.
+    """
+    files = icon_files()
+    rows = -(-len(files) // ATLAS_COLUMNS)
+    sheet = Image.new("RGBA", (ATLAS_COLUMNS * TILE_SIZE, rows * TILE_SIZE))
+    for index, name in enumerate(files):
+        sheet.paste(decode_icon(name), _tile_box(index)[:2])
+    info = PngImagePlugin.PngInfo()
+    info.add_text("bedwarsshop-atlas", json.dumps(atlas_fingerprint(files)))
+    path = Path(path)
+    sheet.save(path, pnginfo=info)
+    logging.info(f"Icon atlas with {len(files)} tiles saved to: {path}")
+    return path
+
+
+def _tile_box(index):
+    x = (index % ATLAS_COLUMNS) * TILE_SIZE
+    y = (index // ATLAS_COLUMNS) * TILE_SIZE
+    return (x, y, x + TILE_SIZE, y + TILE_SIZE)
+
+
+def _load_packed(path, files):
+    """
+    Loads the tiles from a packed atlas, or returns None if it is missing or
+    was built from different icons.
+    """
+    try:
+        with Image.open(path) as sheet:
+            meta = json.loads(sheet.text["bedwarsshop-atlas"])
+            if meta != atlas_fingerprint(files):
+                logging.info(f"Icon atlas is stale, decoding icons: {path}")
+                return None
+            sheet = sheet.convert("RGBA")
+    except (OSError, KeyError, ValueError):
+        return None
+    metrics.count("atlas_loads")
+    return {name: sheet.crop(_tile_box(i)) for i, name in enumerate(meta["files"])}
+
+
+@lru_cache(maxsize=1)
+def load_tiles(path=ATLAS_PATH):
+    """
+    Loads one RGBA tile per icon file, once per process. The packed atlas is
+    used when it is up to date, otherwise every icon is decoded individually.
+
+    Args:
+        path (Path): Location of the packed atlas.
+
+    Returns:
+        dict: Mapping of icon file name to its tile.
+    """
+    files = icon_files()
+    tiles = _load_packed(path, files)
+    if tiles is None:
+        tiles = {name: decode_icon(name) for name in files}
+    return tiles
+
+
+@lru_cache(maxsize=4)
+def scaled_tiles(size):
+    """
+    Returns the icon tiles resized to `size` pixels, resized once per size
+    and process.
+
+    Args:
+        size (int): Side of a tile in pixels.
+
+    Returns:
+        dict: Mapping of icon file name to its tile.
+    """
+    tiles = load_tiles()
+    if size == TILE_SIZE:
+        return tiles
+    metrics.count("icon_resizes", len(tiles))
+    return {
+        name: tile.resize((size, size), Image.Resampling.LANCZOS)
+        for name, tile in tiles.items()
+    }
+
+
+@lru_cache(maxsize=4)
+def icon_atlas(size=TILE_SIZE):
+    """
+    Maps every item of ICONS_DICT to its icon tile. Aliases pointing at the
+    same file share a single tile.
+
+    Args:
+        size (int): Side of a tile in pixels, usually CELL_SIZE.
+
+    Returns:
+        dict: Mapping of item id to its tile.
+    """
+    tiles = scaled_tiles(size)
+    return {item: tiles[name] for item, name in c.ICONS_DICT.items()}
+
+
+def clear_cache():
+    """Drops the loaded tiles so the next lookup reloads them."""
+    load_tiles.cache_clear()
+    scaled_tiles.cache_clear()
+    icon_atlas.cache_clear()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    build_atlas()
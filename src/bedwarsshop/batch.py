@@ -0,0 +1,197 @@
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import partial
+
+from . import constants as c
+from .atlas import icon_atlas
+from .helpers import (
+    configure_output,
+    create_image,
+    get_cached_player_data,
+    get_player_data,
+    output_settings,
+    parse_player_data,
+)
+from .render import label_style
+
+
+class BatchReport:
+    """
+    Outcome of a batch run.
+
+    Attributes:
+        rendered (list): Names of the players whose image was saved.
+        skipped (list): Names of the players whose saved image was already
+            up to date.
+        failures (dict): Mapping of player name to the reason it failed.
+        elapsed (float): Wall time of the run in seconds.
+    """
+
+    def __init__(self):
+        self.rendered = []
+        self.skipped = []
+        self.failures = {}
+        self.elapsed = 0.0
+
+    @property
+    def total(self):
+        return len(self.rendered) + len(self.skipped) + len(self.failures)
+
+    @property
+    def throughput(self):
+        """Players processed per second."""
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        """
+        Formats the report for the terminal.
+
+        Returns:
+            str: One line per failure followed by the totals.
+        """
+        lines = [f"{name}: {reason}" for name, reason in self.failures.items()]
+        lines.append(
+            f"Rendered {len(self.rendered)}/{self.total} players, "
+            f"{len(self.skipped)} unchanged, {len(self.failures)} failed, "
+            f"in {self.elapsed:.2f}s "
+            f"({self.throughput:.2f} players/s)"
+        )
+        return "\n".join(lines)
+
+
+def read_player_names(names, names_file=None):
+    """
+    Collects player names from arguments and an optional file, one name per
+    line. Blank lines and duplicates are dropped, the order is kept.
+
+    Args:
+        names (iterable): Names given on the command line.
+        names_file (file): Open text file with more names, or None.
+
+    Returns:
+        list: The player names.
+    """
+    names = list(names)
+    if names_file is not None:
+        names += [line.strip() for line in names_file]
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def fetch_layout(player_name, player_data=None):
+    """
+    Fetches and parses the layout of one player.
+
+    Args:
+        player_name (str): The name of the player.
+        player_data (dict): Player data already read from the cache, or None
+            to fetch it.
+
+    Returns:
+        tuple: (layout, None) on success or (None, reason) on failure.
+    """
+    if player_data is None:
+        player_data = get_player_data(player_name)
+    if not player_data:
+        return None, "failed to retrieve player data"
+    layout = parse_player_data(player_data)
+    if not layout:
+        return None, "failed to parse player data"
+    return layout, None
+
+
+def warm_caches(settings=None):
+    """
+    Loads the icon atlas and font, run once in every render worker.
+
+    Args:
+        settings (dict): Output settings of the parent process, as returned
+            by output_settings, or None to keep those of constants.py.
+    """
+    if settings:
+        configure_output(settings)
+    icon_atlas(c.CELL_SIZE)
+    label_style()
+
+
+def render_player(layout, player_name, force=False):
+    """
+    Renders and saves one image, the unit of work of a render worker.
+
+    Returns:
+        bool: True if the image was rendered, False if it was unchanged.
+    """
+    return create_image(layout, player_name, show=False, force=force)
+
+
+def _record_render(report, player_name, render):
+    try:
+        rendered = render()
+    except Exception as e:
+        logging.error(f"Failed to render image for {player_name}: {e}")
+        report.failures[player_name] = f"failed to render image: {e}"
+    else:
+        (report.rendered if rendered else report.skipped).append(player_name)
+
+
+def run_batch(player_names, fetch_workers=4, render_workers=None, force=False):
+    """
+    Fetches player data concurrently and renders the images on a process
+    pool. Cached players are looked up together before any API request, and
+    API requests share the client's rate limiter. A failing player is
+    recorded in the report instead of stopping the run.
+
+    Args:
+        player_names (list): Names of the players to render.
+        fetch_workers (int): Maximum number of concurrent fetches.
+        render_workers (int): Number of render processes, defaults to the
+            number of cores. With 1 the images are rendered in-process.
+        force (bool): Render even the images that are up to date.
+
+    Returns:
+        BatchReport: The outcome of the run.
+    """
+    report = BatchReport()
+    render_workers = render_workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    warm_caches()
+    renderer = None
+    if render_workers > 1:
+        # spawned rather than forked, as fetch threads may hold locks by the
+        # time the pool starts its workers; warm_caches rebuilds their state
+        renderer = ProcessPoolExecutor(
+            render_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=warm_caches,
+            initargs=(output_settings(),),
+        )
+    renders = {}
+    try:
+        cached = get_cached_player_data(player_names)
+        with ThreadPoolExecutor(fetch_workers) as fetcher:
+            fetches = {
+                fetcher.submit(fetch_layout, name, cached.get(name)): name
+                for name in player_names
+            }
+            for future in as_completed(fetches):
+                name = fetches[future]
+                try:
+                    layout, reason = future.result()
+                except Exception as e:
+                    layout, reason = None, f"failed to retrieve player data: {e}"
+                if layout is None:
+                    report.failures[name] = reason
+                elif renderer is None:
+                    render = partial(render_player, layout, name, force)
+                    _record_render(report, name, render)
+                else:
+                    renders[name] = renderer.submit(render_player, layout, name, force)
+        for name, future in renders.items():
+            _record_render(report, name, future.result)
+    finally:
+        if renderer is not None:
+            renderer.shutdown()
+    report.elapsed = time.perf_counter() - start
+    return report
@@ -1,32 +1,252 @@
+import functools
+import json
 import logging
+from pathlib import Path
 
 import click
-from dotenv import load_dotenv
 
-from .helpers import create_image, get_player_data, load_constants, parse_player_data
+from . import constants as c
+from .cache import SQLiteCache, migrate_json_cache
+from .helpers import (
+    configure_output,
+    create_image,
+    encode_image,
+    get_player_data,
+    load_constants,
+    parse_player_data,
+)
+from .metrics import metrics
 
-load_dotenv()
+# Subcommands import what only they need when they run, so that --help and
+# renders of cached players start quickly.
 
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+
+
+def configure_logging(level):
+    """
+    Sends log records of `level` and above to stderr.
+
+    Args:
+        level (str): One of LOG_LEVELS.
+    """
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s")
+    logging.getLogger().setLevel(level)
+
+
+def logging_options(command):
+    """Adds --log-level and --quiet to a command and applies them."""
+
+    @click.option(
+        "--log-level",
+        type=click.Choice(LOG_LEVELS, case_sensitive=False),
+        default="INFO",
+        show_default=True,
+        help="Lowest level of the log messages written to stderr.",
+    )
+    @click.option("-q", "--quiet", is_flag=True, help="Only log errors.")
+    @functools.wraps(command)
+    def wrapper(*args, log_level, quiet, **kwargs):
+        configure_logging("ERROR" if quiet else log_level)
+        return command(*args, **kwargs)
+
+    return wrapper
+
+
+def profiling_options(command):
+    """
+    Adds --profile, --cprofile and --tracemalloc to a command. --profile
+    writes the stage timings and counters of the run as JSON, --cprofile
+    saves cProfile statistics for pstats or snakeviz, and --tracemalloc adds
+    the peak memory and top allocation sites to the --profile report.
+    """
+
+    @click.option(
+        "--profile",
+        type=click.File("w"),
+        help="Write a JSON report of stage timings and counters, '-' for stdout.",
+    )
+    @click.option(
+        "--cprofile",
+        type=click.Path(dir_okay=False, path_type=Path),
+        help="Save cProfile statistics to this file.",
+    )
+    @click.option(
+        "--tracemalloc",
+        "trace_memory",
+        is_flag=True,
+        help="Add memory allocations to the --profile report.",
+    )
+    @functools.wraps(command)
+    def wrapper(*args, profile, cprofile, trace_memory, **kwargs):
+        if trace_memory and profile is None:
+            raise click.UsageError("--tracemalloc needs --profile.")
+        if profile is None and cprofile is None:
+            return command(*args, **kwargs)
+        import cProfile
+        import tracemalloc
+
+        from .metrics import memory_report
+
+        metrics.enable()
+        if trace_memory:
+            tracemalloc.start()
+        profiler = cProfile.Profile() if cprofile else None
+        try:
+            if profiler:
+                return profiler.runcall(command, *args, **kwargs)
+            return command(*args, **kwargs)
+        finally:
+            metrics.disable()
+            if profiler:
+                profiler.dump_stats(cprofile)
+            if profile is not None:
+                report = metrics.report()
+                if trace_memory:
+                    report["tracemalloc"] = memory_report()
+                    tracemalloc.stop()
+                json.dump(report, profile, indent=2)
+                profile.write("\n")
+
+    return wrapper
+
+
+class DefaultGroup(click.Group):
+    """Group that runs `default_command` when no subcommand is named."""
+
+    default_command = "render"
+
+    def parse_args(self, ctx, args):
+        if not args or (
+            args[0] not in self.commands and args[0] not in ctx.help_option_names
+        ):
+            args = [self.default_command, *args]
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=DefaultGroup)
+def cli():
+    """
+    bedwars shop favorites images for Hypixel players.
+    Usage: `bedwarsshop <player_name>` or `bedwarsshop <command> ...`
+    """
 
 
-@click.command()
-@click.argument("player_name", type=str)
-def main(player_name: str) -> None:
+@cli.command("render")
+@logging_options
+@profiling_options
+@click.argument("player_name", nargs=-1, type=str)
+@click.option(
+    "-f",
+    "--file",
+    "names_file",
+    type=click.File("r"),
+    help="Read more player names from a file, one per line ('-' for stdin).",
+)
+@click.option(
+    "--fetch-workers",
+    default=4,
+    show_default=True,
+    help="Maximum number of concurrent API requests in batch mode.",
+)
+@click.option(
+    "--render-workers",
+    type=int,
+    show_default="number of cores",
+    help="Number of render processes in batch mode.",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Render again even if the saved image shows the same layout.",
+)
+@click.option(
+    "--cell-size",
+    type=click.IntRange(16, 1024),
+    help=f"Size of a shop slot in pixels.  [default: {c.CELL_SIZE}]",
+)
+@click.option(
+    "--format",
+    "image_format",
+    type=click.Choice(["png", "webp", "png8"]),
+    help="png, lossless webp, or png8 quantized to 256 colors."
+    f"  [default: {c.OUTPUT_FORMAT}]",
+)
+@click.option(
+    "--compress-level",
+    type=click.IntRange(0, 9),
+    help=f"PNG zlib level.  [default: {c.PNG_COMPRESS_LEVEL}]",
+)
+@click.option(
+    "--optimize/--no-optimize",
+    default=None,
+    help="Search for the smallest PNG encoding, slow.",
+)
+@click.option(
+    "--show/--no-show",
+    default=None,
+    help="Open the image in a viewer, single player only.  [default: no-show]",
+)
+@click.option(
+    "--print-layout",
+    is_flag=True,
+    help="Print the parsed layout as JSON, single player only.",
+)
+def main(
+    player_name,
+    names_file,
+    fetch_workers,
+    render_workers,
+    force,
+    cell_size,
+    image_format,
+    compress_level,
+    optimize,
+    show,
+    print_layout,
+) -> None:
     """
     generates a bedwars shop favorites image for a player.
     To use this script, you need to have a Hypixel API key.
     Usage: `bedwarsshop <player_name>`
 
+    Images whose layout has not changed since the last run are kept as they
+    are, unless --force is given.
+
+    Smaller cells, and the webp or png8 formats, make smaller images that
+    are faster to encode.
+
+    No viewer is opened and nothing is printed unless --show or
+    --print-layout is given; --quiet or --log-level turn down the logs.
+
+    Several names, or a file of names, run in batch mode: player data is
+    fetched concurrently and the images are rendered on a process pool.
+
     Args:
-        player_name (str): Username of the player.
+        player_name (str): Username of the player, may be given several times.
 
     """
+    from .batch import read_player_names, run_batch
+
+    player_names = read_player_names(player_name, names_file)
+    if not player_names:
+        raise click.UsageError("Missing argument 'PLAYER_NAME...'.")
     if not load_constants():
         logging.error("Failed to load constants, exiting...")
         return None
+    configure_output(
+        {
+            "CELL_SIZE": cell_size,
+            "OUTPUT_FORMAT": image_format,
+            "PNG_COMPRESS_LEVEL": compress_level,
+            "PNG_OPTIMIZE": optimize,
+        }
+    )
+    if len(player_names) > 1 or names_file is not None:
+        report = run_batch(player_names, fetch_workers, render_workers, force=force)
+        click.echo(report.summary())
+        return None
+    player_name = player_names[0]
     player_data = get_player_data(player_name)
     if not player_data:
         logging.error("Failed to retrieve player data, exiting...")
@@ -35,9 +255,322 @@ def main(player_name: str) -> None:
     if not player_data:
         logging.error("Failed to parse player data, exiting...")
         return None
-    print(player_data)
-    create_image(player_data, player_name)
+    if print_layout:
+        click.echo(json.dumps(player_data))
+    create_image(player_data, player_name, show=show, force=force)
+
+
+@cli.command("sheet")
+@logging_options
+@profiling_options
+@click.argument("player_name", nargs=-1, type=str)
+@click.option(
+    "-f",
+    "--file",
+    "names_file",
+    type=click.File("r"),
+    help="Read more player names from a file, one per line ('-' for stdin).",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default="sheet.png",
+    show_default=True,
+    help="PNG file to write the sheet to.",
+)
+@click.option(
+    "--columns",
+    type=click.IntRange(1),
+    default=c.SHEET_COLUMNS,
+    show_default=True,
+    help="Shops per row.",
+)
+@click.option(
+    "--fetch-workers",
+    default=4,
+    show_default=True,
+    help="Maximum number of concurrent API requests.",
+)
+@click.option(
+    "--cell-size",
+    type=click.IntRange(16, 1024),
+    help=f"Size of a shop slot in pixels.  [default: {c.CELL_SIZE}]",
+)
+@click.option(
+    "--compress-level",
+    type=click.IntRange(0, 9),
+    help=f"PNG zlib level.  [default: {c.PNG_COMPRESS_LEVEL}]",
+)
+def sheet(
+    player_name, names_file, output, columns, fetch_workers, cell_size, compress_level
+) -> None:
+    """
+    renders the shops of many players side by side on one PNG.
+    Each shop has the player's name above it, in the order the names are
+    given. The sheet is written one row of shops at a time, so sheets of
+    thousands of players need little memory; pick a small --cell-size to
+    keep the image a manageable size.
+    """
+    from .batch import read_player_names
+    from .sheet import fetch_layouts, write_sheet
+
+    player_names = read_player_names(player_name, names_file)
+    if not player_names:
+        raise click.UsageError("Missing argument 'PLAYER_NAME...'.")
+    if not load_constants():
+        logging.error("Failed to load constants, exiting...")
+        return None
+    configure_output({"CELL_SIZE": cell_size, "PNG_COMPRESS_LEVEL": compress_level})
+    players, failures = fetch_layouts(player_names, fetch_workers)
+    if not players:
+        raise click.ClickException("None of the players could be fetched.")
+    with output.open("wb") as f:
+        width, height = write_sheet(players, f, columns)
+    click.echo(
+        f"Sheet of {len(players)} players ({width}x{height}) saved to: {output}"
+        + (f", {len(failures)} left out" if failures else "")
+    )
+
+
+@cli.command("diff")
+@logging_options
+@click.argument("old")
+@click.argument("new")
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Save an image of NEW with the changed slots highlighted.",
+)
+def diff(old, new, output) -> None:
+    """
+    prints how a quick shop layout changed from OLD to NEW.
+    Each of OLD and NEW is a favourites_2 string, comma separated item names
+    row by row, or the name of a player whose current layout is used.
+    """
+    from .diff import diff_layouts, render_diff, slot_position
+    from .helpers import split_favourites
+
+    def position(slot):
+        row, column = slot_position(slot)
+        return f"row {row + 1}, column {column + 1}"
+
+    layouts = []
+    for argument in [old, new]:
+        if "," in argument:
+            layout = split_favourites(argument)
+            if sum(map(len, layout)) != 21:
+                raise click.BadParameter(f"not 21 items: {argument}")
+        else:
+            if not load_constants():
+                raise click.ClickException("Failed to load constants.")
+            player_data = get_player_data(argument)
+            layout = parse_player_data(player_data) if player_data else None
+            if not layout:
+                raise click.ClickException(f"No quick shop found for {argument}.")
+        layouts.append(layout)
+    changes = diff_layouts(*layouts)
+    for slot, item in changes.added:
+        click.echo(f"added   {item} at {position(slot)}")
+    for slot, item in changes.removed:
+        click.echo(f"removed {item} from {position(slot)}")
+    for item, source, target in changes.moved:
+        click.echo(f"moved   {item} from {position(source)} to {position(target)}")
+    if not changes:
+        click.echo("No changes")
+    if output is not None:
+        with output.open("wb") as f:
+            encode_image(render_diff(*layouts, changes), f, "png")
+        click.echo(f"Diff image saved to: {output}")
+
+
+@cli.command("history")
+@logging_options
+@click.argument("player_name")
+@click.option(
+    "--at",
+    "at_time",
+    type=click.DateTime(),
+    help="Print the layout the player had at this local time, as JSON.",
+)
+def history(player_name, at_time) -> None:
+    """
+    lists the recorded quick shop layouts of a player.
+    A snapshot is recorded whenever a fetch from the API finds a layout
+    that changed, see HISTORY_ENABLED in constants.py.
+    """
+    from datetime import datetime
+
+    from .diff import diff_layouts
+    from .history import get_history
+    from .uuids import resolve_uuid
+
+    store = get_history()
+    # recorded by uuid, or by name for players fetched without one
+    key = resolve_uuid(player_name) or player_name
+    if at_time is not None:
+        layout = store.at(key, int(at_time.timestamp()))
+        if layout is None:
+            raise click.ClickException(f"No snapshot of {player_name} at {at_time}.")
+        click.echo(json.dumps(layout.to_rows()))
+        return None
+    snapshots = store.history(key)
+    if not snapshots:
+        raise click.ClickException(f"No history recorded for {player_name}.")
+    previous = None
+    for timestamp, layout in snapshots:
+        when = datetime.fromtimestamp(timestamp).isoformat(sep=" ")
+        if previous is None:
+            click.echo(f"{when}  first snapshot")
+        else:
+            changes = diff_layouts(previous, layout)
+            click.echo(
+                f"{when}  {len(changes.added)} added, {len(changes.removed)} "
+                f"removed, {len(changes.moved)} moved"
+            )
+        previous = layout
+
+
+@cli.command("migrate-cache")
+@logging_options
+@click.option(
+    "--source",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=c.CACHE_DIR,
+    show_default=True,
+    help="Directory of JSON cache files to import.",
+)
+@click.option(
+    "--database",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=c.CACHE_DB,
+    show_default=True,
+    help="SQLite database to import into, created if missing.",
+)
+def migrate_cache(source, database) -> None:
+    """
+    imports the JSON cache files into a SQLite cache database.
+    Set CACHE_BACKEND to "sqlite" in constants.py to use it afterwards.
+    """
+    if not source.is_dir():
+        raise click.UsageError(f"Cache directory not found: {source}")
+    imported = migrate_json_cache(source, SQLiteCache(database))
+    click.echo(f"Imported {imported} players from {source} into {database}")
+
+
+@cli.command("ingest")
+@logging_options
+@profiling_options
+@click.argument("dump", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    show_default=True,
+    help="Store the players in the player cache.",
+)
+@click.option("--render", is_flag=True, help="Render an image of every player.")
+@click.option(
+    "--render-workers",
+    type=int,
+    show_default="number of cores",
+    help="Number of render processes.",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Render again even if the saved image shows the same layout.",
+)
+@click.option(
+    "--batch-size",
+    type=click.IntRange(1),
+    default=c.INGEST_BATCH_SIZE,
+    show_default=True,
+    help="Players written to the cache and rendered at once.",
+)
+def ingest(dump, cache, render, render_workers, force, batch_size) -> None:
+    """
+    imports a dump of Hypixel player documents, one JSON document per line.
+    The dump is streamed, so it may be larger than memory; progress is
+    logged as it goes.
+    """
+    from .ingest import ingest_dump
+
+    if render:
+        Path("output").mkdir(exist_ok=True)
+    report = ingest_dump(dump, cache, render, render_workers, force, batch_size)
+    click.echo(report.summary())
+
+
+@cli.command("analytics")
+@logging_options
+@click.option("--top", default=10, show_default=True, help="Entries per ranking.")
+@click.option(
+    "--heatmap",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Save a heatmap of the most common item of every slot.",
+)
+@click.option("--item", help="Make the heatmap show where this item is kept.")
+def analytics(top, heatmap, item) -> None:
+    """
+    prints item popularity and the most common layouts of the cached players.
+    Needs the optional numpy dependency.
+    """
+    try:
+        from . import analytics as stats
+    except ImportError as e:
+        raise click.ClickException(
+            f"analytics needs numpy, install it with `uv sync --extra numpy`: {e}"
+        ) from e
+    matrix = stats.cached_matrix()
+    players = len(matrix)
+    click.echo(f"{players} cached players with a quick shop")
+    if not players:
+        return None
+    click.echo("\nMost popular items:")
+    for name, count in list(stats.item_frequency(matrix).items())[:top]:
+        click.echo(f"  {name:<36} {count:>9} {count / players:7.1%}")
+    click.echo("\nItems most often kept together:")
+    for first, second, count in stats.top_pairs(matrix, top):
+        click.echo(f"  {first} + {second}: {count} ({count / players:.1%})")
+    click.echo("\nMost common layouts:")
+    for layout, count in stats.top_layouts(matrix, top):
+        favourites = ",".join(name for row in layout for name in row)
+        click.echo(f"  {count:>9} {favourites}")
+    if heatmap is not None:
+        if item is None:
+            layout, shares = stats.slot_leaders(matrix)
+        else:
+            shares = stats.slot_heatmap(matrix, item) / players
+            layout = [[item if share else "null" for share in row] for row in shares]
+        with heatmap.open("wb") as f:
+            encode_image(stats.render_heatmap(layout, shares), f, "png")
+        click.echo(f"\nHeatmap saved to: {heatmap}")
+
+
+@cli.command("serve")
+@logging_options
+@click.option("--host", default=c.SERVE_HOST, show_default=True)
+@click.option("--port", default=c.SERVE_PORT, show_default=True)
+@click.option(
+    "--workers",
+    default=c.SERVE_WORKERS,
+    show_default=True,
+    help="Maximum number of fetches and renders running at once.",
+)
+def serve(host, port, workers) -> None:
+    """
+    serves shop images over HTTP at /shop/<player_name>.png.
+    The icon atlas, font, API session and player cache stay warm between
+    requests, and responses carry the layout hash as their ETag.
+    """
+    if not load_constants():
+        logging.error("Failed to load constants, exiting...")
+        return None
+    from .server import ShopServer
+
+    ShopServer(host, port, workers).serve_forever()
 
 
 if __name__ == "__main__":
-    main()
+    cli()
@@ -0,0 +1,198 @@
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+from . import constants as c
+from .atlas import icon_atlas
+from .render import (
+    COLUMNS,
+    ROWS,
+    grid_overlay,
+    label_style,
+    label_tile,
+    scaled,
+    slot_tile,
+)
+
+# shops per array in render_batch, 32 shops at 320 pixel cells take 275 MB
+BATCH_SIZE = 32
+
+
+def shop_shape():
+    """Shape of one shop array at the configured cell size."""
+    return (ROWS * c.CELL_SIZE, COLUMNS * c.CELL_SIZE, 4)
+
+
+def blend(region, ink, mask):
+    """
+    Composites an RGBA color through an alpha mask in place, bit for bit like
+    Pillow's `paste(ink, box, mask)` on an RGBA image: color channels of fully
+    transparent pixels take the ink wherever the mask is set, and every
+    channel is blended with Pillow's rounded division by 255.
+
+    Args:
+        region (np.ndarray): RGBA pixels of shape (..., height, width, 4).
+        ink (tuple): RGBA color.
+        mask (np.ndarray): Alpha mask of shape (..., height, width).
+    """
+    ink = np.asarray(ink, dtype=np.uint32)
+    mask = mask.astype(np.uint32)[..., None]
+    color_mask = np.where((mask != 0) & (region[..., 3:] == 0), 255, mask)
+    weight = np.concatenate(
+        np.broadcast_arrays(color_mask, color_mask, color_mask, mask), axis=-1
+    )
+    value = region * (255 - weight) + ink * weight + 128
+    region[...] = ((value >> 8) + value) >> 8
+
+
+def _append(stack, array, fill):
+    # pad the stack and the new array to a common size, then stack them
+    height = max(stack.shape[1], array.shape[0])
+    width = max(stack.shape[2], array.shape[1])
+    if stack.shape[1:3] != (height, width):
+        padded = np.empty((len(stack), height, width, *stack.shape[3:]), np.uint8)
+        padded[...] = fill
+        padded[:, : stack.shape[1], : stack.shape[2]] = stack
+        stack = padded
+    row = np.empty((1, height, width, *stack.shape[3:]), np.uint8)
+    row[...] = fill
+    row[0, : array.shape[0], : array.shape[1]] = array
+    return np.concatenate([stack, row])
+
+
+class TileStack:
+    """
+    The composited slot tiles and label masks of every item drawn so far,
+    each kept in one stacked uint8 array padded to a common size. The real
+    extent of every entry is kept too, so drawing one copies no padding.
+
+    Args:
+        style (tuple): (font_name, font_size, offset) as from label_style.
+    """
+
+    def __init__(self, style):
+        self.style = style
+        self.tiles = np.empty((0, c.CELL_SIZE, c.CELL_SIZE, 4), np.uint8)
+        self.masks = np.empty((0, c.CELL_SIZE, c.CELL_SIZE), np.uint8)
+        self.tile_sizes = []
+        self.mask_boxes = []
+        self.tile_index = {}
+        self.mask_index = {}
+
+    def tile(self, item, icon):
+        """Index of the slot tile of an item with an icon."""
+        index = self.tile_index.get(item)
+        if index is None:
+            array = np.asarray(slot_tile(item, icon))
+            self.tiles = _append(self.tiles, array, c.BACKGROUND_COLOR)
+            self.tile_sizes.append(array.shape[:2])
+            index = self.tile_index[item] = len(self.tiles) - 1
+        return index
+
+    def mask(self, item):
+        """Index of the label mask of an item without an icon, or None."""
+        if item in self.mask_index:
+            return self.mask_index[item]
+        font_name, size, offset = self.style
+        label = label_tile(
+            item.replace("_", " "), font_name, size, c.TEXT_COLOR, offset
+        )
+        index = None
+        if label is not None:
+            _, box, mask = label
+            array = np.zeros((box[3], box[2]), np.uint8)
+            array[box[1] :, box[0] :] = np.asarray(mask)
+            self.masks = _append(self.masks, array, 0)
+            self.mask_boxes.append(box)
+            index = len(self.masks) - 1
+        self.mask_index[item] = index
+        return index
+
+
+@lru_cache(maxsize=1)
+def tile_stack(style, text_color, background_color, cell_size):
+    """Returns the process-wide tile stack for one style."""
+    return TileStack(style)
+
+
+def _draw_slots(shop, layout, stack, icons):
+    height, width = shop_shape()[:2]
+    for y, row in enumerate(layout):
+        for x, item in enumerate(row):
+            if item == "null":
+                continue
+            top, left = y * c.CELL_SIZE, x * c.CELL_SIZE
+            icon = icons.get(item)
+            if icon is not None:
+                index = stack.tile(item, icon)
+                h, w = stack.tile_sizes[index]
+                h, w = min(h, height - top), min(w, width - left)
+                shop[top : top + h, left : left + w] = stack.tiles[index, :h, :w]
+                continue
+            index = stack.mask(item)
+            if index is None:
+                continue
+            x0, y0, x1, y1 = stack.mask_boxes[index]
+            y1, x1 = min(y1, height - top), min(x1, width - left)
+            region = shop[top + y0 : top + y1, left + x0 : left + x1]
+            blend(region, c.TEXT_COLOR, stack.masks[index, y0:y1, x0:x1])
+
+
+def render_shops(layouts, out=None):
+    """
+    Renders several shops into one array. The background and the grid are
+    drawn over the whole batch at once; each slot copies its cached tile, or
+    composites its label when the item has no icon. The pixels are identical
+    to render_shop.
+
+    Args:
+        layouts (list): 2D lists of item names or Layouts, one per shop.
+        out (np.ndarray): Array to render into, reusing it saves allocating
+            and faulting in fresh memory for every batch. A new array is
+            allocated when None.
+
+    Returns:
+        np.ndarray: The shops as uint8 RGBA, of shape
+        (len(layouts), *shop_shape()).
+    """
+    stack = tile_stack(label_style(), c.TEXT_COLOR, c.BACKGROUND_COLOR, c.CELL_SIZE)
+    icons = icon_atlas(c.CELL_SIZE)
+    if out is None:
+        out = np.empty((len(layouts), *shop_shape()), np.uint8)
+    shops = out[: len(layouts)]
+    # one 32-bit store per pixel, much faster than broadcasting four channels
+    shops.view(np.uint32)[...] = np.frombuffer(bytes(c.BACKGROUND_COLOR), np.uint32)
+    for shop, layout in zip(shops, layouts, strict=True):
+        _draw_slots(shop, layout, stack, icons)
+    for box, mask in grid_overlay(COLUMNS, ROWS, c.CELL_SIZE, scaled(c.LINE_WIDTH)):
+        if mask is None:
+            shops[:, box[1] : box[3], box[0] : box[2]] = c.LINE_COLOR
+        else:
+            mask = np.asarray(mask)
+            region = shops[
+                :, box[1] : box[1] + mask.shape[0], box[0] : box[0] + mask.shape[1]
+            ]
+            blend(region, c.LINE_COLOR, mask)
+    return shops
+
+
+def render_batch(layouts, batch_size=BATCH_SIZE):
+    """
+    Renders many shops, batch_size at a time, and yields them as images. The
+    images share memory with their batch array, which is freed once all of
+    them are gone.
+
+    Args:
+        layouts (iterable): 2D lists of item names, one per shop.
+        batch_size (int): Number of shops rendered into one array.
+
+    Yields:
+        Image.Image: The RGBA shop images, in the order of `layouts`.
+    """
+    layouts = iter(layouts)
+    while batch := [
+        layout for _, layout in zip(range(batch_size), layouts, strict=False)
+    ]:
+        for shop in render_shops(batch):
+            yield Image.fromarray(shop)
@@ -0,0 +1,608 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+from . import constants as c
+
+
+class _Connection:
+    """Holds a thread's SQLite connection, closing it when dropped."""
+
+    __slots__ = ("db", "__weakref__")
+
+    def __init__(self, db):
+        self.db = db
+        weakref.finalize(self, db.close)
+
+
+def thread_connection(local, path):
+    """
+    Returns the calling thread's connection to a SQLite database in WAL
+    mode, opened on first use. It is closed when the thread exits or
+    `local` is dropped, instead of being left to the garbage collector.
+
+    Args:
+        local (threading.local): Per-thread storage of the connection.
+        path (Path): Location of the database file.
+
+    Returns:
+        sqlite3.Connection: The connection.
+    """
+    holder = getattr(local, "connection", None)
+    if holder is None:
+        # only used by its thread, but may be closed from another one
+        db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        holder = local.connection = _Connection(db)
+    return holder.db
+
+
+def slim_player_data(player_data):
+    """
+    Keeps only the fields the shop needs from a Hypixel player document.
+
+    Args:
+        player_data (dict): The player data returned by the API.
+
+    Returns:
+        dict: The player uuid and favourites_2 string, either may be None.
+    """
+    player = player_data.get("player") or {}
+    try:
+        favourites = player["stats"]["Bedwars"]["favourites_2"]
+    except (TypeError, KeyError):
+        favourites = None
+    return {"uuid": player.get("uuid"), "favourites_2": favourites}
+
+
+def expand_player_data(entry):
+    """
+    Rebuilds a player document from a slim cache entry, in the shape
+    parse_player_data expects.
+
+    Args:
+        entry (dict): A cache entry.
+
+    Returns:
+        dict: The player data.
+    """
+    if entry.get("uuid") is None and entry.get("favourites_2") is None:
+        return {"success": True, "player": None}
+    stats = {}
+    if entry.get("favourites_2") is not None:
+        stats["Bedwars"] = {"favourites_2": entry["favourites_2"]}
+    return {"success": True, "player": {"uuid": entry.get("uuid"), "stats": stats}}
+
+
+class PlayerCache:
+    """
+    File cache of slim player entries, one JSON file per player. Entries
+    expire after `ttl` seconds and the least recently used ones are evicted
+    to stay under `max_entries` and `max_bytes`. Writes go to a temporary
+    file that is renamed into place, so readers never see partial files.
+
+    Args:
+        directory (Path): Directory holding the entries.
+        ttl (float): Seconds an entry stays fresh, None to never expire.
+        max_entries (int): Maximum number of entries, None for no limit.
+        max_bytes (int): Maximum total size of the entries, None for no limit.
+    """
+
+    def __init__(
+        self,
+        directory,
+        ttl=c.CACHE_TTL,
+        max_entries=c.CACHE_MAX_ENTRIES,
+        max_bytes=c.CACHE_MAX_BYTES,
+    ):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self._index = None
+        self._bytes = 0
+
+    @staticmethod
+    def key(player_name):
+        """Case-insensitive, filesystem-safe key of a player."""
+        return quote(player_name.lower(), safe="")
+
+    def path(self, player_name):
+        return self.directory / f"{self.key(player_name)}.json"
+
+    def _load_index(self):
+        # least recently written first, so eviction order survives restarts
+        if self._index is not None:
+            return self._index
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".json") and entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+        except FileNotFoundError:
+            pass
+        entries.sort()
+        self._index = OrderedDict((key, size) for _, key, size in entries)
+        self._bytes = sum(self._index.values())
+        return self._index
+
+    def get(self, player_name):
+        """
+        Looks up a fresh entry.
+
+        Args:
+            player_name (str): The name of the player.
+
+        Returns:
+            dict: The entry with uuid, favourites_2 and fetched_at, or None
+            on a miss or when the entry is stale.
+        """
+        path = self.path(player_name)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            if "fetched_at" not in entry:
+                # full player document written by older versions
+                entry = dict(slim_player_data(entry), fetched_at=path.stat().st_mtime)
+        except FileNotFoundError:
+            entry = None
+        except (OSError, ValueError, AttributeError) as e:
+            logging.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            entry = None
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            if self.ttl is not None and time.time() - entry["fetched_at"] > self.ttl:
+                self.stale += 1
+                return None
+            self.hits += 1
+            index = self._load_index()
+            key = self.key(player_name)
+            if key in index:
+                index.move_to_end(key)
+        return entry
+
+    def get_many(self, player_names):
+        """
+        Looks up several players.
+
+        Args:
+            player_names (iterable): Names of the players.
+
+        Returns:
+            dict: Mapping of player name to its fresh entry, misses and stale
+            entries are left out.
+        """
+        entries = {name: self.get(name) for name in player_names}
+        return {name: entry for name, entry in entries.items() if entry is not None}
+
+    def put(self, player_name, player_data):
+        """
+        Stores the slim form of a player document.
+
+        Args:
+            player_name (str): The name of the player.
+            player_data (dict): The player data returned by the API.
+
+        Returns:
+            dict: The stored entry.
+        """
+        entry = dict(slim_player_data(player_data), fetched_at=time.time())
+        self.put_entries([(player_name, entry)])
+        return entry
+
+    def put_entries(self, entries):
+        """
+        Stores many slim entries, evicting once at the end.
+
+        Args:
+            entries (iterable): (player_name, entry) pairs.
+
+        Returns:
+            int: The number of stored entries.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        written = []
+        for player_name, entry in entries:
+            body = json.dumps(entry, separators=(",", ":")).encode()
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(body)
+                os.replace(tmp, self.path(player_name))
+            except BaseException:
+                os.unlink(tmp)
+                raise
+            written.append((self.key(player_name), len(body)))
+        with self.lock:
+            index = self._load_index()
+            for key, size in written:
+                self._bytes += size - index.pop(key, 0)
+                index[key] = size
+            self._evict(index)
+        return len(written)
+
+    def delete(self, player_names):
+        """
+        Deletes the entries of several players.
+
+        Args:
+            player_names (iterable): Names of the players.
+
+        Returns:
+            int: The number of deleted entries.
+        """
+        deleted = 0
+        with self.lock:
+            index = self._load_index()
+            for name in player_names:
+                self._bytes -= index.pop(self.key(name), 0)
+                try:
+                    self.path(name).unlink()
+                except FileNotFoundError:
+                    continue
+                deleted += 1
+        return deleted
+
+    def entries(self):
+        """
+        Reads every entry, fresh or stale.
+
+        Yields:
+            tuple: (player_name, entry) pairs.
+        """
+        return read_json_cache(self.directory)
+
+    def _evict(self, index):
+        while index and (
+            (self.max_entries is not None and len(index) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            key, size = index.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            (self.directory / f"{key}.json").unlink(missing_ok=True)
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: hits, misses, stale, evictions, entries and bytes.
+        """
+        with self.lock:
+            index = self._load_index()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "entries": len(index),
+                "bytes": self._bytes,
+            }
+
+
+class SQLiteCache:
+    """
+    Player cache in a single SQLite database in WAL mode, keyed on the
+    lowercased name and indexed on the player uuid. Stale entries are
+    skipped on read and can be deleted in bulk with purge_stale.
+
+    Args:
+        path (Path): Location of the database file.
+        ttl (float): Seconds an entry stays fresh, None to never expire.
+    """
+
+    # stay below SQLite's limit on host parameters per statement
+    BATCH_SIZE = 500
+
+    def __init__(self, path, ttl=c.CACHE_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.connection() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS players ("
+                "name TEXT PRIMARY KEY, uuid TEXT, favourites TEXT, "
+                "fetched_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS players_uuid ON players (uuid)")
+
+    def connection(self):
+        """Returns the connection of the calling thread."""
+        return thread_connection(self.local, self.path)
+
+    @staticmethod
+    def key(player_name):
+        return player_name.lower()
+
+    @staticmethod
+    def _entry(row):
+        return {"uuid": row[1], "favourites_2": row[2], "fetched_at": row[3]}
+
+    def _count(self, hits=0, misses=0, stale=0):
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+            self.stale += stale
+
+    def _is_stale(self, entry, now):
+        return self.ttl is not None and now - entry["fetched_at"] > self.ttl
+
+    def get(self, player_name):
+        """
+        Looks up a fresh entry.
+
+        Args:
+            player_name (str): The name of the player.
+
+        Returns:
+            dict: The entry with uuid, favourites_2 and fetched_at, or None
+            on a miss or when the entry is stale.
+        """
+        return self.get_many([player_name]).get(player_name)
+
+    def get_many(self, player_names):
+        """
+        Looks up several players with one query per BATCH_SIZE names.
+
+        Args:
+            player_names (iterable): Names of the players.
+
+        Returns:
+            dict: Mapping of player name to its fresh entry, misses and stale
+            entries are left out.
+        """
+        names = {}
+        for name in player_names:
+            names.setdefault(self.key(name), []).append(name)
+        keys = list(names)
+        rows = []
+        db = self.connection()
+        for i in range(0, len(keys), self.BATCH_SIZE):
+            chunk = keys[i : i + self.BATCH_SIZE]
+            marks = ",".join("?" * len(chunk))
+            rows += db.execute(
+                f"SELECT name, uuid, favourites, fetched_at FROM players "
+                f"WHERE name IN ({marks})",
+                chunk,
+            ).fetchall()
+        now = time.time()
+        found = {}
+        stale = 0
+        for row in rows:
+            entry = self._entry(row)
+            if self._is_stale(entry, now):
+                stale += 1
+                continue
+            for name in names[row[0]]:
+                found[name] = entry
+        self._count(hits=len(found), misses=len(keys) - len(rows), stale=stale)
+        return found
+
+    def get_by_uuid(self, uuid):
+        """
+        Looks up a fresh entry by player uuid.
+
+        Args:
+            uuid (str): The player uuid.
+
+        Returns:
+            dict: The most recent entry for the uuid, or None.
+        """
+        row = (
+            self.connection()
+            .execute(
+                "SELECT name, uuid, favourites, fetched_at FROM players "
+                "WHERE uuid = ? ORDER BY fetched_at DESC LIMIT 1",
+                (uuid,),
+            )
+            .fetchone()
+        )
+        entry = self._entry(row) if row else None
+        if entry is None:
+            self._count(misses=1)
+        elif self._is_stale(entry, time.time()):
+            self._count(stale=1)
+            entry = None
+        else:
+            self._count(hits=1)
+        return entry
+
+    def put(self, player_name, player_data):
+        """
+        Stores the slim form of a player document.
+
+        Args:
+            player_name (str): The name of the player.
+            player_data (dict): The player data returned by the API.
+
+        Returns:
+            dict: The stored entry.
+        """
+        entry = dict(slim_player_data(player_data), fetched_at=time.time())
+        self.put_entries([(player_name, entry)])
+        return entry
+
+    def put_entries(self, entries):
+        """
+        Stores many slim entries in one transaction.
+
+        Args:
+            entries (iterable): (player_name, entry) pairs.
+
+        Returns:
+            int: The number of stored entries.
+        """
+        rows = [
+            (self.key(name), e["uuid"], e["favourites_2"], e["fetched_at"])
+            for name, e in entries
+        ]
+        with self.connection() as db:
+            db.executemany("INSERT OR REPLACE INTO players VALUES (?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def delete(self, player_names):
+        """
+        Deletes the entries of several players.
+
+        Args:
+            player_names (iterable): Names of the players.
+
+        Returns:
+            int: The number of deleted entries.
+        """
+        keys = list(dict.fromkeys(self.key(name) for name in player_names))
+        deleted = 0
+        with self.connection() as db:
+            for i in range(0, len(keys), self.BATCH_SIZE):
+                chunk = keys[i : i + self.BATCH_SIZE]
+                marks = ",".join("?" * len(chunk))
+                deleted += db.execute(
+                    f"DELETE FROM players WHERE name IN ({marks})", chunk
+                ).rowcount
+        return deleted
+
+    def entries(self):
+        """
+        Reads every entry, fresh or stale.
+
+        Yields:
+            tuple: (player_name, entry) pairs.
+        """
+        rows = self.connection().execute(
+            "SELECT name, uuid, favourites, fetched_at FROM players"
+        )
+        for row in rows:
+            yield row[0], self._entry(row)
+
+    def purge_stale(self):
+        """
+        Deletes every entry older than the TTL.
+
+        Returns:
+            int: The number of deleted entries.
+        """
+        if self.ttl is None:
+            return 0
+        with self.connection() as db:
+            deleted = db.execute(
+                "DELETE FROM players WHERE fetched_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+        with self.lock:
+            self.evictions += deleted
+        return deleted
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: hits, misses, stale, evictions, entries and bytes.
+        """
+        db = self.connection()
+        entries = db.execute("SELECT COUNT(*) FROM players").fetchone()[0]
+        page_count = db.execute("PRAGMA page_count").fetchone()[0]
+        page_size = db.execute("PRAGMA page_size").fetchone()[0]
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": page_count * page_size,
+            }
+
+
+def read_json_cache(directory):
+    """
+    Reads every entry of a JSON cache directory, including full player
+    documents written by older versions.
+
+    Args:
+        directory (Path): The JSON cache directory.
+
+    Yields:
+        tuple: (player_name, entry) pairs.
+    """
+    for path in Path(directory).glob("*.json"):
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            if "fetched_at" not in entry:
+                entry = dict(slim_player_data(entry), fetched_at=path.stat().st_mtime)
+        except (OSError, ValueError, AttributeError) as e:
+            logging.warning(f"Skipping unreadable cache entry {path}: {e}")
+            continue
+        yield unquote(path.stem), entry
+
+
+def migrate_json_cache(directory, target, batch_size=1000):
+    """
+    Imports a JSON cache directory into another cache backend.
+
+    Args:
+        directory (Path): The JSON cache directory.
+        target (SQLiteCache): The cache to import into.
+        batch_size (int): Number of entries written per transaction.
+
+    Returns:
+        int: The number of imported entries.
+    """
+    imported = 0
+    batch = []
+    for item in read_json_cache(directory):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            imported += target.put_entries(batch)
+            batch = []
+    if batch:
+        imported += target.put_entries(batch)
+    return imported
+
+
+@lru_cache(maxsize=4)
+def _open_cache(backend, location):
+    if backend == "sqlite":
+        return SQLiteCache(location)
+    if backend == "json":
+        return PlayerCache(location)
+    raise ValueError(f"Unknown cache backend: {backend}")
+
+
+def get_cache():
+    """
+    Returns the process-wide cache selected by CACHE_BACKEND: a directory of
+    JSON files at CACHE_DIR, or the SQLite database at CACHE_DB, relative to
+    the current working directory.
+
+    Returns:
+        PlayerCache: The shared cache, or SQLiteCache.
+    """
+    location = c.CACHE_DB if c.CACHE_BACKEND == "sqlite" else c.CACHE_DIR
+    return _open_cache(c.CACHE_BACKEND, Path(location).resolve())
@@ -0,0 +1,331 @@
+import logging
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import constants as c
+from .metrics import metrics
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# letters, digits and underscores, at most 16 of them
+VALID_NAME = re.compile(r"\w{1,16}\Z", re.ASCII)
+
+
+def _header_number(headers, name):
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket that spaces out API requests. The bucket is
+    corrected from the RateLimit-Remaining and RateLimit-Reset headers of
+    every response, so the remaining quota is spread over the rest of the
+    window.
+
+    Args:
+        rate (float): Tokens added per second.
+        capacity (int): Maximum number of tokens, i.e. the allowed burst.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.resume_at = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        if self.resume_at and now >= self.resume_at:
+            # a new window started, the whole quota is available again
+            self.resume_at = 0.0
+            self.tokens = float(self.capacity)
+        elif not self.resume_at:
+            elapsed = now - self.updated
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Blocks until a token is available and takes it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.resume_at:
+                    wait = self.resume_at - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def update(self, remaining, reset):
+        """
+        Adjusts the bucket to the quota reported by the API.
+
+        Args:
+            remaining (float): Requests left in the current window.
+            reset (float): Seconds until the window resets.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            if remaining is not None:
+                self.tokens = min(self.tokens, remaining)
+            if reset is None or reset <= 0:
+                return
+            if remaining is not None and remaining < 1:
+                self._pause(reset, now)
+            elif remaining is not None:
+                self.rate = remaining / reset
+
+    def pause(self, seconds):
+        """Stops handing out tokens until `seconds` from now."""
+        with self.lock:
+            self._pause(seconds, time.monotonic())
+
+    def _pause(self, seconds, now):
+        self.tokens = 0.0
+        self.resume_at = max(self.resume_at, now + seconds)
+
+
+class APIClient:
+    """
+    HTTP client with a pooled keep-alive session, timeouts, jittered
+    exponential backoff and an optional shared rate limiter.
+
+    Args:
+        base_url (str): Base URL of the API.
+        limiter (RateLimiter): Limiter shared by all requests, or None.
+        timeout (float): Connect and read timeout in seconds.
+        retries (int): Retries after the first attempt.
+        backoff (float): Base delay of the exponential backoff in seconds.
+        backoff_max (float): Upper bound of a single backoff delay.
+        pool_size (int): Maximum number of pooled connections.
+    """
+
+    def __init__(
+        self,
+        base_url,
+        limiter=None,
+        timeout=c.API_TIMEOUT,
+        retries=c.API_RETRIES,
+        backoff=0.5,
+        backoff_max=30.0,
+        pool_size=c.FETCH_CONCURRENCY,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.limiter = limiter
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def backoff_delay(self, attempt):
+        """Jittered exponential delay before retry number `attempt`."""
+        delay = min(self.backoff_max, self.backoff * 2**attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def get(self, path, **params):
+        """
+        Sends a GET request, retrying on connection errors, 429 and 5xx.
+
+        Args:
+            path (str): Endpoint path below the base URL.
+            **params: Query parameters.
+
+        Returns:
+            requests.Response: The last response, or None if no response was
+            received.
+        """
+        return self._request(self.session.get, path, params=params)
+
+    def post(self, path, body):
+        """
+        Sends a POST request with a JSON body, retrying like get.
+
+        Args:
+            path (str): Endpoint path below the base URL.
+            body: The JSON body.
+
+        Returns:
+            requests.Response: The last response, or None if no response was
+            received.
+        """
+        return self._request(self.session.post, path, json=body)
+
+    def _request(self, send, path, **kwargs):
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        response = None
+        for attempt in range(self.retries + 1):
+            if self.limiter is not None:
+                self.limiter.acquire()
+            start = time.perf_counter()
+            try:
+                response = send(url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                logging.warning(f"Request to {path} failed: {e}")
+                metrics.count("http_errors")
+                response = None
+            else:
+                metrics.observe("http_request_seconds", time.perf_counter() - start)
+                metrics.count("http_responses", status=response.status_code)
+                self._track_quota(response)
+                if response.status_code not in RETRY_STATUS:
+                    return response
+                logging.warning(f"Request to {path} got {response.status_code}")
+            if attempt < self.retries:
+                time.sleep(self._retry_delay(response, attempt))
+        return response
+
+    def _track_quota(self, response):
+        if self.limiter is None:
+            return
+        remaining = _header_number(response.headers, "RateLimit-Remaining")
+        reset = _header_number(response.headers, "RateLimit-Reset")
+        self.limiter.update(remaining, reset)
+        if response.status_code == 429 and reset:
+            self.limiter.pause(reset)
+
+    def _retry_delay(self, response, attempt):
+        delay = self.backoff_delay(attempt)
+        if response is not None and response.status_code == 429:
+            retry_after = _header_number(response.headers, "Retry-After")
+            reset = _header_number(response.headers, "RateLimit-Reset")
+            delay = max(delay, retry_after or 0, reset or 0)
+        return delay
+
+
+class HypixelClient(APIClient):
+    """
+    Client for the Hypixel API, see APIClient for the keyword arguments.
+
+    Args:
+        api_key (str): Hypixel API key, sent in the API-Key header.
+        base_url (str): Base URL of the API, defaults to API_URL.
+    """
+
+    def __init__(self, api_key, base_url=None, **kwargs):
+        super().__init__(base_url or c.API_URL, **kwargs)
+        self.session.headers["API-Key"] = api_key or ""
+
+    def get_player(self, player_name):
+        """
+        Retrieves a player document by name.
+
+        Args:
+            player_name (str): The name of the player.
+
+        Returns:
+            dict: The player data, or None if the request fails.
+        """
+        return self._get_player(name=player_name)
+
+    def get_player_by_uuid(self, uuid):
+        """
+        Retrieves a player document by uuid.
+
+        Args:
+            uuid (str): The player uuid, without dashes.
+
+        Returns:
+            dict: The player data, or None if the request fails.
+        """
+        return self._get_player(uuid=uuid)
+
+    def _get_player(self, **params):
+        response = self.get("player", **params)
+        if response is None:
+            logging.error("Failed to retrieve player data, no response")
+            return None
+        if response.status_code != 200:
+            logging.error(
+                f"Failed to retrieve player data, status code: {response.status_code}"
+            )
+            return None
+        return response.json()
+
+
+class MojangClient(APIClient):
+    """
+    Client for the Mojang profile API, which resolves player names to uuids
+    without an API key. See APIClient for the keyword arguments.
+
+    Args:
+        base_url (str): Base URL of the API, defaults to MOJANG_API_URL.
+    """
+
+    def __init__(self, base_url=None, **kwargs):
+        super().__init__(base_url or c.MOJANG_API_URL, **kwargs)
+
+    def get_uuids(self, player_names):
+        """
+        Resolves names to uuids, MOJANG_BATCH_SIZE names per request.
+
+        Args:
+            player_names (list): Names of the players.
+
+        Returns:
+            dict: Mapping of lowercased name to uuid for every name that got
+            an answer, None for names without an account. Names of failed
+            requests are left out.
+        """
+        # the API rejects a whole request for a single malformed name
+        uuids = {
+            name.lower(): None for name in player_names if not VALID_NAME.match(name)
+        }
+        player_names = [name for name in player_names if VALID_NAME.match(name)]
+        for i in range(0, len(player_names), c.MOJANG_BATCH_SIZE):
+            chunk = player_names[i : i + c.MOJANG_BATCH_SIZE]
+            response = self.post("profiles/minecraft", chunk)
+            if response is None or response.status_code != 200:
+                status = "no response" if response is None else response.status_code
+                logging.error(f"Failed to resolve player names, status: {status}")
+                continue
+            uuids.update(dict.fromkeys((name.lower() for name in chunk), None))
+            for profile in response.json():
+                uuids[profile["name"].lower()] = profile["id"]
+        return uuids
+
+
+@lru_cache(maxsize=1)
+def get_client(api_key):
+    """
+    Returns the process-wide client for an API key, so that the session and
+    rate limiter are shared by every request.
+
+    Args:
+        api_key (str): Hypixel API key.
+
+    Returns:
+        HypixelClient: The shared client.
+    """
+    limiter = RateLimiter(c.API_RATE_LIMIT / c.API_RATE_PERIOD, c.API_RATE_LIMIT)
+    return HypixelClient(api_key, limiter=limiter)
+
+
+@lru_cache(maxsize=1)
+def get_mojang_client():
+    """
+    Returns the process-wide client of the Mojang profile API.
+
+    Returns:
+        MojangClient: The shared client.
+    """
+    limiter = RateLimiter(
+        c.MOJANG_RATE_LIMIT / c.MOJANG_RATE_PERIOD, c.MOJANG_RATE_LIMIT
+    )
+    return MojangClient(limiter=limiter)
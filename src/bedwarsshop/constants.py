@@ -34,9 +34,96 @@ ICONS_DICT = {
     "hardened_clay": "white_stained_clay.png",
 }
 
+# size of a shop slot in pixels, the image is 7 by 3 slots; font size and
+# line width below are for 320 pixel slots and scale with it
+CELL_SIZE = 320
 FONT_SIZE = 30
+# tried in order, the first one found is used
+FONTS = ["arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf"]
 LINE_WIDTH = 2
 LINE_COLOR = (255, 255, 255, 255)
 TEXT_COLOR = (255, 255, 255, 204)
 BACKGROUND_COLOR = (0, 0, 0, 0)
-SHOW_IMAGE = True
+# slot tint of analytics heatmaps, fully popular slots get HEAT_MAX_ALPHA
+HEAT_COLOR = (255, 64, 0)
+HEAT_MAX_ALPHA = 160
+# open every rendered image in a viewer, the --show option does it per run
+SHOW_IMAGE = False
+# "png", "webp" (lossless) or "png8" (PNG quantized to a 256 color palette)
+OUTPUT_FORMAT = "png"
+# zlib level 0-9 of PNG output, and whether to search for smaller encodings
+PNG_COMPRESS_LEVEL = 6
+PNG_OPTIMIZE = False
+# lossless WebP effort 0-6, higher is smaller but several times slower
+WEBP_METHOD = 0
+# "json" keeps one file per player in CACHE_DIR, "sqlite" one database at CACHE_DB
+CACHE_BACKEND = "json"
+CACHE_DIR = "cache"
+CACHE_DB = "cache/players.sqlite3"
+# seconds before a cached player is fetched again, None to never expire
+CACHE_TTL = 24 * 60 * 60
+CACHE_MAX_ENTRIES = 100_000
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# memory budget of the composited slot tiles kept by each render process
+TILE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+API_URL = "https://api.hypixel.net/v2"
+# seconds to wait for the API to connect and respond
+API_TIMEOUT = 10
+API_RETRIES = 4
+# Hypixel allows API_RATE_LIMIT requests every API_RATE_PERIOD seconds
+API_RATE_LIMIT = 300
+API_RATE_PERIOD = 300
+# maximum number of player lookups in flight in the async pipeline
+FETCH_CONCURRENCY = 32
+
+# players are cached and fetched by uuid; names are resolved through the
+# index at UUID_INDEX_DB and, when it does not know them, the Mojang API
+UUID_LOOKUP_ENABLED = True
+UUID_INDEX_DB = "cache/uuids.sqlite3"
+# seconds before a name is resolved again, as names can change hands, and
+# before a name without an account is looked up again
+UUID_TTL = 30 * 24 * 60 * 60
+UUID_MISSING_TTL = 24 * 60 * 60
+MOJANG_API_URL = "https://api.mojang.com"
+# names per request, the most the API accepts
+MOJANG_BATCH_SIZE = 10
+# Mojang allows about MOJANG_RATE_LIMIT requests every MOJANG_RATE_PERIOD seconds
+MOJANG_RATE_LIMIT = 600
+MOJANG_RATE_PERIOD = 600
+
+# address of `bedwarsshop serve`
+SERVE_HOST = "127.0.0.1"
+SERVE_PORT = 8000
+# fetch and render jobs run at once by the server, more requests wait
+SERVE_WORKERS = 8
+# memory budget of the encoded images kept by the server, keyed by layout hash
+SERVE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# records of `bedwarsshop ingest` handed to the cache and the renderer at once
+INGEST_BATCH_SIZE = 1000
+
+# shops per row of `bedwarsshop sheet`
+SHEET_COLUMNS = 8
+# gap around the shops of a sheet, and height and font size of the player
+# names above them, at BASE_CELL_SIZE
+SHEET_GAP = 40
+SHEET_HEADER_HEIGHT = 80
+SHEET_HEADER_FONT_SIZE = 56
+
+# frame colors of the changed slots in diff images, and the frame width at
+# BASE_CELL_SIZE
+DIFF_COLORS = {"added": (0, 200, 80), "removed": (230, 40, 40), "moved": (255, 190, 0)}
+DIFF_BORDER = 12
+# memory budget of the shops drawn without highlights, reused between diffs
+DIFF_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# keep every layout fetched from the API in an append-only history
+HISTORY_ENABLED = True
+HISTORY_DIR = "history"
+# number of shard files, players are spread over them by name
+HISTORY_SHARDS = 16
+# every this many snapshots of a player one is stored in full, the others as
+# changes to the previous one
+HISTORY_KEYFRAME_INTERVAL = 16
@@ -0,0 +1,215 @@
+"""
+Differences between two quick shop layouts, such as two snapshots of one
+player: which slots gained an item, lost one, or hold an item that moved
+there from another slot, and an image of the newer layout with those slots
+highlighted.
+"""
+
+from PIL import Image
+
+from . import constants as c
+from .atlas import icon_atlas
+from .layout import Layout, items
+from .render import (
+    COLUMNS,
+    ROWS,
+    TileCache,
+    draw_grid,
+    draw_slot,
+    layout_hash,
+    scaled,
+)
+
+# shops drawn without grid or highlights, keyed by layout hash, the starting
+# point of every diff image of that layout
+bases = TileCache(c.DIFF_CACHE_MAX_BYTES)
+
+
+class LayoutDiff:
+    """
+    Slot changes from one layout to another. Slots are numbered 0 to 20,
+    row by row.
+
+    Attributes:
+        added (list): (slot, item) for items that are new to the layout.
+        removed (list): (slot, item) for items no longer in the layout.
+        moved (list): (item, from slot, to slot) for items kept in another
+            slot.
+    """
+
+    __slots__ = ("added", "removed", "moved")
+
+    def __init__(self, added=(), removed=(), moved=()):
+        self.added = list(added)
+        self.removed = list(removed)
+        self.moved = list(moved)
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.moved)
+
+    def __repr__(self):
+        return (
+            f"LayoutDiff(added={self.added!r}, removed={self.removed!r}, "
+            f"moved={self.moved!r})"
+        )
+
+    def cells(self):
+        """
+        Returns what happened to every changed slot. A slot whose item was
+        replaced counts as added, or moved when the new item came from
+        another slot; a slot emptied by a move counts as moved.
+
+        Returns:
+            dict: Mapping of slot to "added", "removed" or "moved".
+        """
+        cells = {slot: "removed" for slot, _ in self.removed}
+        for _, source, target in self.moved:
+            cells.setdefault(source, "moved")
+            cells[target] = "moved"
+        cells.update((slot, "added") for slot, _ in self.added)
+        return cells
+
+
+def slot_position(slot):
+    """Returns the row and column of a slot, counted from 0."""
+    return divmod(slot, COLUMNS)
+
+
+def _slots(old, new):
+    # Layout pairs are compared on item ids, anything else on names
+    if isinstance(old, Layout) and isinstance(new, Layout):
+        return list(old.slots), list(new.slots), 0, items.name
+    old = [name for row in old for name in row]
+    new = [name for row in new for name in row]
+    return old, new, "null", str
+
+
+def diff_layouts(old, new):
+    """
+    Computes the slot changes between two layouts. An item counts as moved
+    when the new layout has it in a slot where the old one did not and the
+    old one had it in a slot that changed; items kept in several slots are
+    matched in slot order.
+
+    Args:
+        old (list): The earlier layout, a 2D list of item names or a Layout.
+        new (list): The later layout, in either form.
+
+    Returns:
+        LayoutDiff: The changes, empty if the layouts are the same.
+    """
+    old, new, null, name = _slots(old, new)
+    if old == new:
+        return LayoutDiff()
+    changed = [slot for slot in range(COLUMNS * ROWS) if old[slot] != new[slot]]
+    # slots every item left, in order
+    left = {}
+    for slot in changed:
+        if old[slot] != null:
+            left.setdefault(old[slot], []).append(slot)
+    added, moved = [], []
+    for slot in changed:
+        item = new[slot]
+        if item == null:
+            continue
+        sources = left.get(item)
+        if sources:
+            moved.append((name(item), sources.pop(0), slot))
+        else:
+            added.append((slot, name(item)))
+    removed = sorted(
+        (slot, name(item)) for item, slots in left.items() for slot in slots
+    )
+    return LayoutDiff(added, removed, moved)
+
+
+def diff_many(pairs):
+    """
+    Diffs many layout pairs, such as consecutive snapshots of many players.
+
+    Args:
+        pairs (iterable): (old, new) layout pairs.
+
+    Yields:
+        LayoutDiff: The changes of every pair, in order.
+    """
+    for old, new in pairs:
+        yield diff_layouts(old, new)
+
+
+def _draw_rows(image, layout, rows):
+    icons = icon_atlas(c.CELL_SIZE)
+    for y, row in enumerate(layout):
+        if y not in rows:
+            continue
+        for x, item in enumerate(row):
+            if item != "null":
+                draw_slot(image, item, icons.get(item), x, y)
+
+
+def _base(layout):
+    def build():
+        image = Image.new("RGBA", size, c.BACKGROUND_COLOR)
+        _draw_rows(image, layout, range(ROWS))
+        return image, size[0] * size[1] * 4
+
+    size = (COLUMNS * c.CELL_SIZE, ROWS * c.CELL_SIZE)
+    return bases.get(layout_hash(layout), build)
+
+
+def draw_changes(image, diff):
+    """
+    Frames the changed slots of a shop image in the color of their kind of
+    change, DIFF_COLORS. The frames are plain fills inside the grid lines,
+    much cheaper than blending a tint over the cells.
+
+    Args:
+        image (Image.Image): The RGBA shop image to draw on.
+        diff (LayoutDiff): The changes to highlight.
+    """
+    inset = scaled(c.LINE_WIDTH)
+    width = scaled(c.DIFF_BORDER)
+    for slot, kind in diff.cells().items():
+        y, x = slot_position(slot)
+        left, top = x * c.CELL_SIZE + inset, y * c.CELL_SIZE + inset
+        right = (x + 1) * c.CELL_SIZE - inset
+        bottom = (y + 1) * c.CELL_SIZE - inset
+        color = (*c.DIFF_COLORS[kind], 255)
+        for box in [
+            (left, top, right, top + width),
+            (left, bottom - width, right, bottom),
+            (left, top, left + width, bottom),
+            (right - width, top, right, bottom),
+        ]:
+            image.paste(color, box)
+
+
+def render_diff(old, new, diff=None):
+    """
+    Renders the newer layout with its changed slots highlighted. The
+    drawing of the older layout is kept in a cache and only the rows with
+    changes are drawn again, so a series of snapshots of one player mostly
+    reuses what is already drawn.
+
+    Args:
+        old (list): The earlier layout, a 2D list of item names or a Layout.
+        new (list): The later layout, in either form.
+        diff (LayoutDiff): The changes between them, computed if None.
+
+    Returns:
+        Image.Image: The RGBA image of the new layout, with the changed
+        slots framed.
+    """
+    if diff is None:
+        diff = diff_layouts(old, new)
+    image = _base(old).copy()
+    # whole rows are drawn again, as labels may reach into the cells to
+    # their right; they never reach below their own row
+    rows = {slot // COLUMNS for slot in diff.cells()}
+    for y in rows:
+        box = (0, y * c.CELL_SIZE, image.width, (y + 1) * c.CELL_SIZE)
+        image.paste(c.BACKGROUND_COLOR, box)
+    _draw_rows(image, new, rows)
+    draw_grid(image)
+    draw_changes(image, diff)
+    return image
@@ -1,23 +1,42 @@
-import json
+import io
 import logging
 import os
 from pathlib import Path
 
-import requests
-from PIL import Image, ImageDraw, ImageFont
-
 from . import constants as c
+from .cache import expand_player_data, get_cache, slim_player_data
+from .metrics import metrics
+from .singleflight import SingleFlight
+
+# Pillow, the renderer and the API client are imported by the functions that
+# use them: a render of a cached player never loads requests, and commands
+# that only read the cache never load Pillow.
 
+IMAGE_EXTENSIONS = {"png": ".png", "png8": ".png", "webp": ".webp"}
+OUTPUT_SETTINGS = (
+    "CELL_SIZE",
+    "OUTPUT_FORMAT",
+    "PNG_COMPRESS_LEVEL",
+    "PNG_OPTIMIZE",
+    "WEBP_METHOD",
+)
+# player lookups in flight, keyed by lowercased name
+player_lookups = SingleFlight()
 
+
+@metrics.timed("load_constants")
 def load_constants():
+    from dotenv import load_dotenv
+
     global API_KEY
+    load_dotenv()
     # check if API key is set
     API_KEY = os.getenv("HYPIXEL_API_KEY")
     if not API_KEY:
         logging.error("API key not set")
         return None
     # Create cache directory in current working directory
-    cache_dir = Path("cache")
+    cache_dir = Path(c.CACHE_DIR)
     cache_dir.mkdir(exist_ok=True)
     # Create output directory in current working directory
     output_dir = Path("output")
@@ -25,9 +44,29 @@ def load_constants():
     return True
 
 
+@metrics.timed("get_player_data")
 def get_player_data(player_name: str):
     """
-    Retrieves player data from the Hypixel API.
+    Retrieves player data from the Hypixel API. Concurrent lookups of the
+    same player, under any of their names, share one cache read or API
+    request, and its result.
+
+    Args:
+        player_name (str): The name of the player.
+
+    Returns:
+        dict: The player data as a dictionary, or None if the data retrieval
+        fails.
+    """
+    return player_lookups.do(player_name.lower(), fetch_player_data, player_name)
+
+
+def fetch_player_data(player_name):
+    """
+    Looks up one player in the cache, and in the API on a miss. Players are
+    cached and fetched by uuid, see resolve_uuid; lookups of one uuid are
+    shared with concurrent callers, and names that cannot be resolved are
+    looked up by name.
 
     Args:
         player_name (str): The name of the player.
@@ -36,27 +75,95 @@ def get_player_data(player_name: str):
         dict: The player data as a dictionary, or None if the data retrieval
         fails.
     """
-    # check if player is in cache
-    if os.path.exists(f"cache/{player_name}.json"):
+    from .uuids import resolve_uuid
+
+    uuid = resolve_uuid(player_name)
+    if uuid is None:
+        return _fetch_player_data(player_name, None)
+    # uuids never collide with the lowercased names of get_player_data
+    return player_lookups.do(uuid, _fetch_player_data, player_name, uuid)
+
+
+def _fetch_player_data(player_name, uuid):
+    cache = get_cache()
+    entry = cache.get(uuid or player_name)
+    if entry is not None:
+        metrics.count("cache_hits")
         logging.info(f"Player data found in cache: {player_name}")
-        with open(f"cache/{player_name}.json") as f:
-            data = json.load(f)
-            return data
-    url = f"https://api.hypixel.net/v2/player?key={API_KEY}&name={player_name}"
-    print(url)
-    response = requests.get(url)
-    if response.status_code == 200:
-        data = response.json()
-        with open(f"cache/{player_name}.json", "w") as f:
-            json.dump(data, f)
-        return data
+        return expand_player_data(entry)
+    metrics.count("cache_misses")
+    logging.info(f"Fetching player data from the API: {player_name}")
+    from .client import get_client
+
+    client = get_client(API_KEY)
+    if uuid is None:
+        data = client.get_player(player_name)
     else:
-        logging.error(
-            f"Failed to retrieve player data, status code: {response.status_code}"
-        )
-        return None
+        data = client.get_player_by_uuid(uuid)
+    if data is not None and data.get("success"):
+        key = slim_player_data(data)["uuid"]
+        if key is None:
+            key = player_name
+        elif uuid is None:
+            # the next lookup of this name goes by uuid
+            from .uuids import remember_uuid
+
+            remember_uuid(player_name, key)
+        cache.put(key, data)
+        if c.HISTORY_ENABLED:
+            record_history(player_name, data)
+    return data
+
+
+def record_history(player_name, player_data):
+    """
+    Adds the layout of freshly fetched player data to the snapshot history,
+    if it has one and it changed. Players are recorded under their uuid, or
+    their name for documents without one. A failing write is logged, never
+    raised.
 
+    Args:
+        player_name (str): The name of the player.
+        player_data (dict): The player data returned by the API.
+    """
+    from .history import get_history
+
+    slim = slim_player_data(player_data)
+    if slim["favourites_2"] is None:
+        return
+    try:
+        layout = split_favourites(slim["favourites_2"])
+        get_history().record(slim["uuid"] or player_name, layout)
+    except (OSError, ValueError) as e:
+        logging.error(f"Failed to record the history of {player_name}: {e}")
+
+
+def get_cached_player_data(player_names):
+    """
+    Looks up many players in the cache at once, without touching the
+    Hypixel API. Names are resolved to uuids together first, see
+    resolve_uuids.
+
+    Args:
+        player_names (iterable): Names of the players.
+
+    Returns:
+        dict: Mapping of player name to player data for the cached players.
+    """
+    from .uuids import resolve_uuids
 
+    player_names = list(player_names)
+    uuids = resolve_uuids(player_names)
+    keys = {name: uuids.get(name, name) for name in player_names}
+    entries = get_cache().get_many(dict.fromkeys(keys.values()))
+    return {
+        name: expand_player_data(entries[key])
+        for name, key in keys.items()
+        if key in entries
+    }
+
+
+@metrics.timed("parse_player_data")
 def parse_player_data(player_data):
     """
     Parses the player data and returns a 2D array representing the layers of
@@ -83,63 +190,186 @@ def parse_player_data(player_data):
     except (TypeError, KeyError):
         logging.error("Failed to parse player data")
         return None
+    return split_favourites(player_data)
+
+
+def split_favourites(favourites):
+    """
+    Splits a favourites_2 string into the 2D layout array.
+
+    Args:
+        favourites (str): Comma separated item names, row by row.
+
+    Returns:
+        list: A 2D array of 3 rows of 7 item names.
+    """
     # parse string data array
-    player_data = player_data.split(",")
+    favourites = favourites.split(",")
     # split into 2d array 7x3
-    layer_data = [player_data[0:7], player_data[7:14], player_data[14:21]]
-    return layer_data
+    return [favourites[0:7], favourites[7:14], favourites[14:21]]
 
 
-def create_image(player_data, player_name):
+@metrics.timed("render_shop")
+def render_shop(player_data):
     """
-    Create an image based on the player data.
+    Renders the shop image for the player data without saving it.
 
     Args:
-        player_data (list): A 2D list containing the player data.
+        player_data (list): A 2D list containing the player data, or a Layout.
 
     Returns:
-        None
+        Image.Image: The rendered RGBA image.
     """
-    image = Image.new(mode="RGBA", size=(7 * 320, 3 * 320), color=c.BACKGROUND_COLOR)
-    draw = ImageDraw.Draw(image)
-    fnt = ImageFont.truetype("arial.ttf", c.FONT_SIZE)
+    from .atlas import icon_atlas
+    from .render import draw_grid, draw_slot, new_canvas
+
+    image = new_canvas()
+    icons = icon_atlas(c.CELL_SIZE)
     for y, row in enumerate(player_data):
         for x, item in enumerate(row):
             if item == "null":
                 continue
-            # check if item is in icons dict
-            if item in c.ICONS_DICT:
-                # Get the package directory and construct icon path
-                package_dir = Path(__file__).parent
-                icon_path = package_dir / "assets" / "icons" / c.ICONS_DICT[item]
-                icon = Image.open(icon_path)
-                icon = icon.convert("RGBA")
-                icon = icon.resize((320, 320))
-                image.paste(icon, (x * 320, y * 320))
-            # white name text
-            draw.text(
-                (x * 320 + 10, y * 320 + 10),
-                item.replace("_", " "),
-                fill=c.TEXT_COLOR,
-                font=fnt,
-            )
-    # draw grid
-    for x in range(0, 7):
-        draw.line((x * 320, 0, x * 320, 3 * 320), fill=c.LINE_COLOR, width=c.LINE_WIDTH)
-    draw.line(
-        (7 * 320 - c.LINE_WIDTH, 0, 7 * 320 - c.LINE_WIDTH, 3 * 320),
-        fill=c.LINE_COLOR,
-        width=c.LINE_WIDTH,
-    )
-    for y in range(0, 3):
-        draw.line((0, y * 320, 7 * 320, y * 320), fill=c.LINE_COLOR, width=c.LINE_WIDTH)
-    draw.line(
-        (0, 3 * 320 - c.LINE_WIDTH, 7 * 320, 3 * 320 - c.LINE_WIDTH),
-        fill=c.LINE_COLOR,
-        width=c.LINE_WIDTH,
-    )
-    output_path = Path("output") / f"{player_name}.png"
-    image.save(output_path)
+            # icon and white name text, composited once per item
+            draw_slot(image, item, icons.get(item), x, y)
+    # grid lines go on top of every slot
+    draw_grid(image)
+    return image
+
+
+def output_settings():
+    """
+    Returns the output settings of constants.py, to hand them to render
+    processes.
+
+    Returns:
+        dict: Mapping of setting name to value.
+    """
+    return {name: getattr(c, name) for name in OUTPUT_SETTINGS}
+
+
+def configure_output(settings):
+    """
+    Overrides output settings of constants.py for this run.
+
+    Args:
+        settings (dict): Mapping of setting name to value, None values keep
+            the configured setting.
+    """
+    for name, value in settings.items():
+        if name not in OUTPUT_SETTINGS:
+            raise ValueError(f"Unknown output setting: {name}")
+        if value is not None:
+            setattr(c, name, value)
+
+
+def image_path(player_name):
+    """Where the image of a player is saved with the current OUTPUT_FORMAT."""
+    return Path("output") / f"{player_name}{IMAGE_EXTENSIONS[c.OUTPUT_FORMAT]}"
+
+
+@metrics.timed("encode_image")
+def encode_image(image, fp, image_format=None):
+    """
+    Encodes a shop image with the configured encoder settings.
+
+    Args:
+        image (Image.Image): The RGBA image.
+        fp (Path): File name or file object to write to.
+        image_format (str): "png", "webp" or "png8", defaults to
+            OUTPUT_FORMAT.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    image_format = image_format or c.OUTPUT_FORMAT
+    if image_format == "webp":
+        # exact keeps the color of transparent pixels, so no pixel changes
+        image.save(fp, "WEBP", lossless=True, exact=True, method=c.WEBP_METHOD)
+        return
+    if image_format == "png8":
+        from PIL import Image
+
+        image = image.quantize(256, method=Image.Quantize.FASTOCTREE)
+    elif image_format != "png":
+        raise ValueError(f"Unknown output format: {image_format}")
+    image.save(fp, "PNG", compress_level=c.PNG_COMPRESS_LEVEL, optimize=c.PNG_OPTIMIZE)
+
+
+def render_image(player_data, image_format=None):
+    """
+    Renders the shop image and encodes it in memory, without touching the
+    filesystem.
+
+    Args:
+        player_data (list): A 2D list containing the player data, or a Layout.
+        image_format (str): "png", "webp" or "png8", defaults to
+            OUTPUT_FORMAT.
+
+    Returns:
+        memoryview: The encoded image, ready to be written to a file, a
+        socket or an object store.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    buffer = io.BytesIO()
+    encode_image(render_shop(player_data), buffer, image_format)
+    # getvalue hands over the buffer without a copy, a getbuffer view would
+    # pin the BytesIO until the view is gone
+    return memoryview(buffer.getvalue())
+
+
+def read_layout_hash(hash_path):
+    """
+    Reads the layout hash stored next to an image.
+
+    Args:
+        hash_path (Path): The hash file.
+
+    Returns:
+        str: The stored hash, or None if there is none.
+    """
+    try:
+        return hash_path.read_text().strip()
+    except (FileNotFoundError, UnicodeDecodeError):
+        return None
+
+
+@metrics.timed("create_image")
+def create_image(player_data, player_name, show=None, force=False):
+    """
+    Create an image based on the player data and save it in OUTPUT_FORMAT.
+    The layout hash is stored in output/<player_name>.hash, and the render is
+    skipped when the saved image already shows the same layout with the same
+    settings.
+
+    Args:
+        player_data (list): A 2D list containing the player data, or a Layout.
+        player_name (str): The name of the player, used for the file name.
+        show (bool): Open the image in a viewer, defaults to SHOW_IMAGE.
+        force (bool): Render even if the saved image is up to date.
+
+    Returns:
+        bool: True if the image was rendered, False if it was unchanged.
+    """
+    from PIL import Image
+
+    from .render import layout_hash
+
+    output_path = image_path(player_name)
+    hash_path = Path("output") / f"{player_name}.hash"
+    digest = layout_hash(player_data)
+    if not force and read_layout_hash(hash_path) == digest and output_path.exists():
+        logging.info(f"Layout unchanged, keeping: {output_path.absolute()}")
+        if c.SHOW_IMAGE if show is None else show:
+            Image.open(output_path).show()
+        return False
+    data = render_image(player_data)
+    # a half-written image must never be paired with a matching hash
+    hash_path.unlink(missing_ok=True)
+    output_path.write_bytes(data)
+    hash_path.write_text(digest)
     logging.info(f"Image saved to: {output_path.absolute()}")
-    if c.SHOW_IMAGE:
-        image.show()
+    if c.SHOW_IMAGE if show is None else show:
+        Image.open(io.BytesIO(data)).show()
+    return True
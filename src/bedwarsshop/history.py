@@ -0,0 +1,492 @@
+"""
+Append-only history of quick shop layouts. Every player's layouts are kept
+in one of HISTORY_SHARDS shard files, a snapshot being written only when
+the layout changed. Most snapshots are deltas holding the slots that differ
+from the previous one, with a full keyframe every HISTORY_KEYFRAME_INTERVAL
+snapshots of a player so that no lookup decodes more than that many.
+
+Shard format, little-endian: the MAGIC header, then records of a kind byte,
+a body length byte and the body:
+
+    ITEM      item id, name            an entry of the shard's item vocabulary
+    PLAYER    u32 player id, name      an entry of the shard's player names
+    KEYFRAME  u32 player id, u32 time, 21 item ids
+    DELTA     u32 player id, u32 time, (slot, item id) per changed slot
+
+Ids are local to the shard, so files stay valid across processes. When a
+shard is opened it is scanned once through mmap to build the offset index:
+the vocabularies and, per player, the time and offset of every snapshot and
+which of them are keyframes. Lookups at a point in time bisect the times
+and decode from the latest keyframe before. Writers hold an exclusive
+flock on the shard while they index the records other processes appended,
+assign ids and append, or write the header of a new shard, and readers a
+shared one while they index. Processes sharing a directory neither
+interleave ids nor read half a record.
+A shard that fails validation raises ValueError rather than decoding garbage.
+"""
+
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_right
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+
+from . import constants as c
+from .layout import MAX_ITEMS, Layout, items
+from .render import COLUMNS, ROWS
+
+MAGIC = b"BWSH\x01"
+ITEM, PLAYER, KEYFRAME, DELTA = range(4)
+RECORD = struct.Struct("<BB")
+SNAPSHOT = struct.Struct("<II")
+PLAYER_ID = struct.Struct("<I")
+SLOTS = COLUMNS * ROWS
+
+
+def _names(layout):
+    if isinstance(layout, Layout):
+        return [items.name(item_id) for item_id in layout.slots]
+    return [name for row in layout for name in row]
+
+
+class Shard:
+    """
+    One shard file and its offset index.
+
+    Args:
+        path (Path): The shard file, created if missing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.item_names = []
+        self.item_ids = {}
+        self.player_names = []
+        self.player_ids = {}
+        # per player id: snapshot times and record offsets, in order, and
+        # the indices of the snapshots that are keyframes
+        self.times = []
+        self.offsets = []
+        self.keyframes = []
+        # item ids of the latest snapshot of the players written to, so that
+        # writes do not decode it again
+        self.latest = {}
+        # shard item id to process item id, for bytes.translate
+        self.to_process = bytearray(MAX_ITEMS)
+        self.size = 0
+        self.map = None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # opened without truncating, and the header only written under the
+        # lock, as another process may be creating the same shard
+        self.file = os.fdopen(os.open(path, os.O_CREAT | os.O_RDWR), "r+b")
+        with self._flock(fcntl.LOCK_EX):
+            if os.fstat(self.file.fileno()).st_size == 0:
+                self.file.write(MAGIC)
+                self.file.flush()
+            self._catch_up()
+
+    def close(self):
+        self.map = None
+        self.file.close()
+
+    @contextmanager
+    def _flock(self, operation):
+        """Holds an flock on the shard file, shared or exclusive."""
+        fcntl.flock(self.file, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+
+    def _catch_up(self, writing=False):
+        """
+        Indexes the records appended since the last scan. Called under the
+        shard's flock, exclusive when `writing`.
+        """
+        size = os.fstat(self.file.fileno()).st_size
+        if size == self.size:
+            return
+        self._remap()
+        if self.size == 0:
+            if self.map[: len(MAGIC)] != MAGIC:
+                raise ValueError(f"Not a snapshot shard: {self.path}")
+            self.size = len(MAGIC)
+        self._scan(size)
+        if self.size < size and writing:
+            # a record cut short by a crash, dropped so appends stay aligned
+            logging.warning(f"Dropping a truncated record at the end of {self.path}")
+            self.map.close()
+            self.file.truncate(self.size)
+            self._remap()
+
+    def _corrupt(self, offset, reason):
+        return ValueError(f"Corrupt record at byte {offset} of {self.path}: {reason}")
+
+    def _scan(self, end):
+        """
+        Indexes the complete records from self.size up to `end`, advancing
+        self.size past each one. The item ids in snapshots are checked when
+        they are decoded.
+
+        Raises:
+            ValueError: If a record is invalid, such as one referring to an
+            id that is not assigned yet.
+        """
+        data = self.map
+        offset = self.size
+        times, offsets, keyframes = self.times, self.offsets, self.keyframes
+        while offset + RECORD.size <= end:
+            kind, length = RECORD.unpack_from(data, offset)
+            body = offset + RECORD.size
+            if body + length > end:
+                break
+            if kind == DELTA or kind == KEYFRAME:
+                if length < SNAPSHOT.size:
+                    raise self._corrupt(offset, "snapshot too short")
+                player_id, timestamp = SNAPSHOT.unpack_from(data, body)
+                if player_id >= len(times):
+                    raise self._corrupt(offset, f"unknown player id {player_id}")
+                player_times = times[player_id]
+                if kind == KEYFRAME:
+                    if length != SNAPSHOT.size + SLOTS:
+                        raise self._corrupt(offset, "keyframe of the wrong size")
+                    keyframes[player_id].append(len(player_times))
+                elif not player_times or (length - SNAPSHOT.size) % 2:
+                    raise self._corrupt(offset, "invalid delta")
+                player_times.append(timestamp)
+                offsets[player_id].append(offset)
+                self.latest.pop(player_id, None)
+            elif kind == ITEM:
+                if length < 1 or data[body] != len(self.item_names):
+                    raise self._corrupt(offset, "unexpected item id")
+                self._add_item(data[body + 1 : body + length].decode())
+            elif kind == PLAYER:
+                if length < PLAYER_ID.size or (
+                    PLAYER_ID.unpack_from(data, body)[0] != len(self.player_names)
+                ):
+                    raise self._corrupt(offset, "unexpected player id")
+                self._add_player(data[body + PLAYER_ID.size : body + length].decode())
+            else:
+                raise self._corrupt(offset, f"unknown kind {kind}")
+            offset = body + length
+            self.size = offset
+
+    def _add_item(self, name):
+        item_id = len(self.item_names)
+        self.item_names.append(name)
+        self.item_ids[name] = item_id
+        self.to_process[item_id] = items.id(name)
+        return item_id
+
+    def _add_player(self, name):
+        player_id = len(self.player_names)
+        self.player_names.append(name)
+        self.player_ids[name] = player_id
+        self.times.append(array("I"))
+        self.offsets.append(array("Q"))
+        self.keyframes.append(array("I"))
+        return player_id
+
+    def _append(self, kind, body):
+        if len(body) > 255:
+            raise ValueError(f"Record body too long: {len(body)} bytes")
+        self.file.seek(0, os.SEEK_END)
+        offset = self.file.tell()
+        self.file.write(RECORD.pack(kind, len(body)) + body)
+        self.file.flush()
+        self.size = offset + RECORD.size + len(body)
+        return offset
+
+    def _item_ids(self, names):
+        try:
+            return bytes([self.item_ids[name] for name in names])
+        except KeyError:
+            pass
+        ids = bytearray(SLOTS)
+        for slot, name in enumerate(names):
+            item_id = self.item_ids.get(name)
+            if item_id is None:
+                if len(self.item_names) >= MAX_ITEMS:
+                    raise ValueError(f"Too many distinct items in {self.path}")
+                self._append(ITEM, bytes([len(self.item_names)]) + name.encode())
+                item_id = self._add_item(name)
+            ids[slot] = item_id
+        return bytes(ids)
+
+    def _decode(self, player_id, index):
+        """Item ids of a player's snapshot, from the latest keyframe before."""
+        self._ensure_mapped()
+        data = self.map
+        offsets = self.offsets[player_id]
+        keyframes = self.keyframes[player_id]
+        first = keyframes[bisect_right(keyframes, index) - 1]
+        if data[offsets[first]] != KEYFRAME:
+            raise self._corrupt(offsets[first], "expected a keyframe")
+        body = offsets[first] + RECORD.size + SNAPSHOT.size
+        slots = bytearray(data[body : body + SLOTS])
+        offset = offsets[first]
+        try:
+            for offset in offsets[first + 1 : index + 1]:
+                _, length = RECORD.unpack_from(data, offset)
+                body = offset + RECORD.size + SNAPSHOT.size
+                for i in range(body, offset + RECORD.size + length, 2):
+                    slots[data[i]] = data[i + 1]
+        except IndexError:
+            raise self._corrupt(offset, "delta slot out of range") from None
+        if max(slots) >= len(self.item_names):
+            raise self._corrupt(offset, "unknown item id")
+        return bytes(slots)
+
+    def _remap(self):
+        # the old map is left to the garbage collector, a scan may still be
+        # reading it
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _ensure_mapped(self):
+        if len(self.map) < self.size:
+            self._remap()
+
+    def layout(self, slots):
+        """Converts shard item ids to a Layout."""
+        return Layout(slots.translate(self.to_process))
+
+    def record(self, player_name, layout, timestamp):
+        """
+        Appends a snapshot of a player unless the layout is unchanged.
+
+        Returns:
+            bool: True if a snapshot was written.
+
+        Raises:
+            ValueError: If the snapshot is older than the player's latest.
+        """
+        names = _names(layout)
+        if len(names) != SLOTS:
+            raise ValueError(f"A layout has {SLOTS} slots, got {len(names)}")
+        with self.lock, self._flock(fcntl.LOCK_EX):
+            # ids are assigned only once every record of other writers is
+            # indexed
+            self._catch_up(writing=True)
+            player_id = self.player_ids.get(player_name)
+            if player_id is None:
+                body = PLAYER_ID.pack(len(self.player_names)) + player_name.encode()
+                self._append(PLAYER, body)
+                player_id = self._add_player(player_name)
+            times = self.times[player_id]
+            slots = self._item_ids(names)
+            count = len(times)
+            if count:
+                if timestamp < times[-1]:
+                    raise ValueError(
+                        f"Snapshot of {player_name} at {timestamp} is older "
+                        f"than the latest one at {times[-1]}"
+                    )
+                previous = self.latest.get(player_id)
+                if previous is None:
+                    previous = self._decode(player_id, count - 1)
+                if previous == slots:
+                    return False
+            header = SNAPSHOT.pack(player_id, timestamp)
+            keyframes = self.keyframes[player_id]
+            if not keyframes or count - keyframes[-1] >= c.HISTORY_KEYFRAME_INTERVAL:
+                offset = self._append(KEYFRAME, header + slots)
+                keyframes.append(count)
+            else:
+                changes = bytearray()
+                for slot, (old, new) in enumerate(zip(previous, slots, strict=True)):
+                    if old != new:
+                        changes += bytes((slot, new))
+                offset = self._append(DELTA, header + changes)
+            times.append(timestamp)
+            self.offsets[player_id].append(offset)
+            self.latest[player_id] = slots
+            return True
+
+    def history(self, player_name):
+        """(timestamp, item ids) of every snapshot of a player, oldest first."""
+        with self.lock, self._flock(fcntl.LOCK_SH):
+            self._catch_up()
+            player_id = self.player_ids.get(player_name)
+            if player_id is None:
+                return []
+            times = self.times[player_id]
+            return [(times[i], self._decode(player_id, i)) for i in range(len(times))]
+
+    def at(self, player_name, timestamp):
+        """Item ids of the snapshot in effect at a time, or None."""
+        with self.lock, self._flock(fcntl.LOCK_SH):
+            self._catch_up()
+            player_id = self.player_ids.get(player_name)
+            if player_id is None:
+                return None
+            index = bisect_right(self.times[player_id], timestamp) - 1
+            if index < 0:
+                return None
+            return self._decode(player_id, index)
+
+    def scan(self):
+        """
+        Reads every snapshot in file order, decoding deltas on the way.
+
+        Yields:
+            tuple: (player name, timestamp, item ids).
+        """
+        with self.lock, self._flock(fcntl.LOCK_SH):
+            self._catch_up()
+            self._ensure_mapped()
+            data, end = self.map, self.size
+            item_count = len(self.item_names)
+        # per player id, the item ids of the latest snapshot read
+        current = {}
+        offset = len(MAGIC)
+        while offset < end:
+            start = offset
+            kind, length = RECORD.unpack_from(data, start)
+            body = start + RECORD.size
+            offset = body + length
+            if kind < KEYFRAME:
+                continue
+            player_id, timestamp = SNAPSHOT.unpack_from(data, body)
+            body += SNAPSHOT.size
+            if kind == KEYFRAME:
+                slots = current[player_id] = bytearray(data[body:offset])
+            else:
+                slots = current[player_id]
+                try:
+                    for i in range(body, offset, 2):
+                        slots[data[i]] = data[i + 1]
+                except IndexError:
+                    raise self._corrupt(start, "delta slot out of range") from None
+            if max(slots) >= item_count:
+                raise self._corrupt(start, "unknown item id")
+            yield self.player_names[player_id], timestamp, bytes(slots)
+
+
+class SnapshotStore:
+    """
+    Layout history of many players, spread over shard files in a directory
+    by a hash of the lowercased player name.
+
+    Args:
+        directory (Path): Directory of the shard files, created if missing.
+        shards (int): Number of shard files.
+    """
+
+    def __init__(self, directory, shards=None):
+        self.directory = Path(directory)
+        self.shard_count = shards or c.HISTORY_SHARDS
+        self.shards = {}
+        self.lock = threading.Lock()
+
+    def _shard(self, index):
+        with self.lock:
+            shard = self.shards.get(index)
+            if shard is None:
+                path = self.directory / f"shard-{index:03d}.snap"
+                shard = self.shards[index] = Shard(path)
+            return shard
+
+    def shard(self, player_name):
+        """Returns the shard holding a player and the key it is stored under."""
+        key = player_name.lower()
+        return self._shard(zlib.crc32(key.encode()) % self.shard_count), key
+
+    def record(self, player_name, layout, timestamp=None):
+        """
+        Stores a snapshot of a player's layout, unless it equals the
+        player's latest snapshot.
+
+        Args:
+            player_name (str): The name of the player.
+            layout (list): A 2D list of item names, or a Layout.
+            timestamp (int): Seconds since the epoch, defaults to now.
+
+        Returns:
+            bool: True if a snapshot was written, False if it was unchanged.
+
+        Raises:
+            ValueError: If the layout does not have 21 slots, or the
+            snapshot is older than the latest one of the player.
+        """
+        shard, key = self.shard(player_name)
+        timestamp = int(time.time() if timestamp is None else timestamp)
+        return shard.record(key, layout, timestamp)
+
+    def history(self, player_name):
+        """
+        Returns every snapshot of a player.
+
+        Args:
+            player_name (str): The name of the player.
+
+        Returns:
+            list: (timestamp, Layout) pairs, oldest first.
+        """
+        shard, key = self.shard(player_name)
+        return [(t, shard.layout(slots)) for t, slots in shard.history(key)]
+
+    def at(self, player_name, timestamp):
+        """
+        Returns a player's layout as it was at a point in time.
+
+        Args:
+            player_name (str): The name of the player.
+            timestamp (int): Seconds since the epoch.
+
+        Returns:
+            Layout: The latest snapshot at or before `timestamp`, or None if
+            there is none.
+        """
+        shard, key = self.shard(player_name)
+        slots = shard.at(key, timestamp)
+        return None if slots is None else shard.layout(slots)
+
+    def latest(self, player_name):
+        """Returns the latest snapshot of a player as a Layout, or None."""
+        return self.at(player_name, 2**32 - 1)
+
+    def scan(self):
+        """
+        Reads every snapshot of every player, shard by shard.
+
+        Yields:
+            tuple: (player name, timestamp, Layout), in the order the
+            snapshots of each shard were written.
+        """
+        for index in range(self.shard_count):
+            if not (self.directory / f"shard-{index:03d}.snap").exists():
+                continue
+            shard = self._shard(index)
+            for player_name, timestamp, slots in shard.scan():
+                yield player_name, timestamp, shard.layout(slots)
+
+    def close(self):
+        with self.lock:
+            for shard in self.shards.values():
+                shard.close()
+            self.shards.clear()
+
+
+@lru_cache(maxsize=4)
+def _open_history(location):
+    return SnapshotStore(location)
+
+
+def get_history():
+    """
+    Returns the process-wide snapshot store at HISTORY_DIR, relative to the
+    current working directory.
+
+    Returns:
+        SnapshotStore: The shared store.
+    """
+    return _open_history(Path(c.HISTORY_DIR).resolve())
@@ -0,0 +1,273 @@
+"""
+Streaming import of newline-delimited dumps of Hypixel player documents into
+the player cache and the renderer.
+"""
+
+import json
+import logging
+import mmap
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from . import constants as c
+from .batch import render_player, warm_caches
+from .cache import get_cache, slim_player_data
+from .helpers import output_settings, split_favourites
+from .uuids import get_uuid_index
+
+# seconds between progress log lines
+PROGRESS_INTERVAL = 5.0
+
+# fields of a player document read without decoding the whole record; the
+# quick shop is the only favourites_2 field Hypixel sends
+FIELDS = {
+    name: (
+        f'"{name}"'.encode(),
+        re.compile(rf'"{name}"\s*:\s*"((?:[^"\\]|\\.)*)"'.encode()),
+    )
+    for name in ("favourites_2", "displayname", "uuid")
+}
+SUCCESS = re.compile(rb'"success"\s*:\s*true\b')
+
+
+class IngestReport:
+    """
+    Outcome of an ingest run.
+
+    Attributes:
+        records (int): Records read from the dump.
+        bytes (int): Bytes of the dump read so far.
+        stored (int): Players written to the cache.
+        rendered (int): Images rendered.
+        skipped (int): Images that were already up to date.
+        failures (Counter): Number of failed records per reason.
+        elapsed (float): Wall time of the run in seconds.
+    """
+
+    def __init__(self):
+        self.records = 0
+        self.bytes = 0
+        self.stored = 0
+        self.rendered = 0
+        self.skipped = 0
+        self.failures = Counter()
+        self.elapsed = 0.0
+
+    @property
+    def rate(self):
+        """Records ingested per second."""
+        return self.records / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        """
+        Formats the report for the terminal.
+
+        Returns:
+            str: One line per failure reason followed by the totals.
+        """
+        lines = [f"{reason}: {count}" for reason, count in self.failures.items()]
+        lines.append(
+            f"Ingested {self.records} records, {self.stored} cached, "
+            f"{self.rendered} rendered, {self.skipped} unchanged, "
+            f"{self.failures.total()} failed, in {self.elapsed:.2f}s "
+            f"({self.rate:.0f} records/s)"
+        )
+        return "\n".join(lines)
+
+
+def read_lines(path):
+    """
+    Reads the lines of a file through a memory map, so the file is never
+    loaded whole. Blank lines are skipped.
+
+    Args:
+        path (Path): The file to read.
+
+    Yields:
+        tuple: (line, offset of the end of the line) pairs, the line as
+        bytes without its newline.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                data.madvise(mmap.MADV_SEQUENTIAL)
+            start, size = 0, len(data)
+            while start < size:
+                end = data.find(b"\n", start)
+                if end == -1:
+                    end = size
+                line = data[start:end]
+                start = end + 1
+                if line.strip():
+                    yield line, min(start, size)
+
+
+def _scan_string(line, field):
+    # the value of the only `field` string in the line, or None when the
+    # field is missing, repeated or not a string; bytes.find is much faster
+    # than searching with the pattern
+    key, pattern = FIELDS[field]
+    at = line.find(key)
+    if at == -1 or line.find(key, at + len(key)) != -1:
+        return None
+    match = pattern.match(line, at)
+    if match is None:
+        return None
+    value = match[1]
+    if b"\\" in value:
+        return json.loads(b'"' + value + b'"')
+    return value.decode()
+
+
+def parse_record(line):
+    """
+    Reads the player name and slim cache entry of one dump record. The few
+    fields needed are picked out of the raw line when they are unambiguous,
+    otherwise the record is decoded in full.
+
+    Args:
+        line (bytes): One JSON player document, as returned by the API.
+
+    Returns:
+        tuple: (player_name, entry, None) on success, with entry as stored
+        by the cache, or (None, None, reason) if the record has no quick shop.
+    """
+    at = line.find(b'"success"')
+    if at != -1 and SUCCESS.match(line, at):
+        fields = {field: _scan_string(line, field) for field in FIELDS}
+        if None not in fields.values():
+            return fields["displayname"], slim_entry(fields), None
+    try:
+        player_data = json.loads(line)
+    except ValueError:
+        return None, None, "invalid JSON"
+    if not isinstance(player_data, dict) or not player_data.get("success"):
+        return None, None, "unsuccessful response"
+    player = player_data.get("player")
+    name = player.get("displayname") if isinstance(player, dict) else None
+    if not name:
+        return None, None, "no player name"
+    entry = slim_player_data(player_data)
+    if entry["favourites_2"] is None:
+        return None, None, "no quick shop"
+    return name, slim_entry(entry), None
+
+
+def slim_entry(fields):
+    """A cache entry with uuid and favourites_2, fetched now."""
+    return {
+        "uuid": fields["uuid"],
+        "favourites_2": fields["favourites_2"],
+        "fetched_at": time.time(),
+    }
+
+
+def ingest_dump(
+    path,
+    cache=True,
+    render=False,
+    render_workers=None,
+    force=False,
+    batch_size=c.INGEST_BATCH_SIZE,
+):
+    """
+    Streams a dump of player documents, one JSON document per line, into
+    the player cache and optionally the renderer, batch_size records at a
+    time. Progress is logged every PROGRESS_INTERVAL seconds.
+
+    Args:
+        path (Path): The dump file.
+        cache (bool): Store the players in the cache.
+        render (bool): Render an image of every player.
+        render_workers (int): Number of render processes, defaults to the
+            number of cores. With 1 the images are rendered in-process.
+        force (bool): Render even the images that are up to date.
+        batch_size (int): Number of records per batch.
+
+    Returns:
+        IngestReport: The outcome of the run.
+    """
+    report = IngestReport()
+    total_bytes = os.path.getsize(path)
+    render_workers = render_workers or os.cpu_count() or 1
+    start = last_progress = time.perf_counter()
+    renderer = None
+    if render:
+        warm_caches()
+        if render_workers > 1:
+            renderer = ProcessPoolExecutor(
+                render_workers, initializer=warm_caches, initargs=(output_settings(),)
+            )
+    try:
+        batch = []
+        for line, offset in read_lines(path):
+            report.records += 1
+            report.bytes = offset
+            name, entry, reason = parse_record(line)
+            if reason is not None:
+                report.failures[reason] += 1
+            else:
+                batch.append((name, entry))
+            if len(batch) >= batch_size:
+                _flush(batch, report, cache, render, renderer, force)
+                batch = []
+            now = time.perf_counter()
+            if now - last_progress >= PROGRESS_INTERVAL:
+                last_progress = now
+                logging.info(
+                    f"Ingested {report.records} records, "
+                    f"{report.bytes / 2**20:.0f}/{total_bytes / 2**20:.0f} MiB, "
+                    f"{report.records / (now - start):.0f} records/s"
+                )
+        _flush(batch, report, cache, render, renderer, force)
+    finally:
+        if renderer is not None:
+            renderer.shutdown()
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def _flush(batch, report, cache, render, renderer, force):
+    if not batch:
+        return
+    if cache:
+        # cached by uuid like fetched players, with the names in the index
+        keyed = [(entry["uuid"] or name, entry) for name, entry in batch]
+        report.stored += get_cache().put_entries(keyed)
+        get_uuid_index().put_many(
+            (name, entry["uuid"], entry["fetched_at"])
+            for name, entry in batch
+            if entry["uuid"]
+        )
+    if not render:
+        return
+    jobs = [(split_favourites(e["favourites_2"]), name, force) for name, e in batch]
+    if renderer is None:
+        outcomes = [_outcome(job[1], partial(render_player, *job)) for job in jobs]
+    else:
+        futures = [renderer.submit(render_player, *job) for job in jobs]
+        outcomes = [
+            _outcome(job[1], future.result)
+            for job, future in zip(jobs, futures, strict=True)
+        ]
+    for outcome in outcomes:
+        if outcome is True:
+            report.rendered += 1
+        elif outcome is False:
+            report.skipped += 1
+        else:
+            report.failures[outcome] += 1
+
+
+def _outcome(player_name, render):
+    try:
+        return render()
+    except Exception as e:
+        logging.error(f"Failed to render image for {player_name}: {e}")
+        return "failed to render image"
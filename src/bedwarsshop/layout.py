@@ -0,0 +1,146 @@
+import threading
+
+from . import constants as c
+from .render import COLUMNS, ROWS
+
+MAX_ITEMS = 256
+
+
+class ItemRegistry:
+    """
+    Interns item names as ids that fit in a byte. Id 0 is "null", the items
+    of ICONS_DICT follow in order, and unknown items get the next free id
+    the first time they are seen, so ids of unknown items are only stable
+    within one process.
+
+    Args:
+        names (iterable): Known item names.
+    """
+
+    def __init__(self, names):
+        self.names = ["null", *names]
+        self.ids = {name: item_id for item_id, name in enumerate(self.names)}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def id(self, name):
+        """
+        Returns the id of an item, registering it if it is new.
+
+        Raises:
+            ValueError: If all MAX_ITEMS ids are taken.
+        """
+        item_id = self.ids.get(name)
+        if item_id is not None:
+            return item_id
+        with self.lock:
+            item_id = self.ids.get(name)
+            if item_id is None:
+                if len(self.names) >= MAX_ITEMS:
+                    raise ValueError(f"Too many distinct items to intern: {name}")
+                item_id = len(self.names)
+                self.names.append(name)
+                self.ids[name] = item_id
+        return item_id
+
+    def name(self, item_id):
+        """Returns the item name of an id."""
+        return self.names[item_id]
+
+
+items = ItemRegistry(c.ICONS_DICT)
+
+
+class Layout:
+    """
+    Compact quick shop layout: the 21 slots as one byte each, holding ids of
+    the process-wide item registry. Layouts are immutable, hash and compare
+    by their bytes, and iterate like the nested list form, one list of item
+    names per row, so they can be passed wherever a layout list is accepted.
+
+    Args:
+        slots (bytes): Item ids of the slots, row by row.
+
+    Raises:
+        ValueError: If there are not COLUMNS * ROWS slots.
+    """
+
+    __slots__ = ("slots",)
+
+    def __init__(self, slots):
+        slots = bytes(slots)
+        if len(slots) != COLUMNS * ROWS:
+            raise ValueError(f"A layout has {COLUMNS * ROWS} slots, got {len(slots)}")
+        self.slots = slots
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Builds a layout from the nested list form of parse_player_data.
+
+        Args:
+            rows (list): ROWS lists of COLUMNS item names.
+
+        Raises:
+            ValueError: If the rows do not have the shop's shape.
+        """
+        if len(rows) != ROWS or any(len(row) != COLUMNS for row in rows):
+            raise ValueError(f"A layout has {ROWS} rows of {COLUMNS} slots")
+        return cls._from_names([name for row in rows for name in row])
+
+    @classmethod
+    def from_favourites(cls, favourites):
+        """
+        Builds a layout from a favourites_2 string.
+
+        Raises:
+            ValueError: If the string does not hold COLUMNS * ROWS items.
+        """
+        return cls._from_names(favourites.split(","))
+
+    @classmethod
+    def _from_names(cls, names):
+        # checked first, so malformed layouts do not fill up the registry
+        if len(names) != COLUMNS * ROWS:
+            raise ValueError(f"A layout has {COLUMNS * ROWS} slots, got {len(names)}")
+        # known names are looked up directly, much faster than items.id
+        ids = items.ids
+        return cls(
+            bytes([ids[name] if name in ids else items.id(name) for name in names])
+        )
+
+    def to_rows(self):
+        """Returns the nested list form, ROWS lists of item names."""
+        return [self.row(y) for y in range(ROWS)]
+
+    def row(self, y):
+        """Item names of row y, left to right."""
+        return [items.name(i) for i in self.slots[y * COLUMNS : (y + 1) * COLUMNS]]
+
+    def column(self, x):
+        """Item names of column x, top to bottom."""
+        return [items.name(i) for i in self.slots[x::COLUMNS]]
+
+    def __getitem__(self, position):
+        y, x = position
+        return items.name(self.slots[y * COLUMNS + x])
+
+    def __iter__(self):
+        return iter(self.to_rows())
+
+    def __eq__(self, other):
+        if not isinstance(other, Layout):
+            return NotImplemented
+        return self.slots == other.slots
+
+    def __hash__(self):
+        return hash(self.slots)
+
+    def __repr__(self):
+        return f"Layout.from_rows({self.to_rows()!r})"
+
+    def __reduce__(self):
+        # pickled by name, ids of unknown items differ between processes
+        return Layout.from_rows, (self.to_rows(),)
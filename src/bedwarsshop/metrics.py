@@ -0,0 +1,276 @@
+"""
+Counters and latency histograms of the hot paths, reported as JSON by
+--profile and in the Prometheus text format by the render server. Recording
+is off until enable is called, and then costs a single attribute check.
+Values kept elsewhere, such as the size of a cache, are registered once and
+read when a report is made.
+"""
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+# upper bounds in seconds of the histogram buckets, as Prometheus' defaults
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PREFIX = "bedwarsshop_"
+_DISABLED = nullcontext()
+
+
+class Histogram:
+    """Counts of observed durations per bucket, with their sum and maximum."""
+
+    __slots__ = ("buckets", "count", "sum", "max")
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def cumulative(self):
+        """(upper bound, observations at or below it) pairs, "+Inf" last."""
+        bounds = [*map(str, BUCKETS), "+Inf"]
+        total = 0
+        pairs = []
+        for bound, count in zip(bounds, self.buckets, strict=True):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+class _Timer:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        self.metrics.observe("stage_seconds", seconds, stage=self.stage)
+
+
+def _label_text(labels):
+    return ",".join(f'{name}="{value}"' for name, value in labels)
+
+
+def _key_text(name, labels):
+    return f"{name}{{{_label_text(labels)}}}" if labels else name
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and histograms, each identified by a
+    name and optional labels.
+
+    Attributes:
+        enabled (bool): Whether anything is recorded.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.sources = {}
+        self.started = time.perf_counter()
+
+    def enable(self):
+        """Starts recording from a clean slate."""
+        self.reset()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started = time.perf_counter()
+
+    def count(self, name, value=1, **labels):
+        """Adds `value` to a counter."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """Records a duration in a histogram."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def register(self, name, read, counters=()):
+        """
+        Registers values that are read whenever a report is made, rather
+        than recorded as they change.
+
+        Args:
+            name (str): Prefix of the value names, e.g. 'tile_cache'.
+            read (callable): Returns a dict of value name to value.
+            counters (iterable): Names of the values that only grow, reported
+                as counters; the others are reported as gauges.
+        """
+        self.sources[name] = (read, frozenset(counters))
+
+    def _read_sources(self):
+        """(kind, name, value) of every registered value, sorted by name."""
+        values = []
+        for prefix, (read, counters) in self.sources.items():
+            for name, value in read().items():
+                kind = "counter" if name in counters else "gauge"
+                values.append((kind, f"{prefix}_{name}", value))
+        return sorted(values, key=lambda item: item[1])
+
+    def timer(self, stage):
+        """
+        Context manager recording the duration of a pipeline stage in the
+        stage_seconds histogram.
+
+        Args:
+            stage (str): Name of the stage.
+        """
+        if not self.enabled:
+            return _DISABLED
+        return _Timer(self, stage)
+
+    def timed(self, stage):
+        """Decorator timing every call of a function as a pipeline stage."""
+
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with _Timer(self, stage):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def report(self):
+        """
+        Returns everything recorded so far.
+
+        Returns:
+            dict: elapsed_s; stages, mapping each stage to its call count and
+            total, mean and max seconds; counters; gauges; and histograms
+            with their cumulative buckets. Labelled entries are keyed as in
+            Prometheus, e.g. 'http_responses{status="200"}'.
+        """
+        report = {
+            "elapsed_s": 0.0,
+            "stages": {},
+            "counters": {},
+            "gauges": {},
+            "histograms": {},
+        }
+        for kind, name, value in self._read_sources():
+            report[f"{kind}s"][name] = value
+        with self.lock:
+            report["elapsed_s"] = time.perf_counter() - self.started
+            for (name, labels), value in sorted(self.counters.items()):
+                report["counters"][_key_text(name, labels)] = value
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                summary = {
+                    "count": histogram.count,
+                    "total_s": histogram.sum,
+                    "mean_s": histogram.sum / histogram.count,
+                    "max_s": histogram.max,
+                }
+                if name == "stage_seconds":
+                    report["stages"][dict(labels)["stage"]] = summary
+                else:
+                    summary["buckets"] = dict(histogram.cumulative())
+                    report["histograms"][_key_text(name, labels)] = summary
+        return report
+
+    def prometheus(self):
+        """
+        Formats everything recorded so far in the Prometheus text format.
+
+        Returns:
+            str: The exposition, every metric prefixed with PREFIX.
+        """
+        lines = []
+        typed = set()
+        for kind, name, value in self._read_sources():
+            metric = f"{PREFIX}{name}_total" if kind == "counter" else PREFIX + name
+            typed.add(metric)
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f"{metric} {value}")
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                metric = f"{PREFIX}{name}_total"
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{_key_text(metric, labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                metric = f"{PREFIX}{name}"
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f"# TYPE {metric} histogram")
+                for bound, count in histogram.cumulative():
+                    bucket_labels = (*labels, ("le", bound))
+                    lines.append(
+                        f"{_key_text(metric + '_bucket', bucket_labels)} {count}"
+                    )
+                lines.append(f"{_key_text(metric + '_sum', labels)} {histogram.sum}")
+                lines.append(
+                    f"{_key_text(metric + '_count', labels)} {histogram.count}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+def memory_report(limit=10):
+    """
+    Summarizes the allocations traced by tracemalloc, which must be running.
+
+    Args:
+        limit (int): Number of allocation sites listed.
+
+    Returns:
+        dict: current_bytes, peak_bytes, and the top allocation sites with
+        their size and number of blocks.
+    """
+    import tracemalloc
+
+    current, peak = tracemalloc.get_traced_memory()
+    statistics = tracemalloc.take_snapshot().statistics("lineno")[:limit]
+    return {
+        "current_bytes": current,
+        "peak_bytes": peak,
+        "top": [
+            {
+                "location": str(statistic.traceback[0]),
+                "size_bytes": statistic.size,
+                "blocks": statistic.count,
+            }
+            for statistic in statistics
+        ],
+    }
+
+
+metrics = Metrics()
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from . import constants as c
+from .helpers import (
+    create_image,
+    fetch_player_data,
+    parse_player_data,
+    player_lookups,
+)
+
+
+async def get_player_data_async(player_name, executor=None):
+    """
+    Async sibling of get_player_data. The lookup goes through the same cache,
+    HTTP session and rate limiter, on a worker thread so the event loop is
+    never blocked. Concurrent lookups of the same player, from threads or
+    tasks, share one request; waiting tasks do not hold a worker thread.
+
+    Args:
+        player_name (str): The name of the player.
+        executor (Executor): Executor to run the lookup on, or None for the
+            loop's default executor.
+
+    Returns:
+        dict: The player data, or None if the data retrieval fails.
+    """
+    loop = asyncio.get_running_loop()
+    return await player_lookups.do_async(
+        player_name.lower(),
+        loop.run_in_executor,
+        executor,
+        fetch_player_data,
+        player_name,
+    )
+
+
+async def stream_layouts(player_names, limit=c.FETCH_CONCURRENCY):
+    """
+    Resolves many players concurrently and yields each parsed layout as soon
+    as it arrives. At most `limit` lookups are in flight, and names are only
+    taken from `player_names` when a slot frees up, so it may be a large or
+    lazy iterable.
+
+    Args:
+        player_names (iterable): Names of the players.
+        limit (int): Maximum number of lookups in flight.
+
+    Yields:
+        tuple: (player_name, layout), where layout is None if the player
+        could not be retrieved or parsed.
+    """
+    names = iter(player_names)
+    results = asyncio.Queue()
+    done = object()
+
+    async def worker(executor):
+        try:
+            for name in names:
+                try:
+                    data = await get_player_data_async(name, executor)
+                    layout = parse_player_data(data) if data else None
+                except Exception as e:
+                    logging.error(f"Failed to retrieve player data for {name}: {e}")
+                    layout = None
+                await results.put((name, layout))
+        finally:
+            # posted however the worker ends, so the stream never waits on it
+            results.put_nowait(done)
+
+    with ThreadPoolExecutor(limit) as executor:
+        workers = [asyncio.create_task(worker(executor)) for _ in range(limit)]
+        try:
+            running = len(workers)
+            while running:
+                item = await results.get()
+                if item is done:
+                    running -= 1
+                else:
+                    yield item
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def fetch_and_render(player_names, limit=c.FETCH_CONCURRENCY, render=None):
+    """
+    Streams layouts from stream_layouts straight into the renderer, so the
+    first images are written while later players are still being fetched.
+
+    Args:
+        player_names (iterable): Names of the players.
+        limit (int): Maximum number of lookups in flight.
+        render (callable): Called with (layout, player_name) and returns
+            whether an image was rendered, defaults to create_image without a
+            viewer. It runs on a worker thread.
+
+    Returns:
+        dict: Mapping of player name to True if an image was rendered, False
+        if it was unchanged or failed.
+    """
+    if render is None:
+        render = partial(create_image, show=False)
+    loop = asyncio.get_running_loop()
+    outcome = {}
+    renders = {}
+    with ThreadPoolExecutor(1) as renderer:
+        async for name, layout in stream_layouts(player_names, limit):
+            if layout is None:
+                outcome[name] = False
+            else:
+                renders[name] = loop.run_in_executor(renderer, render, layout, name)
+        for name, future in renders.items():
+            try:
+                outcome[name] = bool(await future)
+            except Exception as e:
+                logging.error(f"Failed to render image for {name}: {e}")
+                outcome[name] = False
+    return outcome
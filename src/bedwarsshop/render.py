@@ -0,0 +1,413 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+from . import constants as c
+from .atlas import atlas_fingerprint, icon_files
+from .metrics import metrics
+
+COLUMNS = 7
+ROWS = 3
+# lengths in this module and in constants.py are given for cells of this
+# size and scaled to CELL_SIZE
+BASE_CELL_SIZE = 320
+LABEL_OFFSET = 10
+LABEL_CACHE_SIZE = 128
+# bump when a change to the drawing code alters the rendered images
+RENDER_VERSION = 1
+
+
+def scaled(length):
+    """
+    Scales a length given for BASE_CELL_SIZE cells to the configured cell
+    size, keeping at least one pixel.
+
+    Args:
+        length (int): Length in pixels at BASE_CELL_SIZE.
+
+    Returns:
+        int: Length in pixels at CELL_SIZE.
+    """
+    return max(1, round(length * c.CELL_SIZE / BASE_CELL_SIZE))
+
+
+def grid_lines(columns, rows, cell_size, line_width):
+    """
+    Returns the end points of every grid line of a shop image.
+
+    Args:
+        columns (int): Number of cells per row.
+        rows (int): Number of rows.
+        cell_size (int): Size of a cell in pixels.
+        line_width (int): Width of the grid lines.
+
+    Returns:
+        list: Line coordinates as (x0, y0, x1, y1) tuples.
+    """
+    width, height = columns * cell_size, rows * cell_size
+    lines = [(x * cell_size, 0, x * cell_size, height) for x in range(0, columns)]
+    lines.append((width - line_width, 0, width - line_width, height))
+    lines += [(0, y * cell_size, width, y * cell_size) for y in range(0, rows)]
+    lines.append((0, height - line_width, width, height - line_width))
+    return lines
+
+
+@lru_cache(maxsize=4)
+def grid_overlay(columns, rows, cell_size, line_width):
+    """
+    Returns the grid lines of a shop image as small masks, drawn once per
+    layout geometry and line width. Keeping one mask per line means the
+    overlay only touches the pixels under the lines, and lines that cover
+    their whole bounding box are plain fills.
+
+    Args:
+        columns (int): Number of cells per row.
+        rows (int): Number of rows.
+        cell_size (int): Size of a cell in pixels.
+        line_width (int): Width of the grid lines.
+
+    Returns:
+        tuple: (box, mask) pairs, where mask is an "L" image that is 255 on
+        the line, or None when the line fills its box.
+    """
+    size = (columns * cell_size, rows * cell_size)
+    overlay = []
+    for line in grid_lines(columns, rows, cell_size, line_width):
+        mask = Image.new(mode="L", size=size, color=0)
+        ImageDraw.Draw(mask).line(line, fill=255, width=line_width)
+        box = mask.getbbox()
+        mask = mask.crop(box)
+        overlay.append((box, None if mask.getextrema() == (255, 255) else mask))
+    return tuple(overlay)
+
+
+def new_canvas():
+    """
+    Returns an empty shop canvas. The background is a flat color, which
+    Pillow fills faster than it copies a prepared layer.
+
+    Returns:
+        Image.Image: An RGBA canvas filled with BACKGROUND_COLOR.
+    """
+    size = (COLUMNS * c.CELL_SIZE, ROWS * c.CELL_SIZE)
+    return Image.new(mode="RGBA", size=size, color=c.BACKGROUND_COLOR)
+
+
+def draw_grid(image):
+    """
+    Composites the cached grid lines on top of a finished shop image.
+
+    Args:
+        image (Image.Image): The canvas to draw the grid on.
+    """
+    for box, mask in grid_overlay(COLUMNS, ROWS, c.CELL_SIZE, scaled(c.LINE_WIDTH)):
+        if mask is None:
+            image.paste(c.LINE_COLOR, box)
+        else:
+            image.paste(c.LINE_COLOR, box[:2], mask)
+
+
+@lru_cache(maxsize=8)
+def open_font(name, size):
+    """
+    Opens a font once per process.
+
+    Args:
+        name (str): TrueType font file name, or None for Pillow's default font.
+        size (int): Font size.
+
+    Returns:
+        ImageFont.FreeTypeFont: The loaded font.
+
+    Raises:
+        OSError: If the font cannot be found.
+    """
+    if name is None:
+        return ImageFont.load_default(size)
+    return ImageFont.truetype(name, size)
+
+
+@lru_cache(maxsize=8)
+def resolve_font(size):
+    """
+    Picks the first available font of FONTS, falling back to Pillow's
+    default font on hosts that have none of them.
+
+    Args:
+        size (int): Font size.
+
+    Returns:
+        str: The font file name, or None for Pillow's default font.
+    """
+    for name in c.FONTS:
+        try:
+            open_font(name, size)
+        except OSError:
+            continue
+        return name
+    logging.warning(f"None of {c.FONTS} found, using the default font")
+    return None
+
+
+def label_style():
+    """
+    Returns the font and placement of labels at the configured cell size.
+
+    Returns:
+        tuple: (font_name, font_size, offset) for label_tile.
+    """
+    size = scaled(c.FONT_SIZE)
+    return resolve_font(size), size, scaled(LABEL_OFFSET)
+
+
+def render_label(label, font_name, size, color, offset=LABEL_OFFSET):
+    """
+    Renders a label into an alpha tile, uncached. Labels that are longer
+    than a cell keep their overflow so they look the same as text drawn in
+    place.
+
+    Args:
+        label (str): The text to render.
+        font_name (str): Font file name as returned by resolve_font.
+        size (int): Font size.
+        color (tuple): RGBA text color.
+        offset (int): Distance of the text from the top left of the cell.
+
+    Returns:
+        tuple: (color, box, mask) where box is the bounding box of the mask
+        inside the cell, or None if the label has no visible pixels.
+    """
+    metrics.count("label_renders")
+    font = open_font(font_name, size)
+    _, _, right, bottom = font.getbbox(label)
+    # leave room for glyphs that reach past their bounding box
+    width, height = offset + right + size, offset + bottom + size
+    mask = Image.new(mode="L", size=(width, height), color=0)
+    ImageDraw.Draw(mask).text((offset, offset), label, fill=255, font=font)
+    box = mask.getbbox()
+    if box is None:
+        return None
+    return color, box, mask.crop(box)
+
+
+@lru_cache(maxsize=LABEL_CACHE_SIZE)
+def label_tile(label, font_name, size, color, offset=LABEL_OFFSET):
+    """
+    Pre-renders a label into an alpha tile, cached for the item labels that
+    repeat across shops. See render_label for the arguments and result.
+    """
+    return render_label(label, font_name, size, color, offset)
+
+
+def draw_label(image, item, x, y):
+    """
+    Composites the label of an item into the cell at column x and row y.
+
+    Args:
+        image (Image.Image): The canvas to draw on.
+        item (str): The item id, underscores are shown as spaces.
+        x (int): Column of the cell.
+        y (int): Row of the cell.
+    """
+    font_name, size, offset = label_style()
+    label = item.replace("_", " ")
+    tile = label_tile(label, font_name, size, c.TEXT_COLOR, offset)
+    if tile is None:
+        return
+    color, box, mask = tile
+    image.paste(color, (x * c.CELL_SIZE + box[0], y * c.CELL_SIZE + box[1]), mask)
+
+
+class TileCache:
+    """
+    LRU cache of composited slot tiles, bounded by the total size of the
+    tiles in bytes rather than by their number.
+
+    Args:
+        max_bytes (int): Memory budget of the cached tiles.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.tiles = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, build):
+        """
+        Returns the tile for `key`, building it on a miss.
+
+        Args:
+            key (tuple): Hashable description of the tile.
+            build (callable): Returns (tile, size in bytes) for a new tile.
+
+        Returns:
+            Image.Image: The tile.
+        """
+        with self.lock:
+            cached = self.tiles.get(key)
+            if cached is not None:
+                self.tiles.move_to_end(key)
+                self.hits += 1
+                return cached[0]
+            self.misses += 1
+        tile, size = build()
+        with self.lock:
+            if key not in self.tiles:
+                self.tiles[key] = (tile, size)
+                self.bytes += size
+            while self.bytes > self.max_bytes and len(self.tiles) > 1:
+                _, (_, evicted) = self.tiles.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+        return tile
+
+    def clear(self):
+        """Drops every tile and resets the counters."""
+        with self.lock:
+            self.tiles.clear()
+            self.bytes = self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: hits, misses, evictions, entries, bytes and max_bytes.
+        """
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.tiles),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+slot_tiles = TileCache(c.TILE_CACHE_MAX_BYTES)
+metrics.register("tile_cache", slot_tiles.stats, ("hits", "misses", "evictions"))
+
+
+def _build_slot_tile(icon, label):
+    width = height = c.CELL_SIZE
+    if label is not None:
+        _, box, _ = label
+        width, height = max(width, box[2]), max(height, box[3])
+    tile = Image.new(mode="RGBA", size=(width, height), color=c.BACKGROUND_COLOR)
+    tile.paste(icon, (0, 0))
+    if label is not None:
+        color, box, mask = label
+        tile.paste(color, (box[0], box[1]), mask)
+    return tile, width * height * 4
+
+
+def slot_tile(item, icon):
+    """
+    Returns the composited tile of a slot: the icon with its label on top.
+    A label longer than the cell is kept over the background to the right,
+    so pasting the tile looks the same as drawing the label in place.
+
+    Args:
+        item (str): The item id.
+        icon (Image.Image): The icon of the item.
+
+    Returns:
+        Image.Image: The RGBA tile, at least CELL_SIZE on each side.
+    """
+    font_name, size, offset = label_style()
+    key = (
+        item,
+        c.ICONS_DICT.get(item),
+        c.CELL_SIZE,
+        font_name,
+        size,
+        offset,
+        c.TEXT_COLOR,
+        c.BACKGROUND_COLOR,
+    )
+
+    def build():
+        metrics.count("slot_tile_builds")
+        label = item.replace("_", " ")
+        return _build_slot_tile(
+            icon, label_tile(label, font_name, size, c.TEXT_COLOR, offset)
+        )
+
+    return slot_tiles.get(key, build)
+
+
+def draw_slot(image, item, icon, x, y):
+    """
+    Draws the item into the cell at column x and row y. Slots are drawn left
+    to right and top to bottom, so the space a tile covers beyond its cell is
+    still background when it is pasted.
+
+    Args:
+        image (Image.Image): The canvas to draw on.
+        item (str): The item id.
+        icon (Image.Image): The icon of the item, or None to draw the label
+            only.
+        x (int): Column of the cell.
+        y (int): Row of the cell.
+    """
+    if icon is None:
+        draw_label(image, item, x, y)
+    else:
+        image.paste(slot_tile(item, icon), (x * c.CELL_SIZE, y * c.CELL_SIZE))
+
+
+@lru_cache(maxsize=1)
+def icon_sources():
+    """Fingerprint of the icon files, read once per process."""
+    return atlas_fingerprint(icon_files())
+
+
+def layout_hash(layout):
+    """
+    Content hash of a layout together with every setting that changes how it
+    is drawn or encoded, so that an image with the same hash can be reused
+    as is.
+
+    Args:
+        layout (list): A 2D list of item names, or a Layout.
+
+    Returns:
+        str: Hex digest of the layout and render settings.
+    """
+    settings = {
+        "version": RENDER_VERSION,
+        # the same for the list form and a Layout
+        "layout": [list(row) for row in layout],
+        "geometry": [COLUMNS, ROWS, c.CELL_SIZE, LABEL_OFFSET],
+        "font": [c.FONTS, c.FONT_SIZE],
+        "colors": [c.LINE_WIDTH, c.LINE_COLOR, c.TEXT_COLOR, c.BACKGROUND_COLOR],
+        "icons": [c.ICONS_DICT, icon_sources()],
+        "output": [
+            c.OUTPUT_FORMAT,
+            c.PNG_COMPRESS_LEVEL,
+            c.PNG_OPTIMIZE,
+            c.WEBP_METHOD,
+        ],
+    }
+    body = json.dumps(settings, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def clear_caches():
+    """Drops the cached grid overlay, fonts, labels, tiles and fingerprint."""
+    slot_tiles.clear()
+    icon_sources.cache_clear()
+    open_font.cache_clear()
+    resolve_font.cache_clear()
+    label_tile.cache_clear()
+    grid_overlay.cache_clear()
@@ -0,0 +1,257 @@
+"""
+HTTP render service, `bedwarsshop serve`. The icon atlas, font, API session
+and player cache stay warm for the life of the process.
+"""
+
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import constants as c
+from . import helpers
+from .batch import warm_caches
+from .client import get_client
+from .helpers import (
+    IMAGE_EXTENSIONS,
+    get_player_data,
+    parse_player_data,
+    render_image,
+)
+from .metrics import metrics
+from .render import TileCache, layout_hash
+from .singleflight import SingleFlight
+
+PLAYER_NAME = re.compile(r"[A-Za-z0-9_]{1,16}")
+CONTENT_TYPES = {"png": "image/png", "png8": "image/png", "webp": "image/webp"}
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # the default backlog of 5 drops connections under load
+    request_queue_size = 128
+
+
+def load_layout(player_name):
+    """
+    Fetches and parses the layout of one player.
+
+    Args:
+        player_name (str): The name of the player.
+
+    Returns:
+        tuple: (layout, HTTPStatus.OK) on success, or (None, status) with
+        NOT_FOUND for players without a quick shop and BAD_GATEWAY when the
+        API failed.
+    """
+    player_data = get_player_data(player_name)
+    if not player_data:
+        return None, HTTPStatus.BAD_GATEWAY
+    layout = parse_player_data(player_data)
+    if not layout:
+        return None, HTTPStatus.NOT_FOUND
+    return layout, HTTPStatus.OK
+
+
+class ShopServer:
+    """
+    Threaded HTTP server answering `GET /shop/<player>.png` with the shop
+    image of a player, in OUTPUT_FORMAT. Responses carry the layout hash as
+    their ETag, so If-None-Match requests are answered with 304 without
+    rendering.
+
+    Fetches and renders run on a pool of `workers` threads. Concurrent
+    requests for the same player share one fetch, and requests for the same
+    layout share one render; encoded images are kept by layout hash.
+    `GET /metrics` reports request latencies, response statuses and the
+    pipeline counters in the Prometheus text format.
+
+    Args:
+        host (str): Address to listen on.
+        port (int): Port to listen on, 0 picks a free one.
+        workers (int): Number of fetch and render threads.
+        cache_bytes (int): Memory budget of the encoded images.
+    """
+
+    def __init__(
+        self,
+        host=c.SERVE_HOST,
+        port=c.SERVE_PORT,
+        workers=c.SERVE_WORKERS,
+        cache_bytes=c.SERVE_CACHE_MAX_BYTES,
+    ):
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="shop")
+        self.images = TileCache(cache_bytes)
+        self.jobs = SingleFlight()
+        self.lock = threading.Lock()
+        self.fetches = 0
+        self.renders = 0
+        self.server = _HTTPServer((host, port), self._handler())
+        self.thread = None
+
+    @property
+    def url(self):
+        """Base URL of the server."""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        shop_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                start = time.perf_counter()
+                shop_server.handle(self)
+                metrics.observe("serve_request_seconds", time.perf_counter() - start)
+
+            def log_message(self, format, *args):
+                logging.debug(f"{self.address_string()} {format % args}")
+
+        return Handler
+
+    def warm(self):
+        """
+        Loads the icon atlas, the font and the API session up front, and
+        starts recording the metrics served on /metrics.
+        """
+        metrics.enable()
+        warm_caches()
+        get_client(helpers.API_KEY)
+
+    @property
+    def coalesced(self):
+        """Requests that shared a fetch or render already in flight."""
+        return self.jobs.deduplicated
+
+    def _submit(self, function, *args):
+        return self.pool.submit(function, *args).result()
+
+    def _run(self, key, function, *args):
+        # the first caller of a key runs the job on the pool, later ones wait
+        return self.jobs.do(key, self._submit, function, *args)
+
+    def _fetch(self, player_name):
+        with self.lock:
+            self.fetches += 1
+        return load_layout(player_name)
+
+    def _render(self, layout, digest):
+        def build():
+            with self.lock:
+                self.renders += 1
+            data = render_image(layout)
+            return data, data.nbytes
+
+        return self.images.get(digest, build)
+
+    def image(self, player_name, etags=()):
+        """
+        Returns the current image of a player. The layout is fetched and
+        hashed first, so an image the client already has is not rendered.
+
+        Args:
+            player_name (str): The name of the player.
+            etags (iterable): ETags of the images the client has, as sent
+                in If-None-Match.
+
+        Returns:
+            tuple: (status, layout hash, encoded image). The hash is None
+            unless the status is OK, and the image is None unless the status
+            is OK and the hash is not in `etags`.
+        """
+        layout, status = self._run(
+            ("fetch", player_name.lower()), self._fetch, player_name
+        )
+        if layout is None:
+            return status, None, None
+        digest = layout_hash(layout)
+        if f'"{digest}"' in etags:
+            return HTTPStatus.OK, digest, None
+        data = self._run(("render", digest), self._render, layout, digest)
+        return HTTPStatus.OK, digest, data
+
+    def handle(self, request):
+        if request.path.partition("?")[0] == "/metrics":
+            headers = {"Content-Type": METRICS_CONTENT_TYPE}
+            body = metrics.prometheus().encode()
+            self.reply(request, HTTPStatus.OK, body, headers)
+            return
+        prefix, _, file_name = request.path.partition("?")[0].rpartition("/")
+        player_name, dot, extension = file_name.rpartition(".")
+        if (
+            prefix != "/shop"
+            or dot + extension != IMAGE_EXTENSIONS[c.OUTPUT_FORMAT]
+            or not PLAYER_NAME.fullmatch(player_name)
+        ):
+            self.reply(request, HTTPStatus.NOT_FOUND)
+            return
+        if_none_match = request.headers.get("If-None-Match", "")
+        etags = {tag.strip() for tag in if_none_match.split(",")}
+        try:
+            status, digest, data = self.image(player_name, etags)
+        except Exception as e:
+            logging.error(f"Failed to render image for {player_name}: {e}")
+            self.reply(request, HTTPStatus.INTERNAL_SERVER_ERROR)
+            return
+        if status != HTTPStatus.OK:
+            self.reply(request, status)
+            return
+        headers = {"ETag": f'"{digest}"', "Cache-Control": "no-cache"}
+        if data is None:
+            self.reply(request, HTTPStatus.NOT_MODIFIED, headers=headers)
+            return
+        headers["Content-Type"] = CONTENT_TYPES[c.OUTPUT_FORMAT]
+        self.reply(request, HTTPStatus.OK, data, headers)
+
+    def reply(self, request, status, body=b"", headers=None):
+        metrics.count("serve_responses", status=int(status))
+        request.send_response(status)
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        if status != HTTPStatus.NOT_MODIFIED:
+            request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        if body:
+            request.wfile.write(body)
+
+    def serve_forever(self):
+        """Warms the caches and answers requests until interrupted."""
+        self.warm()
+        logging.info(f"Serving shop images on {self.url}/shop/<player>")
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def start(self):
+        """Warms the caches and answers requests on a background thread."""
+        self.warm()
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.close()
+
+    def close(self):
+        metrics.disable()
+        self.server.server_close()
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,233 @@
+"""
+Sheets of many shops on one image, for leaderboards and comparisons. Shops
+are laid out in a grid under their player names and rendered one strip of
+the grid at a time, so a sheet is streamed to a PNG file without ever
+holding the whole canvas in memory.
+"""
+
+import logging
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from . import constants as c
+from .batch import fetch_layout
+from .helpers import get_cached_player_data, render_shop
+from .render import COLUMNS, ROWS, label_style, render_label, scaled
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _chunk(kind, data):
+    body = kind + data
+    return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+
+class PNGStreamWriter:
+    """
+    Writes an RGBA PNG row by row. The rows are compressed as they come, so
+    memory use is bounded by the largest block of rows written at once.
+
+    Args:
+        fp (file): Binary file object to write to.
+        size (tuple): Width and height of the image.
+        compress_level (int): zlib level, defaults to PNG_COMPRESS_LEVEL.
+    """
+
+    def __init__(self, fp, size, compress_level=None):
+        self.fp = fp
+        self.width, self.height = size
+        self.rows = 0
+        level = c.PNG_COMPRESS_LEVEL if compress_level is None else compress_level
+        self.compressor = zlib.compressobj(level)
+        # 8 bit RGBA, not interlaced
+        header = struct.pack(">IIBBBBB", self.width, self.height, 8, 6, 0, 0, 0)
+        fp.write(PNG_SIGNATURE + _chunk(b"IHDR", header))
+
+    def write(self, image):
+        """
+        Appends the rows of an image as wide as the PNG.
+
+        Raises:
+            ValueError: If the image has the wrong width or too many rows.
+        """
+        if image.width != self.width or self.rows + image.height > self.height:
+            raise ValueError(
+                f"Cannot append {image.size} rows to a {self.width} wide PNG "
+                f"with {self.height - self.rows} rows left"
+            )
+        data = memoryview(image.convert("RGBA").tobytes())
+        stride = self.width * 4
+        # every scanline starts with its filter type, 0 for none
+        scanlines = bytearray()
+        for offset in range(0, len(data), stride):
+            scanlines.append(0)
+            scanlines += data[offset : offset + stride]
+        self._idat(self.compressor.compress(scanlines))
+        self.rows += image.height
+
+    def close(self):
+        """
+        Finishes the PNG.
+
+        Raises:
+            ValueError: If fewer rows than its height were written.
+        """
+        if self.rows != self.height:
+            raise ValueError(f"Wrote {self.rows} of {self.height} rows")
+        self._idat(self.compressor.flush())
+        self.fp.write(_chunk(b"IEND", b""))
+
+    def _idat(self, data):
+        if data:
+            self.fp.write(_chunk(b"IDAT", data))
+
+
+def sheet_geometry(count, columns=None):
+    """
+    Returns the measurements of a sheet at the configured cell size.
+
+    Args:
+        count (int): Number of shops on the sheet.
+        columns (int): Shops per row, defaults to SHEET_COLUMNS.
+
+    Returns:
+        tuple: (size, strip_height, columns) where size is the width and
+        height of the sheet and a strip is one row of shops with the gap
+        above them and their names.
+
+    Raises:
+        ValueError: If the sheet has no shops.
+    """
+    if count < 1:
+        raise ValueError("A sheet needs at least one shop")
+    columns = max(1, min(columns or c.SHEET_COLUMNS, count))
+    gap = scaled(c.SHEET_GAP)
+    strip_height = gap + scaled(c.SHEET_HEADER_HEIGHT) + ROWS * c.CELL_SIZE
+    width = columns * (COLUMNS * c.CELL_SIZE + gap) + gap
+    strips = -(-count // columns)
+    return (width, strips * strip_height + gap), strip_height, columns
+
+
+def _draw_header(strip, name, left, top):
+    size = scaled(c.SHEET_HEADER_FONT_SIZE)
+    font_name = label_style()[0]
+    # rendered without the label cache, names would evict the item labels
+    tile = render_label(name, font_name, size, c.TEXT_COLOR, 0)
+    if tile is None:
+        return
+    color, box, mask = tile
+    # long names are cut at the edge of their shop
+    width = min(mask.width, COLUMNS * c.CELL_SIZE - box[0])
+    mask = mask.crop((0, 0, width, mask.height))
+    top += (scaled(c.SHEET_HEADER_HEIGHT) - size) // 2
+    strip.paste(color, (left + box[0], top + box[1]), mask)
+
+
+def render_strips(players, columns=None):
+    """
+    Renders a sheet one row of shops at a time, top to bottom. Shops reuse
+    the cached icon and label tiles of single renders.
+
+    Args:
+        players (list): (player name, layout) pairs, in sheet order.
+        columns (int): Shops per row, defaults to SHEET_COLUMNS.
+
+    Yields:
+        Image.Image: RGBA strips as wide as the sheet; the last one also
+        holds the bottom margin.
+    """
+    (width, _), strip_height, columns = sheet_geometry(len(players), columns)
+    gap = scaled(c.SHEET_GAP)
+    for first in range(0, len(players), columns):
+        last = first + columns >= len(players)
+        height = strip_height + gap if last else strip_height
+        strip = Image.new("RGBA", (width, height), c.BACKGROUND_COLOR)
+        for i, (name, layout) in enumerate(players[first : first + columns]):
+            left = gap + i * (COLUMNS * c.CELL_SIZE + gap)
+            _draw_header(strip, name, left, gap)
+            strip.paste(
+                render_shop(layout), (left, gap + scaled(c.SHEET_HEADER_HEIGHT))
+            )
+        yield strip
+
+
+def render_sheet(players, columns=None):
+    """
+    Renders a whole sheet in memory, for sheets small enough to hold.
+
+    Args:
+        players (list): (player name, layout) pairs, in sheet order.
+        columns (int): Shops per row, defaults to SHEET_COLUMNS.
+
+    Returns:
+        Image.Image: The RGBA sheet.
+
+    Raises:
+        ValueError: If there are no players.
+    """
+    size, strip_height, _ = sheet_geometry(len(players), columns)
+    sheet = Image.new("RGBA", size, c.BACKGROUND_COLOR)
+    for i, strip in enumerate(render_strips(players, columns)):
+        sheet.paste(strip, (0, i * strip_height))
+    return sheet
+
+
+def write_sheet(players, fp, columns=None):
+    """
+    Streams a sheet to a PNG file one strip at a time, so only one row of
+    shops is in memory however many players it shows.
+
+    Args:
+        players (list): (player name, layout) pairs, in sheet order.
+        fp (file): Binary file object to write to.
+        columns (int): Shops per row, defaults to SHEET_COLUMNS.
+
+    Returns:
+        tuple: Width and height of the sheet.
+
+    Raises:
+        ValueError: If there are no players.
+    """
+    size, _, _ = sheet_geometry(len(players), columns)
+    writer = PNGStreamWriter(fp, size)
+    for strip in render_strips(players, columns):
+        writer.write(strip)
+    writer.close()
+    return size
+
+
+def fetch_layouts(player_names, fetch_workers=4):
+    """
+    Fetches the layouts of many players, the cached ones in one lookup and
+    the others concurrently.
+
+    Args:
+        player_names (list): Names of the players.
+        fetch_workers (int): Maximum number of concurrent fetches.
+
+    Returns:
+        tuple: (players, failures) where players are (name, layout) pairs
+        in the order of player_names and failures maps the names of the
+        players left out to the reason.
+    """
+    cached = get_cached_player_data(player_names)
+    players, failures = [], {}
+    with ThreadPoolExecutor(fetch_workers) as fetcher:
+        fetches = [
+            (name, fetcher.submit(fetch_layout, name, cached.get(name)))
+            for name in player_names
+        ]
+    for name, future in fetches:
+        try:
+            layout, reason = future.result()
+        except Exception as e:
+            layout, reason = None, f"failed to retrieve player data: {e}"
+        if layout is None:
+            logging.error(f"Leaving {name} out of the sheet: {reason}")
+            failures[name] = reason
+        else:
+            players.append((name, layout))
+    return players, failures
@@ -0,0 +1,115 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls by key: while a call for a key is running,
+    later calls for the same key wait for it and share its result or
+    exception instead of running again. Threads and asyncio tasks, in any
+    number of event loops, may share one instance.
+
+    Attributes:
+        executed (int): Calls that ran their function.
+        deduplicated (int): Calls that shared the result of a running call.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        # running tasks of do_async, referenced until they finish
+        self.tasks = set()
+        self.executed = 0
+        self.deduplicated = 0
+        self.lock = threading.Lock()
+
+    def _join(self, key):
+        # returns the running call of key, or a new one the caller must run
+        with self.lock:
+            future = self.calls.get(key)
+            if future is not None:
+                self.deduplicated += 1
+                return future, False
+            future = self.calls[key] = Future()
+            self.executed += 1
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        with self.lock:
+            del self.calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, function, *args, **kwargs):
+        """
+        Calls `function(*args, **kwargs)` unless a call for `key` is already
+        running, in which case its outcome is returned instead.
+
+        Args:
+            key (hashable): Identity of the call.
+            function (callable): The work to run.
+
+        Returns:
+            The return value of the call, shared by every caller.
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def do_async(self, key, function, *args, **kwargs):
+        """
+        Async sibling of do, for a coroutine function. Waiting callers do not
+        block their event loop.
+
+        Args:
+            key (hashable): Identity of the call.
+            function (callable): Returns an awaitable with the work to run.
+
+        Returns:
+            The result of the awaitable, shared by every caller.
+        """
+        # only imported here, threaded callers never load asyncio
+        import asyncio
+
+        future, leader = self._join(key)
+        if not leader:
+            # shielded, so a cancelled waiter does not cancel the shared call
+            return await asyncio.shield(asyncio.wrap_future(future))
+        # the call runs in its own task, so cancelling the caller that
+        # started it does not fail the callers waiting on it
+        task = asyncio.ensure_future(function(*args, **kwargs))
+        self.tasks.add(task)
+
+        def finish(task):
+            self.tasks.discard(task)
+            if task.cancelled():
+                self._finish(key, future, error=asyncio.CancelledError())
+            elif task.exception() is not None:
+                self._finish(key, future, error=task.exception())
+            else:
+                self._finish(key, future, task.result())
+
+        task.add_done_callback(finish)
+        return await asyncio.shield(task)
+
+    def stats(self):
+        """
+        Returns the call counters.
+
+        Returns:
+            dict: executed, deduplicated and in_flight calls.
+        """
+        with self.lock:
+            return {
+                "executed": self.executed,
+                "deduplicated": self.deduplicated,
+                "in_flight": len(self.calls),
+            }
@@ -0,0 +1,243 @@
+"""
+Resolution of player names to uuids. Players are cached and fetched by
+uuid, so case variants of a name and the old and new names of a renamed
+player share one cache entry and one API request. Names are resolved
+through a persistent index, filled from the uuids of fetched, cached and
+ingested player documents, and the names it does not know through the
+Mojang API, many names per request.
+"""
+
+import logging
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from . import constants as c
+from .cache import get_cache, thread_connection
+from .metrics import metrics
+
+HEX_DIGITS = frozenset("0123456789abcdef")
+
+
+def is_uuid(key):
+    """Whether a cache key is a player uuid, rather than a player name."""
+    return len(key) == 32 and HEX_DIGITS.issuperset(key.lower())
+
+
+class UUIDIndex:
+    """
+    Index of lowercased player names to uuids in a SQLite database in WAL
+    mode, also indexed on the uuid. Names without an account are kept with
+    a null uuid, so they are not looked up again until they go stale.
+
+    Args:
+        path (Path): Location of the database file.
+        ttl (float): Seconds a resolved name stays fresh, None to never
+            expire.
+        missing_ttl (float): Seconds a name without an account stays fresh.
+
+    Attributes:
+        created (bool): Whether the database file was created, rather than
+            opened.
+    """
+
+    # stay below SQLite's limit on host parameters per statement
+    BATCH_SIZE = 500
+
+    def __init__(self, path, ttl=c.UUID_TTL, missing_ttl=c.UUID_MISSING_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        self.local = threading.local()
+        self.created = not self.path.exists()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.connection() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS names ("
+                "name TEXT PRIMARY KEY, uuid TEXT, resolved_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS names_uuid ON names (uuid)")
+
+    def connection(self):
+        """Returns the connection of the calling thread."""
+        return thread_connection(self.local, self.path)
+
+    @staticmethod
+    def key(player_name):
+        return player_name.lower()
+
+    def _is_fresh(self, uuid, resolved_at, now):
+        ttl = self.missing_ttl if uuid is None else self.ttl
+        return ttl is None or now - resolved_at <= ttl
+
+    def lookup(self, player_names):
+        """
+        Looks up several names with one query per BATCH_SIZE names.
+
+        Args:
+            player_names (iterable): Names of the players.
+
+        Returns:
+            dict: Mapping of player name to its uuid, or None for names
+            without an account. Unknown and stale names are left out.
+        """
+        names = {}
+        for name in player_names:
+            names.setdefault(self.key(name), []).append(name)
+        keys = list(names)
+        db = self.connection()
+        now = time.time()
+        found = {}
+        for i in range(0, len(keys), self.BATCH_SIZE):
+            chunk = keys[i : i + self.BATCH_SIZE]
+            marks = ",".join("?" * len(chunk))
+            rows = db.execute(
+                f"SELECT name, uuid, resolved_at FROM names WHERE name IN ({marks})",
+                chunk,
+            )
+            for key, uuid, resolved_at in rows:
+                if self._is_fresh(uuid, resolved_at, now):
+                    for name in names[key]:
+                        found[name] = uuid
+        return found
+
+    def names(self, uuid):
+        """
+        Returns the names resolved to a uuid, such as the old and new names
+        of a renamed player.
+
+        Args:
+            uuid (str): The player uuid.
+
+        Returns:
+            list: Lowercased names, the most recently resolved first.
+        """
+        rows = self.connection().execute(
+            "SELECT name FROM names WHERE uuid = ? ORDER BY resolved_at DESC",
+            (uuid,),
+        )
+        return [row[0] for row in rows]
+
+    def put_many(self, rows):
+        """
+        Stores resolved names in one transaction. A name keeps its entry if
+        that was resolved later.
+
+        Args:
+            rows (iterable): (player_name, uuid, resolved_at) triples, with
+                a None uuid for names without an account.
+
+        Returns:
+            int: The number of rows given.
+        """
+        rows = [(self.key(name), uuid, resolved_at) for name, uuid, resolved_at in rows]
+        with self.connection() as db:
+            db.executemany(
+                "INSERT INTO names VALUES (?, ?, ?) ON CONFLICT (name) DO UPDATE "
+                "SET uuid = excluded.uuid, resolved_at = excluded.resolved_at "
+                "WHERE excluded.resolved_at >= names.resolved_at",
+                rows,
+            )
+        return len(rows)
+
+
+def seed_uuid_index(index, cache):
+    """
+    Fills the index from the uuids of cached player documents, and moves
+    the entries that older versions cached under a player name to the
+    player's uuid. Of several names of one uuid the latest entry is kept.
+
+    Args:
+        index (UUIDIndex): The index to fill.
+        cache (PlayerCache): The cache to read, or a SQLiteCache.
+
+    Returns:
+        int: The number of names added to the index.
+    """
+    named = sorted(
+        (
+            (name, entry)
+            for name, entry in cache.entries()
+            if entry.get("uuid") and not is_uuid(name)
+        ),
+        key=lambda item: item[1]["fetched_at"],
+    )
+    if not named:
+        return 0
+    index.put_many((name, entry["uuid"], entry["fetched_at"]) for name, entry in named)
+    cache.put_entries((entry["uuid"], entry) for _, entry in named)
+    cache.delete(name for name, _ in named)
+    return len(named)
+
+
+def resolve_uuids(player_names):
+    """
+    Resolves many names to uuids through the index and, when
+    UUID_LOOKUP_ENABLED, the names it does not know through the Mojang API
+    in batches of MOJANG_BATCH_SIZE.
+
+    Args:
+        player_names (iterable): Names of the players.
+
+    Returns:
+        dict: Mapping of player name to uuid. Names without an account and
+        names that could not be resolved are left out.
+    """
+    player_names = list(player_names)
+    index = get_uuid_index()
+    known = index.lookup(player_names)
+    missing = list(
+        dict.fromkeys(index.key(name) for name in player_names if name not in known)
+    )
+    if missing and c.UUID_LOOKUP_ENABLED:
+        from .client import get_mojang_client
+
+        metrics.count("uuid_lookups", len(missing))
+        resolved = get_mojang_client().get_uuids(missing)
+        now = time.time()
+        index.put_many((name, uuid, now) for name, uuid in resolved.items())
+        for name in player_names:
+            if name not in known and index.key(name) in resolved:
+                known[name] = resolved[index.key(name)]
+    return {name: uuid for name, uuid in known.items() if uuid is not None}
+
+
+def resolve_uuid(player_name):
+    """
+    Resolves one name to a uuid, see resolve_uuids.
+
+    Args:
+        player_name (str): The name of the player.
+
+    Returns:
+        str: The uuid, or None if the name could not be resolved.
+    """
+    return resolve_uuids([player_name]).get(player_name)
+
+
+def remember_uuid(player_name, uuid):
+    """Adds the uuid of a player document fetched by name to the index."""
+    get_uuid_index().put_many([(player_name, uuid, time.time())])
+
+
+@lru_cache(maxsize=4)
+def _open_uuid_index(location):
+    index = UUIDIndex(location)
+    if index.created:
+        seeded = seed_uuid_index(index, get_cache())
+        if seeded:
+            logging.info(f"Indexed the uuids of {seeded} cached players")
+    return index
+
+
+def get_uuid_index():
+    """
+    Returns the process-wide index at UUID_INDEX_DB, relative to the
+    current working directory. A new index is filled from the player cache
+    first, see seed_uuid_index.
+
+    Returns:
+        UUIDIndex: The shared index.
+    """
+    return _open_uuid_index(Path(c.UUID_INDEX_DB).resolve())
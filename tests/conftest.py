@@ -7,6 +7,32 @@ from unittest.mock import MagicMock
 import pytest
 from PIL import Image
 
+from bedwarsshop import atlas, cache, client, history, render, uuids
+from bedwarsshop import constants as c
+from tests.fakeapi import FakeHypixel
+
+
+@pytest.fixture(autouse=True)
+def clear_process_caches():
+    """Start and end every test with empty process-wide caches."""
+    atlas.clear_cache()
+    render.clear_caches()
+    cache._open_cache.cache_clear()
+    history._open_history.cache_clear()
+    uuids._open_uuid_index.cache_clear()
+    yield
+    atlas.clear_cache()
+    render.clear_caches()
+    cache._open_cache.cache_clear()
+    history._open_history.cache_clear()
+    uuids._open_uuid_index.cache_clear()
+
+
+@pytest.fixture(autouse=True)
+def offline_uuid_lookups(monkeypatch):
+    """Never resolve names through the Mojang API, fake_hypixel stands in."""
+    monkeypatch.setattr(c, "UUID_LOOKUP_ENABLED", False)
+
 
 @pytest.fixture
 def temp_dir():
@@ -15,6 +41,13 @@ def temp_dir():
         yield Path(tmp_dir)
 
 
+@pytest.fixture
+def isolated_cwd(monkeypatch, temp_dir):
+    """Run the test from an empty temporary working directory."""
+    monkeypatch.chdir(temp_dir)
+    return temp_dir
+
+
 @pytest.fixture
 def mock_api_key(monkeypatch):
     """Mock the HYPIXEL_API_KEY environment variable."""
@@ -59,8 +92,33 @@ def player_data_no_bedwars():
 
 @pytest.fixture
 def mock_requests_get(mocker):
-    """Mock requests.get function."""
-    return mocker.patch("bedwarsshop.helpers.requests.get")
+    """Mock the HTTP session used by the Hypixel client."""
+    client.get_client.cache_clear()
+    mocker.patch("bedwarsshop.client.time.sleep")
+    yield mocker.patch("bedwarsshop.client.requests.Session.get")
+    client.get_client.cache_clear()
+
+
+@pytest.fixture
+def fake_hypixel(mocker, monkeypatch, temp_dir):
+    """
+    Point the clients at a local stand-in for the Hypixel and Mojang APIs,
+    with cache and output directories in a temporary working directory.
+    """
+    monkeypatch.chdir(temp_dir)
+    (temp_dir / "cache").mkdir()
+    (temp_dir / "output").mkdir()
+    mocker.patch("bedwarsshop.helpers.API_KEY", "test-api-key-12345", create=True)
+    mocker.patch("bedwarsshop.client.HypixelClient.backoff_delay", return_value=0)
+    client.get_client.cache_clear()
+    client.get_mojang_client.cache_clear()
+    with FakeHypixel() as server:
+        monkeypatch.setattr(c, "API_URL", server.url)
+        monkeypatch.setattr(c, "MOJANG_API_URL", server.mojang_url)
+        monkeypatch.setattr(c, "UUID_LOOKUP_ENABLED", True)
+        yield server
+    client.get_client.cache_clear()
+    client.get_mojang_client.cache_clear()
 
 
 @pytest.fixture
@@ -69,11 +127,17 @@ def mock_image_operations(mocker):
     mock_image = MagicMock()
     mock_draw = MagicMock()
     mock_font = MagicMock()
-
-    mocker.patch("bedwarsshop.helpers.Image.new", return_value=mock_image)
-    mocker.patch("bedwarsshop.helpers.ImageDraw.Draw", return_value=mock_draw)
-    mocker.patch("bedwarsshop.helpers.ImageFont.truetype", return_value=mock_font)
-    mocker.patch("bedwarsshop.helpers.Image.open", return_value=mock_image)
+    mock_font.getbbox.return_value = (0, 0, 100, 30)
+    mock_image.getbbox.return_value = (10, 10, 110, 40)
+
+    mocker.patch("bedwarsshop.render.Image.new", return_value=mock_image)
+    mocker.patch("bedwarsshop.render.ImageDraw.Draw", return_value=mock_draw)
+    mocker.patch("bedwarsshop.render.ImageFont.truetype", return_value=mock_font)
+    mocker.patch("bedwarsshop.atlas.Image.open", return_value=mock_image)
+    mocker.patch(
+        "bedwarsshop.atlas.icon_atlas",
+        return_value=dict.fromkeys(c.ICONS_DICT, mock_image),
+    )
 
     return {"image": mock_image, "draw": mock_draw, "font": mock_font}
 
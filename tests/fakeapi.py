@@ -0,0 +1,208 @@
+"""
+Local stand-in for the Hypixel API, used by the tests, benchmarks and load
+tests so they never hit the real API.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_LAYOUT = (
+    "stone_sword,bridge_egg,wooden_axe,bow,arrow,invisibility_potion_(30_seconds),"
+    "tnt,end_stone,iron_sword,iron_boots,chainmail_boots,wooden_pickaxe,"
+    "jump_v_potion_(45_seconds),water_bucket,oak_wood_planks,ladder,shears,wool,"
+    "golden_apple,speed_ii_potion_(45_seconds),magic_milk"
+)
+
+
+def player_uuid(player_name):
+    """The made-up uuid of a player, derived from the lowercased name."""
+    return hashlib.md5(player_name.lower().encode()).hexdigest()
+
+
+def player_document(player_name, favourites=DEFAULT_LAYOUT, uuid=None):
+    """
+    Builds a minimal Hypixel player document.
+
+    Args:
+        player_name (str): The name of the player.
+        favourites (str): The favourites_2 string, or None for no Bedwars stats.
+        uuid (str): The player uuid, defaults to player_uuid(player_name).
+
+    Returns:
+        dict: The document as returned by /v2/player.
+    """
+    stats = {"Bedwars": {"favourites_2": favourites}} if favourites else {}
+    return {
+        "success": True,
+        "player": {
+            "uuid": uuid or player_uuid(player_name),
+            "displayname": player_name,
+            "stats": stats,
+        },
+    }
+
+
+class FakeHypixel:
+    """
+    Threaded HTTP server answering /v2/player like the Hypixel API, by name
+    or uuid, and /profiles/minecraft like the Mojang API.
+
+    Args:
+        players (dict): Mapping of lowercased name to favourites_2 string.
+            Unknown names get DEFAULT_LAYOUT, None means no Bedwars stats.
+        latency (float): Seconds to wait before every answer.
+        throttle (int): Number of requests answered with 429 first.
+        quota (int): Value of the RateLimit-Limit header.
+
+    Attributes:
+        requests (list): (path, query, API key) of every Hypixel request.
+        lookups (list): Names sent in every Mojang request.
+        uuids (dict): Mapping of lowercased name to uuid, for players whose
+            uuid is not player_uuid of their name, such as renamed ones.
+        unknown (set): Lowercased names without an account.
+    """
+
+    def __init__(self, players=None, latency=0.0, throttle=0, quota=300):
+        self.players = players or {}
+        self.latency = latency
+        self.throttle = throttle
+        self.quota = quota
+        self.requests = []
+        self.lookups = []
+        # uuid to name of the players looked up, to answer requests by uuid
+        self.names = {}
+        self.uuids = {}
+        self.unknown = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        """Base URL to use as API_URL."""
+        return f"{self.mojang_url}/v2"
+
+    @property
+    def mojang_url(self):
+        """Base URL to use as MOJANG_API_URL."""
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def profile(self, player_name):
+        """The current name and uuid of a player, or None without an account."""
+        if player_name.lower() in self.unknown:
+            return None
+        return player_name, self.uuids.get(
+            player_name.lower(), player_uuid(player_name)
+        )
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                fake.handle(self)
+
+            def do_POST(self):
+                fake.handle_lookup(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def handle(self, request):
+        url = urlparse(request.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        with self.lock:
+            self.requests.append((url.path, query, request.headers.get("API-Key")))
+            throttled = self.throttle > 0
+            if throttled:
+                self.throttle -= 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            self.respond(request, url, query, throttled)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def respond(self, request, url, query, throttled):
+        if self.latency:
+            time.sleep(self.latency)
+        if throttled:
+            body = {"success": False, "throttle": True}
+            self.reply(request, 429, body, {"Retry-After": "0"})
+            return
+        if url.path != "/v2/player" or not {"name", "uuid"} & query.keys():
+            self.reply(request, 404, {"success": False, "cause": "Not found"})
+            return
+        if "uuid" in query:
+            with self.lock:
+                name = self.names.get(query["uuid"], query["uuid"])
+        else:
+            name = query["name"]
+        profile = self.profile(name)
+        if profile is None:
+            self.reply(request, 200, {"success": True, "player": None})
+            return
+        favourites = self.players.get(name.lower(), DEFAULT_LAYOUT)
+        uuid = query.get("uuid", profile[1])
+        self.reply(request, 200, player_document(name, favourites, uuid))
+
+    def handle_lookup(self, request):
+        length = int(request.headers.get("Content-Length", 0))
+        names = json.loads(request.rfile.read(length))
+        with self.lock:
+            self.lookups.append(names)
+        if urlparse(request.path).path != "/profiles/minecraft":
+            self.reply(request, 404, {"error": "Not found"})
+            return
+        profiles = list(filter(None, map(self.profile, names)))
+        with self.lock:
+            self.names.update((uuid, name) for name, uuid in profiles)
+        body = [{"id": uuid, "name": name} for name, uuid in profiles]
+        self.reply(request, 200, body)
+
+    def reply(self, request, status, data, headers=None):
+        if headers is None:
+            headers = {
+                "RateLimit-Limit": str(self.quota),
+                "RateLimit-Remaining": str(self.quota),
+                "RateLimit-Reset": "0",
+            }
+        body = json.dumps(data).encode()
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(body)
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
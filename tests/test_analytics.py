@@ -0,0 +1,140 @@
+"""Tests for bedwarsshop.analytics module."""
+
+import itertools
+import random
+import time
+from collections import Counter
+
+import pytest
+from click.testing import CliRunner
+from PIL import Image
+
+from bedwarsshop import constants as c
+from bedwarsshop.bedwarsshop import cli
+from bedwarsshop.cache import get_cache
+from bedwarsshop.layout import Layout
+
+np = pytest.importorskip("numpy")
+analytics = pytest.importorskip("bedwarsshop.analytics")
+
+ITEMS = ["null", "tnt", "wool", "bow", "shears", "mystery_item"]
+
+
+def random_layouts(count, seed=0):
+    rng = random.Random(seed)
+    return [[rng.choices(ITEMS, k=7) for _ in range(3)] for _ in range(count)]
+
+
+class TestAnalytics:
+    """Tests that the vectorized counts match plain Python counting."""
+
+    LAYOUTS = random_layouts(300) + [[["tnt"] * 7] * 3] * 5
+
+    @pytest.fixture
+    def matrix(self):
+        return analytics.layout_matrix(self.LAYOUTS)
+
+    def test_layout_matrix(self, matrix):
+        """Test that every layout becomes one row of its slot ids."""
+        assert matrix.shape == (len(self.LAYOUTS), 21)
+        assert matrix.dtype == np.uint8
+        assert matrix[0].tobytes() == Layout.from_rows(self.LAYOUTS[0]).slots
+
+    def test_item_frequency(self, matrix):
+        """Test that items are counted once per player that has them."""
+        expected = Counter(
+            item for layout in self.LAYOUTS for item in set(sum(layout, []))
+        )
+        del expected["null"]
+
+        frequency = analytics.item_frequency(matrix)
+
+        assert frequency == dict(expected)
+        assert list(frequency.values()) == sorted(frequency.values(), reverse=True)
+
+    def test_slot_heatmap(self, matrix):
+        """Test the per-slot counts of one item and of every item."""
+        tnt = analytics.slot_heatmap(matrix, "tnt")
+        filled = analytics.slot_heatmap(matrix)
+
+        for y, x in itertools.product(range(3), range(7)):
+            column = [layout[y][x] for layout in self.LAYOUTS]
+            assert tnt[y, x] == column.count("tnt")
+            assert filled[y, x] == len(column) - column.count("null")
+        assert not analytics.slot_heatmap(matrix, "never_seen").any()
+
+    def test_slot_leaders(self, matrix):
+        """Test that every slot shows its most common item."""
+        layout, shares = analytics.slot_leaders(matrix)
+
+        for y, x in itertools.product(range(3), range(7)):
+            column = Counter(layout[y][x] for layout in self.LAYOUTS)
+            del column["null"]
+            assert column[layout[y][x]] == max(column.values())
+            assert shares[y, x] == max(column.values()) / len(self.LAYOUTS)
+
+    def test_co_occurrence(self, matrix):
+        """Test that pairs are counted once per player that has both."""
+        expected = Counter()
+        for layout in self.LAYOUTS:
+            present = sorted(set(sum(layout, [])) - {"null"})
+            expected.update(itertools.combinations(present, 2))
+
+        pairs = analytics.top_pairs(matrix, n=len(expected))
+
+        assert {tuple(sorted(pair[:2])): pair[2] for pair in pairs} == expected
+        counts = analytics.co_occurrence(matrix)
+        assert (counts == counts.T).all()
+
+    def test_top_layouts(self, matrix):
+        """Test that the most common layout comes first with its count."""
+        layout, count = analytics.top_layouts(matrix, 1)[0]
+
+        assert layout == Layout.from_rows([["tnt"] * 7] * 3)
+        assert count == 5
+
+    def test_cached_matrix(self, isolated_cwd):
+        """Test that the layouts of every cached player are read."""
+        favourites = [",".join(sum(layout, [])) for layout in self.LAYOUTS[:3]]
+        entries = [
+            (f"p{i}", {"uuid": None, "favourites_2": f, "fetched_at": time.time()})
+            for i, f in enumerate([*favourites, None, "too,short"])
+        ]
+        get_cache().put_entries(entries)
+
+        matrix = analytics.cached_matrix()
+
+        assert sorted(map(bytes, matrix)) == sorted(
+            Layout.from_rows(layout).slots for layout in self.LAYOUTS[:3]
+        )
+
+    def test_render_heatmap(self, matrix):
+        """Test that popular slots are tinted more than rare ones."""
+        layout, shares = analytics.slot_leaders(matrix)
+        shares[0, 0], shares[0, 1] = 1.0, 0.0
+
+        image = analytics.render_heatmap(layout, shares)
+
+        assert image.size == (7 * c.CELL_SIZE, 3 * c.CELL_SIZE)
+        corner = (c.CELL_SIZE // 2, 5)
+        tinted = image.getpixel(corner)
+        plain = image.getpixel((corner[0] + c.CELL_SIZE, corner[1]))
+        assert tinted[3] >= c.HEAT_MAX_ALPHA
+        assert plain[3] == c.BACKGROUND_COLOR[3]
+
+    def test_analytics_command(self, isolated_cwd):
+        """Test that the command prints rankings and saves the heatmap."""
+        get_cache().put_entries(
+            (f"p{i}", {"uuid": None, "favourites_2": f, "fetched_at": time.time()})
+            for i, f in enumerate(["tnt" + ",wool" * 20] * 3)
+        )
+
+        result = CliRunner().invoke(
+            cli, ["analytics", "--heatmap", "heat.png", "--item", "tnt"]
+        )
+
+        assert result.exit_code == 0
+        assert "3 cached players" in result.output
+        assert "tnt + wool: 3 (100.0%)" in result.output
+        with Image.open(isolated_cwd / "heat.png") as image:
+            assert image.format == "PNG"
@@ -0,0 +1,75 @@
+"""Tests for bedwarsshop.atlas module."""
+
+from PIL import Image, ImageChops
+
+from bedwarsshop import atlas
+from bedwarsshop import constants as c
+
+
+class TestIconAtlas:
+    """Tests for the per-process icon atlas."""
+
+    def test_icon_atlas_covers_icons_dict(self):
+        """Test that every item of ICONS_DICT has a tile."""
+        icons = atlas.icon_atlas()
+        assert set(icons) == set(c.ICONS_DICT)
+
+    def test_tiles_are_resized_rgba(self):
+        """Test that tiles are 320x320 RGBA images."""
+        for tile in atlas.load_tiles().values():
+            assert tile.mode == "RGBA"
+            assert tile.size == (atlas.TILE_SIZE, atlas.TILE_SIZE)
+
+    def test_aliases_share_one_tile(self):
+        """Test that items pointing at the same file share a tile object."""
+        icons = atlas.icon_atlas()
+        assert icons["bow"] is icons["bow_(power_i)"]
+        assert icons["bow"] is icons["bow_(power_i__punch_i)"]
+
+    def test_icon_atlas_is_scaled_once_per_size(self):
+        """Test that smaller tiles are resized once and then reused."""
+        small = atlas.icon_atlas(80)
+
+        assert small["tnt"].size == (80, 80)
+        assert atlas.icon_atlas(80)["tnt"] is small["tnt"]
+        assert atlas.scaled_tiles.cache_info().misses == 1
+        assert atlas.icon_atlas()["tnt"].size == (atlas.TILE_SIZE, atlas.TILE_SIZE)
+
+    def test_icon_files_are_decoded_once(self, mocker, temp_dir):
+        """Test that each icon file is decoded a single time per process."""
+        spy = mocker.spy(atlas, "decode_icon")
+        atlas.load_tiles(temp_dir / "missing.png")
+        atlas.load_tiles(temp_dir / "missing.png")
+        assert spy.call_count == len(atlas.icon_files())
+
+
+class TestPackedAtlas:
+    """Tests for building and loading the packed atlas file."""
+
+    def test_packed_atlas_round_trip(self, mocker, temp_dir):
+        """Test that a packed atlas loads without decoding icons again."""
+        path = atlas.build_atlas(temp_dir / "atlas.png")
+        spy = mocker.spy(atlas, "decode_icon")
+
+        tiles = atlas.load_tiles(path)
+
+        spy.assert_not_called()
+        assert set(tiles) == set(atlas.icon_files())
+
+    def test_packed_tiles_match_decoded_icons(self, temp_dir):
+        """Test that packed tiles are pixel-identical to decoded icons."""
+        tiles = atlas.load_tiles(atlas.build_atlas(temp_dir / "atlas.png"))
+        for name in ("bow.png", "chest.png", "white_stained_clay.png"):
+            diff = ImageChops.difference(tiles[name], atlas.decode_icon(name))
+            assert diff.getbbox() is None
+
+    def test_stale_atlas_falls_back_to_icons(self, mocker, temp_dir):
+        """Test that an atlas built from other icons is ignored."""
+        path = temp_dir / "atlas.png"
+        Image.new("RGBA", (8, 8)).save(path)
+        spy = mocker.spy(atlas, "decode_icon")
+
+        tiles = atlas.load_tiles(path)
+
+        assert spy.call_count == len(atlas.icon_files())
+        assert set(tiles) == set(atlas.icon_files())
@@ -0,0 +1,150 @@
+"""Tests for bedwarsshop.batch module."""
+
+import io
+
+from bedwarsshop import batch
+from bedwarsshop.batch import (
+    BatchReport,
+    fetch_layout,
+    read_player_names,
+    run_batch,
+)
+
+
+class TestReadPlayerNames:
+    """Tests for read_player_names function."""
+
+    def test_read_player_names_from_arguments(self):
+        """Test that argument names keep their order."""
+        assert read_player_names(["b", "a", "c"]) == ["b", "a", "c"]
+
+    def test_read_player_names_from_file(self):
+        """Test that names are read from a file, skipping blank lines."""
+        names_file = io.StringIO("alice\n\n  bob \ncarol\n")
+        assert read_player_names(["dave"], names_file) == [
+            "dave",
+            "alice",
+            "bob",
+            "carol",
+        ]
+
+    def test_read_player_names_drops_duplicates(self):
+        """Test that a player is only listed once."""
+        names_file = io.StringIO("alice\nbob\n")
+        assert read_player_names(["alice"], names_file) == ["alice", "bob"]
+
+
+class TestFetchLayout:
+    """Tests for fetch_layout function."""
+
+    def test_fetch_layout_success(self, mocker, sample_player_data):
+        """Test that a fetched player is parsed into a layout."""
+        mocker.patch(
+            "bedwarsshop.batch.get_player_data", return_value=sample_player_data
+        )
+        layout, reason = fetch_layout("testuser")
+        assert reason is None
+        assert layout[0][0] == "stone_sword"
+
+    def test_fetch_layout_retrieve_failure(self, mocker):
+        """Test that a failed fetch is reported."""
+        mocker.patch("bedwarsshop.batch.get_player_data", return_value=None)
+        assert fetch_layout("testuser") == (None, "failed to retrieve player data")
+
+    def test_fetch_layout_parse_failure(self, mocker, player_data_no_bedwars):
+        """Test that unparsable player data is reported."""
+        mocker.patch(
+            "bedwarsshop.batch.get_player_data", return_value=player_data_no_bedwars
+        )
+        assert fetch_layout("testuser") == (None, "failed to parse player data")
+
+
+class TestRunBatch:
+    """Tests for run_batch function."""
+
+    def test_run_batch_collects_failures(
+        self, mocker, sample_player_data, player_data_no_bedwars, isolated_cwd
+    ):
+        """Test that failing players end up in the report."""
+        responses = {
+            "good": sample_player_data,
+            "missing": None,
+            "nobedwars": player_data_no_bedwars,
+        }
+        mocker.patch(
+            "bedwarsshop.batch.get_player_data",
+            side_effect=lambda name: responses[name],
+        )
+        mock_create_image = mocker.patch("bedwarsshop.batch.create_image")
+
+        report = run_batch(list(responses), render_workers=1)
+
+        assert report.rendered == ["good"]
+        assert set(report.failures) == {"missing", "nobedwars"}
+        mock_create_image.assert_called_once()
+        assert mock_create_image.call_args[0][1] == "good"
+
+    def test_run_batch_survives_render_errors(
+        self, mocker, sample_player_data, isolated_cwd
+    ):
+        """Test that an exception while rendering does not abort the run."""
+        mocker.patch(
+            "bedwarsshop.batch.get_player_data", return_value=sample_player_data
+        )
+        mocker.patch(
+            "bedwarsshop.batch.create_image",
+            side_effect=[OSError("disk full"), True],
+        )
+
+        report = run_batch(["first", "second"], fetch_workers=1, render_workers=1)
+
+        assert report.total == 2
+        assert len(report.rendered) == 1
+        assert "disk full" in next(iter(report.failures.values()))
+
+    def test_run_batch_counts_unchanged_images(
+        self, mocker, sample_player_data, isolated_cwd
+    ):
+        """Test that skipped renders are reported apart from produced ones."""
+        mocker.patch(
+            "bedwarsshop.batch.get_player_data", return_value=sample_player_data
+        )
+        mock_create_image = mocker.patch(
+            "bedwarsshop.batch.create_image", side_effect=[True, False]
+        )
+
+        report = run_batch(["a", "b"], fetch_workers=1, render_workers=1, force=True)
+
+        assert (report.rendered, report.skipped) == (["a"], ["b"])
+        assert mock_create_image.call_args.kwargs["force"] is True
+
+    def test_run_batch_render_processes(self, mocker, sample_player_data, isolated_cwd):
+        """Test that images are rendered by spawned worker processes."""
+        mocker.patch(
+            "bedwarsshop.batch.get_player_data", return_value=sample_player_data
+        )
+        pool = mocker.spy(batch, "ProcessPoolExecutor")
+        (isolated_cwd / "output").mkdir()
+
+        report = run_batch(["a", "b"], fetch_workers=2, render_workers=2)
+
+        assert sorted(report.rendered) == ["a", "b"]
+        assert pool.call_args.kwargs["mp_context"].get_start_method() == "spawn"
+        assert (isolated_cwd / "output" / "a.png").exists()
+
+
+class TestBatchReport:
+    """Tests for BatchReport class."""
+
+    def test_batch_report_summary(self):
+        """Test that the summary lists failures and throughput."""
+        report = BatchReport()
+        report.rendered = ["a", "b", "c"]
+        report.failures = {"d": "failed to parse player data"}
+        report.elapsed = 2.0
+
+        summary = report.summary()
+
+        assert "d: failed to parse player data" in summary
+        assert "Rendered 3/4 players, 0 unchanged, 1 failed" in summary
+        assert "2.00 players/s" in summary
@@ -1,8 +1,12 @@
 """Tests for bedwarsshop.bedwarsshop module."""
 
+import json
+
 from click.testing import CliRunner
 
-from bedwarsshop.bedwarsshop import main
+from bedwarsshop import constants as c
+from bedwarsshop.bedwarsshop import cli, main
+from bedwarsshop.cache import PlayerCache, SQLiteCache
 
 
 class TestMain:
@@ -129,3 +133,134 @@ class TestMain:
 
         assert result.exit_code != 0
         assert "Missing argument" in result.output or "Usage:" in result.output
+
+    def test_main_batch_mode(self, mocker):
+        """Test that several names are handed to the batch runner."""
+        mocker.patch("bedwarsshop.bedwarsshop.load_constants", return_value=True)
+        mock_run_batch = mocker.patch("bedwarsshop.batch.run_batch")
+        mock_run_batch.return_value.summary.return_value = "Rendered 2/2 players"
+
+        runner = CliRunner()
+        result = runner.invoke(main, ["alice", "bob", "--render-workers", "2"])
+
+        assert result.exit_code == 0
+        assert mock_run_batch.call_args[0][0] == ["alice", "bob"]
+        assert mock_run_batch.call_args[0][2] == 2
+        assert "Rendered 2/2 players" in result.output
+
+    def test_main_output_options(self, mocker, monkeypatch, sample_player_data):
+        """Test that size and encoder options override the constants."""
+        for name in ["CELL_SIZE", "OUTPUT_FORMAT", "PNG_COMPRESS_LEVEL"]:
+            monkeypatch.setattr(c, name, getattr(c, name))
+        mocker.patch("bedwarsshop.bedwarsshop.load_constants", return_value=True)
+        mocker.patch(
+            "bedwarsshop.bedwarsshop.get_player_data", return_value=sample_player_data
+        )
+        mocker.patch("bedwarsshop.bedwarsshop.create_image")
+
+        result = CliRunner().invoke(
+            main,
+            [
+                "testuser",
+                "--cell-size",
+                "80",
+                "--format",
+                "webp",
+                "--compress-level",
+                "1",
+            ],
+        )
+
+        assert result.exit_code == 0
+        assert (c.CELL_SIZE, c.OUTPUT_FORMAT, c.PNG_COMPRESS_LEVEL) == (80, "webp", 1)
+
+    def test_main_batch_mode_from_stdin(self, mocker):
+        """Test that names can be piped in on stdin."""
+        mocker.patch("bedwarsshop.bedwarsshop.load_constants", return_value=True)
+        mock_run_batch = mocker.patch("bedwarsshop.batch.run_batch")
+        mock_run_batch.return_value.summary.return_value = ""
+
+        runner = CliRunner()
+        result = runner.invoke(main, ["--file", "-"], input="alice\nbob\n")
+
+        assert result.exit_code == 0
+        assert mock_run_batch.call_args[0][0] == ["alice", "bob"]
+
+    def test_main_is_headless_by_default(self, mocker, sample_player_data):
+        """Test that nothing is shown or printed without the flags."""
+        mocker.patch("bedwarsshop.bedwarsshop.load_constants", return_value=True)
+        mocker.patch(
+            "bedwarsshop.bedwarsshop.get_player_data", return_value=sample_player_data
+        )
+        mock_create_image = mocker.patch("bedwarsshop.bedwarsshop.create_image")
+
+        result = CliRunner().invoke(main, ["testuser"])
+
+        assert result.exit_code == 0
+        assert result.output == ""
+        assert mock_create_image.call_args.kwargs["show"] is None
+
+    def test_main_show_and_print_layout(self, mocker, sample_player_data):
+        """Test that the viewer and the layout dump are opt-in."""
+        mocker.patch("bedwarsshop.bedwarsshop.load_constants", return_value=True)
+        mocker.patch(
+            "bedwarsshop.bedwarsshop.get_player_data", return_value=sample_player_data
+        )
+        mock_create_image = mocker.patch("bedwarsshop.bedwarsshop.create_image")
+
+        result = CliRunner().invoke(main, ["testuser", "--show", "--print-layout"])
+
+        assert result.exit_code == 0
+        assert json.loads(result.output)[0][0] == "stone_sword"
+        assert mock_create_image.call_args.kwargs["show"] is True
+
+    def test_main_log_levels(self, mocker):
+        """Test that --quiet and --log-level set the log level."""
+        mocker.patch("bedwarsshop.bedwarsshop.load_constants", return_value=None)
+        configure_logging = mocker.patch("bedwarsshop.bedwarsshop.configure_logging")
+        runner = CliRunner()
+
+        runner.invoke(main, ["testuser"])
+        runner.invoke(main, ["testuser", "--log-level", "warning"])
+        runner.invoke(main, ["testuser", "-q"])
+
+        levels = [call.args[0] for call in configure_logging.call_args_list]
+        assert levels == ["INFO", "WARNING", "ERROR"]
+
+
+class TestCli:
+    """Tests for the cli command group."""
+
+    def test_cli_defaults_to_render(self, mocker, sample_player_data):
+        """Test that a bare player name still renders that player."""
+        mocker.patch("bedwarsshop.bedwarsshop.load_constants", return_value=True)
+        mocker.patch(
+            "bedwarsshop.bedwarsshop.get_player_data", return_value=sample_player_data
+        )
+        mock_create_image = mocker.patch("bedwarsshop.bedwarsshop.create_image")
+
+        result = CliRunner().invoke(cli, ["testuser"])
+
+        assert result.exit_code == 0
+        assert mock_create_image.call_args[0][1] == "testuser"
+
+    def test_cli_migrate_cache(self, isolated_cwd, sample_player_data):
+        """Test that migrate-cache imports the JSON cache files."""
+        PlayerCache("cache").put("testuser", sample_player_data)
+
+        result = CliRunner().invoke(cli, ["migrate-cache"])
+
+        assert result.exit_code == 0
+        assert "Imported 1 players" in result.output
+        assert SQLiteCache("cache/players.sqlite3").get("testuser") is not None
+
+    def test_cli_serve(self, mocker):
+        """Test that serve starts the render server with its options."""
+        mocker.patch("bedwarsshop.bedwarsshop.load_constants", return_value=True)
+        mock_server = mocker.patch("bedwarsshop.server.ShopServer")
+
+        result = CliRunner().invoke(cli, ["serve", "--port", "9000", "--workers", "2"])
+
+        assert result.exit_code == 0
+        mock_server.assert_called_once_with("127.0.0.1", 9000, 2)
+        mock_server.return_value.serve_forever.assert_called_once()
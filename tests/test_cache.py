@@ -0,0 +1,263 @@
+"""Tests for bedwarsshop.cache module."""
+
+import json
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from bedwarsshop.cache import (
+    PlayerCache,
+    SQLiteCache,
+    expand_player_data,
+    migrate_json_cache,
+    slim_player_data,
+)
+from bedwarsshop.helpers import parse_player_data
+
+
+@pytest.fixture
+def player_cache(temp_dir):
+    """A cache without limits in a temporary directory."""
+    return PlayerCache(temp_dir, ttl=None, max_entries=None, max_bytes=None)
+
+
+@pytest.fixture
+def sqlite_cache(temp_dir):
+    """A SQLite cache without expiry in a temporary directory."""
+    return SQLiteCache(temp_dir / "players.sqlite3", ttl=None)
+
+
+class TestSlimEntries:
+    """Tests for the slim cache payload."""
+
+    def test_slim_player_data_keeps_favourites(self, sample_player_data):
+        """Test that only uuid and favourites_2 are kept."""
+        sample_player_data["player"]["uuid"] = "abc"
+        sample_player_data["player"]["stats"]["SkyWars"] = {"wins": 3}
+
+        slim = slim_player_data(sample_player_data)
+
+        assert set(slim) == {"uuid", "favourites_2"}
+        assert slim["uuid"] == "abc"
+
+    def test_expand_round_trips_through_parse(self, sample_player_data):
+        """Test that an expanded entry parses like the full document."""
+        expanded = expand_player_data(slim_player_data(sample_player_data))
+        assert parse_player_data(expanded) == parse_player_data(sample_player_data)
+
+    def test_expand_keeps_parse_failures(self, player_data_no_bedwars):
+        """Test that players without Bedwars stats still fail to parse."""
+        expanded = expand_player_data(slim_player_data(player_data_no_bedwars))
+        assert parse_player_data(expanded) is None
+
+
+class TestPlayerCache:
+    """Tests for PlayerCache class."""
+
+    def test_put_and_get(self, player_cache, sample_player_data):
+        """Test that a stored player is found again."""
+        player_cache.put("testuser", sample_player_data)
+        entry = player_cache.get("testuser")
+        assert entry["favourites_2"].startswith("stone_sword,")
+        assert player_cache.stats()["hits"] == 1
+
+    def test_keys_are_case_insensitive(self, player_cache, sample_player_data):
+        """Test that case variants share one entry."""
+        player_cache.put("GamerBoy80", sample_player_data)
+        assert player_cache.get("gamerboy80") is not None
+        assert player_cache.stats()["entries"] == 1
+
+    def test_unsafe_names_stay_in_directory(self, player_cache, sample_player_data):
+        """Test that names cannot escape the cache directory."""
+        player_cache.put("../evil", sample_player_data)
+        assert player_cache.path("../evil").parent == player_cache.directory
+        assert player_cache.get("../evil") is not None
+
+    def test_miss_is_counted(self, player_cache):
+        """Test that a missing player counts as a miss."""
+        assert player_cache.get("nobody") is None
+        assert player_cache.stats()["misses"] == 1
+
+    def test_stale_entries_are_not_returned(self, temp_dir, sample_player_data, mocker):
+        """Test that entries older than the TTL are stale."""
+        player_cache = PlayerCache(temp_dir, ttl=60)
+        player_cache.put("testuser", sample_player_data)
+        now = json.loads(player_cache.path("testuser").read_text())["fetched_at"]
+        mocker.patch("bedwarsshop.cache.time.time", return_value=now + 61)
+
+        assert player_cache.get("testuser") is None
+        assert player_cache.stats()["stale"] == 1
+
+    def test_evicts_least_recently_used_by_count(self, temp_dir, sample_player_data):
+        """Test that the oldest unused entry is evicted first."""
+        player_cache = PlayerCache(temp_dir, ttl=None, max_entries=2)
+        player_cache.put("a", sample_player_data)
+        player_cache.put("b", sample_player_data)
+        player_cache.get("a")
+        player_cache.put("c", sample_player_data)
+
+        assert player_cache.get("b") is None
+        assert player_cache.get("a") is not None
+        assert not player_cache.path("b").exists()
+        assert player_cache.stats()["evictions"] == 1
+
+    def test_evicts_by_total_bytes(self, temp_dir, sample_player_data):
+        """Test that the cache stays under its byte budget."""
+        player_cache = PlayerCache(temp_dir, ttl=None, max_bytes=1000)
+        for i in range(10):
+            player_cache.put(f"player{i}", sample_player_data)
+
+        stats = player_cache.stats()
+        assert stats["bytes"] <= 1000
+        assert stats["entries"] < 10
+        assert len(list(temp_dir.glob("*.json"))) == stats["entries"]
+
+    def test_index_is_rebuilt_from_disk(self, temp_dir, sample_player_data):
+        """Test that a new process evicts the oldest files first."""
+        first = PlayerCache(temp_dir, ttl=None)
+        first.put("old", sample_player_data)
+        first.put("new", sample_player_data)
+        os.utime(first.path("old"), (1, 1))
+
+        second = PlayerCache(temp_dir, ttl=None, max_entries=2)
+        second.put("newest", sample_player_data)
+
+        assert not second.path("old").exists()
+        assert second.path("new").exists()
+
+    def test_writes_are_atomic(self, player_cache, sample_player_data, mocker):
+        """Test that entries are renamed into place from a temporary file."""
+        replace = mocker.spy(os, "replace")
+        player_cache.put("testuser", sample_player_data)
+
+        replace.assert_called_once()
+        assert replace.call_args[0][1] == player_cache.path("testuser")
+        assert not list(player_cache.directory.glob("*.tmp"))
+
+    def test_failed_write_leaves_no_files(
+        self, player_cache, sample_player_data, mocker
+    ):
+        """Test that a failing write cleans up its temporary file."""
+        mocker.patch("bedwarsshop.cache.os.replace", side_effect=OSError("disk"))
+
+        with pytest.raises(OSError):
+            player_cache.put("testuser", sample_player_data)
+
+        assert not list(player_cache.directory.iterdir())
+
+    def test_reads_full_documents_from_older_versions(
+        self, player_cache, sample_player_data
+    ):
+        """Test that cache files holding a whole player document still work."""
+        player_cache.path("legacy").write_text(json.dumps(sample_player_data))
+
+        entry = player_cache.get("legacy")
+
+        assert entry["favourites_2"].startswith("stone_sword,")
+        assert "fetched_at" in entry
+
+    def test_get_many_skips_misses(self, player_cache, sample_player_data):
+        """Test that a batched lookup only returns cached players."""
+        player_cache.put("a", sample_player_data)
+        assert list(player_cache.get_many(["a", "b"])) == ["a"]
+
+    def test_delete(self, player_cache, sample_player_data):
+        """Test that deleted entries are gone from disk and the totals."""
+        player_cache.put("a", sample_player_data)
+        player_cache.put("b", sample_player_data)
+
+        assert player_cache.delete(["A", "c"]) == 1
+        assert player_cache.get("a") is None
+        assert player_cache.stats()["entries"] == 1
+        assert player_cache.stats()["bytes"] == player_cache.path("b").stat().st_size
+
+
+class TestSQLiteCache:
+    """Tests for SQLiteCache class."""
+
+    def test_thread_connection_closed_on_exit(self, sqlite_cache):
+        """Test that a thread's connection is closed when the thread ends."""
+        connections = []
+        thread = threading.Thread(
+            target=lambda: connections.append(sqlite_cache.connection())
+        )
+        thread.start()
+        thread.join()
+
+        with pytest.raises(sqlite3.ProgrammingError, match="closed"):
+            connections[0].execute("SELECT 1")
+
+    def test_put_and_get(self, sqlite_cache, sample_player_data):
+        """Test that a stored player is found again, case-insensitively."""
+        sample_player_data["player"]["uuid"] = "abc"
+        sqlite_cache.put("GamerBoy80", sample_player_data)
+
+        entry = sqlite_cache.get("gamerboy80")
+
+        assert entry["favourites_2"].startswith("stone_sword,")
+        assert entry["uuid"] == "abc"
+        assert sqlite_cache.stats()["hits"] == 1
+        assert sqlite_cache.stats()["entries"] == 1
+
+    def test_uses_wal_mode(self, sqlite_cache):
+        """Test that the database is opened in WAL mode."""
+        mode = sqlite_cache.connection().execute("PRAGMA journal_mode").fetchone()
+        assert mode[0] == "wal"
+
+    def test_get_many_uses_batched_queries(
+        self, sqlite_cache, sample_player_data, mocker
+    ):
+        """Test that many names are resolved in a few queries."""
+        sqlite_cache.BATCH_SIZE = 2
+        for name in ["a", "b", "c"]:
+            sqlite_cache.put(name, sample_player_data)
+        statements = []
+        sqlite_cache.connection().set_trace_callback(statements.append)
+
+        found = sqlite_cache.get_many(["A", "b", "c", "d", "e"])
+
+        assert set(found) == {"A", "b", "c"}
+        assert len(statements) == 3
+        assert sqlite_cache.stats()["misses"] == 2
+
+    def test_delete(self, sqlite_cache, sample_player_data):
+        """Test that entries are deleted in batches, case-insensitively."""
+        sqlite_cache.BATCH_SIZE = 2
+        for name in ["a", "b", "c"]:
+            sqlite_cache.put(name, sample_player_data)
+
+        assert sqlite_cache.delete(["A", "b", "c", "d"]) == 3
+        assert sqlite_cache.stats()["entries"] == 0
+
+    def test_get_by_uuid(self, sqlite_cache, sample_player_data):
+        """Test that a player can be found by uuid."""
+        sample_player_data["player"]["uuid"] = "abc"
+        sqlite_cache.put("testuser", sample_player_data)
+
+        assert sqlite_cache.get_by_uuid("abc")["favourites_2"] is not None
+        assert sqlite_cache.get_by_uuid("def") is None
+
+    def test_stale_entries_are_purged(self, temp_dir, sample_player_data, mocker):
+        """Test that expired entries are skipped and deleted in bulk."""
+        sqlite_cache = SQLiteCache(temp_dir / "players.sqlite3", ttl=60)
+        now = sqlite_cache.put("testuser", sample_player_data)["fetched_at"]
+        mocker.patch("bedwarsshop.cache.time.time", return_value=now + 61)
+
+        assert sqlite_cache.get("testuser") is None
+        assert sqlite_cache.purge_stale() == 1
+        stats = sqlite_cache.stats()
+        assert (stats["stale"], stats["evictions"], stats["entries"]) == (1, 1, 0)
+
+    def test_migrate_json_cache(self, temp_dir, sample_player_data):
+        """Test that slim and legacy JSON files are imported."""
+        json_cache = PlayerCache(temp_dir / "json", ttl=None)
+        json_cache.put("Slim Player", sample_player_data)
+        json_cache.path("legacy").write_text(json.dumps(sample_player_data))
+        (temp_dir / "json" / "broken.json").write_text("{")
+        sqlite_cache = SQLiteCache(temp_dir / "players.sqlite3", ttl=None)
+
+        assert migrate_json_cache(temp_dir / "json", sqlite_cache, batch_size=1) == 2
+        assert sqlite_cache.get("slim player") == json_cache.get("slim player")
+        assert sqlite_cache.get("legacy") is not None
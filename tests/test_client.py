@@ -0,0 +1,185 @@
+"""Tests for bedwarsshop.client module."""
+
+import time
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+
+from bedwarsshop.client import HypixelClient, MojangClient, RateLimiter, get_client
+
+
+def make_response(status_code=200, headers=None, data=None):
+    """Build a fake requests response."""
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.json.return_value = data
+    return response
+
+
+@pytest.fixture
+def mock_sleep(mocker):
+    """Mock time.sleep so retries do not wait."""
+    return mocker.patch("bedwarsshop.client.time.sleep")
+
+
+class TestRateLimiter:
+    """Tests for RateLimiter class."""
+
+    def test_rate_limiter_allows_burst(self):
+        """Test that a full bucket does not block."""
+        limiter = RateLimiter(rate=1, capacity=5)
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.acquire()
+        assert time.monotonic() - start < 0.5
+
+    def test_rate_limiter_waits_when_empty(self, mocker, mock_sleep):
+        """Test that an empty bucket waits for the next token."""
+        limiter = RateLimiter(rate=2, capacity=1)
+        limiter.acquire()
+        mocker.patch(
+            "bedwarsshop.client.time.monotonic",
+            side_effect=[limiter.updated, limiter.updated + 0.5],
+        )
+        limiter.acquire()
+        mock_sleep.assert_called_once()
+        assert mock_sleep.call_args[0][0] == 0.5
+
+    def test_update_caps_tokens_to_remaining(self):
+        """Test that the API quota overrides the local token count."""
+        limiter = RateLimiter(rate=1, capacity=100)
+        limiter.update(remaining=3, reset=30)
+        assert limiter.tokens <= 3
+        assert limiter.rate == pytest.approx(0.1)
+
+    def test_update_pauses_when_quota_is_used(self, mocker, mock_sleep):
+        """Test that an exhausted quota blocks until the window resets."""
+        limiter = RateLimiter(rate=1, capacity=10)
+        limiter.update(remaining=0, reset=12)
+        now = limiter.updated
+        mocker.patch("bedwarsshop.client.time.monotonic", side_effect=[now, now + 12])
+
+        limiter.acquire()
+
+        assert mock_sleep.call_args[0][0] == pytest.approx(12)
+        assert limiter.tokens == 9
+
+
+class TestHypixelClient:
+    """Tests for HypixelClient class."""
+
+    def test_client_sends_key_in_header(self):
+        """Test that the API key is a header, not part of the URL."""
+        client = HypixelClient("secret-key")
+        assert client.session.headers["API-Key"] == "secret-key"
+
+    def test_get_player_uses_timeout(self, mocker):
+        """Test that every request has an explicit timeout."""
+        client = HypixelClient("key", timeout=7)
+        get = mocker.patch.object(
+            client.session, "get", return_value=make_response(data={"success": True})
+        )
+
+        assert client.get_player("testuser") == {"success": True}
+        assert get.call_args.kwargs["timeout"] == 7
+        assert get.call_args.kwargs["params"] == {"name": "testuser"}
+
+    def test_get_retries_on_rate_limit(self, mocker, mock_sleep):
+        """Test that a 429 is retried after the advertised reset."""
+        client = HypixelClient("key", limiter=RateLimiter(100, 100))
+        mocker.patch.object(
+            client.session,
+            "get",
+            side_effect=[
+                make_response(429, {"RateLimit-Remaining": "0", "Retry-After": "3"}),
+                make_response(200, data={"success": True}),
+            ],
+        )
+
+        response = client.get("player", name="testuser")
+
+        assert response.status_code == 200
+        assert mock_sleep.call_args_list[0][0][0] >= 3
+
+    def test_get_retries_connection_errors(self, mocker, mock_sleep):
+        """Test that connection errors are retried with backoff."""
+        client = HypixelClient("key", retries=2)
+        get = mocker.patch.object(
+            client.session, "get", side_effect=requests.ConnectionError("refused")
+        )
+
+        assert client.get("player") is None
+        assert get.call_count == 3
+        assert mock_sleep.call_count == 2
+
+    def test_get_does_not_retry_client_errors(self, mocker, mock_sleep):
+        """Test that a 4xx other than 429 is returned immediately."""
+        client = HypixelClient("key")
+        get = mocker.patch.object(
+            client.session, "get", return_value=make_response(403)
+        )
+
+        assert client.get_player("testuser") is None
+        get.assert_called_once()
+        mock_sleep.assert_not_called()
+
+    def test_backoff_is_jittered_and_bounded(self):
+        """Test that backoff delays grow exponentially up to the maximum."""
+        client = HypixelClient("key", backoff=1, backoff_max=8)
+        for attempt, ceiling in enumerate([1, 2, 4, 8, 8]):
+            delay = client.backoff_delay(attempt)
+            assert ceiling / 2 <= delay <= ceiling
+
+    def test_get_client_is_shared(self):
+        """Test that the session is reused for the same API key."""
+        get_client.cache_clear()
+        assert get_client("key") is get_client("key")
+        get_client.cache_clear()
+
+    def test_get_player_by_uuid(self, mocker):
+        """Test that a player can be fetched by uuid."""
+        client = HypixelClient("key")
+        get = mocker.patch.object(
+            client.session, "get", return_value=make_response(data={"success": True})
+        )
+
+        assert client.get_player_by_uuid("abc") == {"success": True}
+        assert get.call_args.kwargs["params"] == {"uuid": "abc"}
+
+
+class TestMojangClient:
+    """Tests for MojangClient class."""
+
+    def test_get_uuids_in_batches(self, mocker):
+        """Test that names are sent ten at a time and matched by name."""
+        client = MojangClient("https://mojang.test")
+        names = [f"player_{i}" for i in range(12)]
+        post = mocker.patch.object(
+            client.session,
+            "post",
+            side_effect=[
+                make_response(data=[{"id": "a0", "name": "Player_0"}]),
+                make_response(data=[{"id": "b1", "name": "PLAYER_11"}]),
+            ],
+        )
+
+        uuids = client.get_uuids(names)
+
+        assert [call.kwargs["json"] for call in post.call_args_list] == [
+            names[:10],
+            names[10:],
+        ]
+        assert post.call_args.args[0] == "https://mojang.test/profiles/minecraft"
+        assert uuids == {**dict.fromkeys(names), "player_0": "a0", "player_11": "b1"}
+
+    def test_get_uuids_skips_failures_and_bad_names(self, mocker, mock_sleep):
+        """Test that failed batches are left out and bad names not sent."""
+        client = MojangClient("https://mojang.test", retries=0)
+        post = mocker.patch.object(
+            client.session, "post", return_value=make_response(400)
+        )
+
+        assert client.get_uuids(["alice", "not a name"]) == {"not a name": None}
+        assert post.call_args.kwargs["json"] == ["alice"]
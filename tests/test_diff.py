@@ -0,0 +1,130 @@
+"""Tests for bedwarsshop.diff module."""
+
+import pytest
+from click.testing import CliRunner
+from PIL import Image, ImageChops
+
+from bedwarsshop import constants as c
+from bedwarsshop.atlas import icon_atlas
+from bedwarsshop.bedwarsshop import cli
+from bedwarsshop.diff import bases, diff_layouts, draw_changes, render_diff
+from bedwarsshop.helpers import render_shop, split_favourites
+from bedwarsshop.layout import Layout
+from bedwarsshop.render import draw_grid, draw_slot, new_canvas
+from tests.fakeapi import DEFAULT_LAYOUT
+
+OLD = split_favourites(DEFAULT_LAYOUT)
+
+
+def changed(**slots):
+    """OLD with some slots, named like s20, replaced."""
+    layout = [row[:] for row in OLD]
+    for slot, item in slots.items():
+        y, x = divmod(int(slot[1:]), 7)
+        layout[y][x] = item
+    return layout
+
+
+@pytest.fixture(params=[list, Layout.from_rows], ids=["lists", "Layout"])
+def form(request):
+    return request.param
+
+
+class TestDiffLayouts:
+    """Tests for diff_layouts function."""
+
+    def test_unchanged(self, form):
+        """Test that equal layouts have no changes."""
+        diff = diff_layouts(form(OLD), form(changed()))
+
+        assert not diff
+        assert diff.cells() == {}
+
+    def test_swap_is_two_moves(self, form):
+        """Test that swapped items are moves in both directions."""
+        new = changed(s0=OLD[0][1], s1=OLD[0][0])
+
+        diff = diff_layouts(form(OLD), form(new))
+
+        assert (diff.added, diff.removed) == ([], [])
+        assert diff.moved == [(OLD[0][1], 1, 0), (OLD[0][0], 0, 1)]
+        assert diff.cells() == {0: "moved", 1: "moved"}
+
+    def test_added_removed_and_replaced(self, form):
+        """Test new items, emptied slots and replaced items."""
+        new = changed(s10="null", s20="mystery_item", s3=OLD[0][6], s6="null")
+
+        diff = diff_layouts(form(OLD), form(new))
+
+        assert diff.added == [(20, "mystery_item")]
+        assert diff.removed == [(3, OLD[0][3]), (10, OLD[1][3]), (20, OLD[2][6])]
+        assert diff.moved == [(OLD[0][6], 6, 3)]
+        assert diff.cells() == {3: "moved", 6: "moved", 10: "removed", 20: "added"}
+
+    def test_repeated_items(self):
+        """Test that a copy of a kept item is added, not moved."""
+        old = changed(s0="wool", s1="wool")
+        new = changed(s0="wool", s1="null", s2="wool")
+
+        diff = diff_layouts(old, new)
+
+        assert diff.moved == [("wool", 1, 2)]
+        assert diff.removed == [(2, OLD[0][2])]
+        more = changed(s0="wool", s1="null", s2="wool", s5="wool")
+        assert diff_layouts(new, more).added == [(5, "wool")]
+
+
+class TestRenderDiff:
+    """Tests for render_diff function."""
+
+    def test_matches_full_render(self):
+        """Test that redrawing changed rows gives the same image as a render."""
+        new = changed(s0=OLD[0][1], s1=OLD[0][0], s20="mystery_item")
+        diff = diff_layouts(OLD, new)
+        expected = new_canvas()
+        icons = icon_atlas(c.CELL_SIZE)
+        for y, row in enumerate(new):
+            for x, item in enumerate(row):
+                draw_slot(expected, item, icons.get(item), x, y)
+        draw_grid(expected)
+        draw_changes(expected, diff)
+
+        image = render_diff(OLD, new)
+
+        assert ImageChops.difference(image, expected).getbbox() is None
+        frame = image.getpixel((c.CELL_SIZE * 6 + 5, c.CELL_SIZE * 2 + 200))
+        assert frame == (*c.DIFF_COLORS["added"], 255)
+
+    def test_reuses_drawing_of_old_layout(self):
+        """Test that diffs against one layout share its cached drawing."""
+        bases.clear()
+
+        render_diff(OLD, changed(s0="tnt"))
+        unchanged = render_diff(OLD, OLD)
+
+        assert bases.stats()["hits"] == 1
+        assert ImageChops.difference(unchanged, render_shop(OLD)).getbbox() is None
+
+
+class TestDiffCommand:
+    """Tests for the diff command."""
+
+    def test_diff_command(self, isolated_cwd):
+        """Test that changes are listed and the image is saved."""
+        new = ",".join(sum(changed(s0="null", s20="mystery_item"), []))
+
+        result = CliRunner().invoke(
+            cli, ["diff", DEFAULT_LAYOUT, new, "-o", "diff.png"]
+        )
+
+        assert result.exit_code == 0
+        assert "added   mystery_item at row 3, column 7" in result.output
+        assert f"removed {OLD[0][0]} from row 1, column 1" in result.output
+        with Image.open(isolated_cwd / "diff.png") as image:
+            assert image.size == (7 * c.CELL_SIZE, 3 * c.CELL_SIZE)
+
+    def test_diff_command_bad_layout(self):
+        """Test that a layout without 21 items is rejected."""
+        result = CliRunner().invoke(cli, ["diff", "tnt,wool", DEFAULT_LAYOUT])
+
+        assert result.exit_code == 2
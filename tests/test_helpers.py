@@ -1,14 +1,26 @@
 """Tests for bedwarsshop.helpers module."""
 
+import io
 import json
-from unittest.mock import MagicMock, mock_open
+from unittest.mock import MagicMock
 
+import pytest
+from PIL import Image
+
+from bedwarsshop import constants as c
+from bedwarsshop import helpers
+from bedwarsshop.cache import get_cache
 from bedwarsshop.helpers import (
+    configure_output,
     create_image,
+    encode_image,
     get_player_data,
     load_constants,
     parse_player_data,
+    render_image,
+    render_shop,
 )
+from bedwarsshop.render import layout_hash
 
 
 class TestLoadConstants:
@@ -47,48 +59,47 @@ class TestLoadConstants:
 class TestGetPlayerData:
     """Tests for get_player_data function."""
 
-    def test_get_player_data_from_cache(self, mock_api_key, sample_player_data, mocker):
+    def test_get_player_data_from_cache(
+        self, mock_api_key, sample_player_data, mock_requests_get, isolated_cwd
+    ):
         """Test getting player data from cache."""
-        # Mock os.path.exists to return True (cache exists)
-        mocker.patch("os.path.exists", return_value=True)
-
-        # Mock file opening and JSON loading
-        mock_file_open = mock_open(read_data=json.dumps(sample_player_data))
-        mocker.patch("builtins.open", mock_file_open)
+        get_cache().put("testuser", sample_player_data)
 
         result = get_player_data("testuser")
 
-        assert result == sample_player_data
-        mock_file_open.assert_called_once_with("cache/testuser.json")
+        assert parse_player_data(result) == parse_player_data(sample_player_data)
+        mock_requests_get.assert_not_called()
+
+    def test_get_player_data_cache_is_case_insensitive(
+        self, mock_api_key, sample_player_data, mock_requests_get, isolated_cwd
+    ):
+        """Test that case variants of a name share one cache entry."""
+        get_cache().put("TestUser", sample_player_data)
+
+        assert get_player_data("testUSER") is not None
+        mock_requests_get.assert_not_called()
 
     def test_get_player_data_from_api_success(
-        self, mock_api_key, sample_player_data, mock_requests_get, mocker
+        self, mock_api_key, sample_player_data, mock_requests_get, isolated_cwd
     ):
         """Test successful API call for player data."""
-        # Mock cache not existing
-        mocker.patch("os.path.exists", return_value=False)
-
         # Mock successful API response
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = sample_player_data
         mock_requests_get.return_value = mock_response
 
-        # Mock file writing
-        mock_file_open = mock_open()
-        mocker.patch("builtins.open", mock_file_open)
-
         result = get_player_data("testuser")
 
         assert result == sample_player_data
         mock_requests_get.assert_called_once()
-        assert "testuser" in mock_requests_get.call_args[0][0]
+        assert mock_requests_get.call_args.kwargs["params"] == {"name": "testuser"}
+        assert mock_api_key not in mock_requests_get.call_args[0][0]
 
-    def test_get_player_data_api_failure(self, mock_api_key, mock_requests_get, mocker):
+    def test_get_player_data_api_failure(
+        self, mock_api_key, mock_requests_get, isolated_cwd
+    ):
         """Test API failure when getting player data."""
-        # Mock cache not existing
-        mocker.patch("os.path.exists", return_value=False)
-
         # Mock failed API response
         mock_response = MagicMock()
         mock_response.status_code = 404
@@ -97,30 +108,25 @@ class TestGetPlayerData:
         result = get_player_data("nonexistentuser")
 
         assert result is None
+        assert not (isolated_cwd / "cache" / "nonexistentuser.json").exists()
 
     def test_get_player_data_saves_to_cache(
-        self, mock_api_key, sample_player_data, mock_requests_get, mocker
+        self, mock_api_key, sample_player_data, mock_requests_get, isolated_cwd
     ):
-        """Test that API response is saved to cache."""
-        # Mock cache not existing
-        mocker.patch("os.path.exists", return_value=False)
-
+        """Test that the slim API response is saved to cache."""
         # Mock successful API response
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = sample_player_data
         mock_requests_get.return_value = mock_response
 
-        # Mock file writing
-        mock_file_open = mock_open()
-        mocker.patch("builtins.open", mock_file_open)
-        mock_json_dump = mocker.patch("json.dump")
-
         result = get_player_data("testuser")
 
         assert result == sample_player_data
-        mock_file_open.assert_called_with("cache/testuser.json", "w")
-        mock_json_dump.assert_called_once_with(sample_player_data, mock_file_open())
+        cached = json.loads((isolated_cwd / "cache" / "testuser.json").read_text())
+        favourites = sample_player_data["player"]["stats"]["Bedwars"]["favourites_2"]
+        assert cached["favourites_2"] == favourites
+        assert "fetched_at" in cached
 
 
 class TestParsePlayerData:
@@ -275,3 +281,160 @@ class TestCreateImage:
 
         # Check that Path was called with "output"
         assert any("output" in str(call) for call in mock_path_class.call_args_list)
+
+    def test_create_image_skips_unchanged_layout(self, isolated_cwd, mocker):
+        """Test that an up to date image is not rendered again."""
+        (isolated_cwd / "output").mkdir()
+        render_shop = mocker.spy(helpers, "render_shop")
+        layout = [["tnt"] + ["null"] * 6] + [["null"] * 7] * 2
+        changed = [["null"] * 7] * 3
+
+        assert create_image(layout, "testuser", show=False) is True
+        assert create_image(layout, "testuser", show=False) is False
+        assert create_image(layout, "testuser", show=False, force=True) is True
+        assert create_image(changed, "testuser", show=False) is True
+
+        assert render_shop.call_count == 3
+        assert (isolated_cwd / "output" / "testuser.hash").read_text() == (
+            layout_hash(changed)
+        )
+
+    def test_create_image_renders_when_image_is_missing(self, isolated_cwd):
+        """Test that a hash without its image does not skip the render."""
+        (isolated_cwd / "output").mkdir()
+        layout = [["null"] * 7] * 3
+        create_image(layout, "testuser", show=False)
+        (isolated_cwd / "output" / "testuser.png").unlink()
+
+        assert create_image(layout, "testuser", show=False) is True
+
+
+class TestOutputSettings:
+    """Tests for the output size and encoder settings."""
+
+    LAYOUT = [["tnt", "wool", "null", "bow", "null", "null", "shears"]] * 3
+
+    def test_encode_image_formats(self, temp_dir):
+        """Test that lossless formats keep the pixels and png8 is a palette."""
+        image = render_shop(self.LAYOUT)
+        for image_format, suffix in [("png", ".png"), ("webp", ".webp")]:
+            encode_image(image, temp_dir / f"shop{suffix}", image_format)
+            with Image.open(temp_dir / f"shop{suffix}") as saved:
+                assert saved.format == image_format.upper()
+                assert saved.convert("RGBA").tobytes() == image.tobytes()
+        encode_image(image, temp_dir / "shop8.png", "png8")
+        with Image.open(temp_dir / "shop8.png") as saved:
+            assert saved.mode == "P"
+
+    def test_encode_image_uses_png_settings(self, monkeypatch, mocker):
+        """Test that the PNG compression settings reach the encoder."""
+        monkeypatch.setattr(c, "PNG_COMPRESS_LEVEL", 1)
+        monkeypatch.setattr(c, "PNG_OPTIMIZE", True)
+        image = MagicMock()
+
+        encode_image(image, "shop.png", "png")
+
+        image.save.assert_called_once_with(
+            "shop.png", "PNG", compress_level=1, optimize=True
+        )
+
+    def test_encode_image_rejects_unknown_format(self):
+        """Test that an unknown format is an error."""
+        with pytest.raises(ValueError):
+            encode_image(MagicMock(), "shop.gif", "gif")
+
+    def test_create_image_uses_configured_output(self, isolated_cwd, monkeypatch):
+        """Test that cell size and format apply to the saved image."""
+        (isolated_cwd / "output").mkdir()
+        monkeypatch.setattr(c, "CELL_SIZE", c.CELL_SIZE)
+        monkeypatch.setattr(c, "OUTPUT_FORMAT", c.OUTPUT_FORMAT)
+        configure_output({"CELL_SIZE": 64, "OUTPUT_FORMAT": "webp"})
+
+        create_image(self.LAYOUT, "testuser", show=False)
+
+        with Image.open(isolated_cwd / "output" / "testuser.webp") as saved:
+            assert saved.size == (7 * 64, 3 * 64)
+
+    def test_render_image_encodes_in_memory(self, isolated_cwd):
+        """Test that render_image returns the encoded image without files."""
+        data = render_image(self.LAYOUT, "webp")
+
+        assert isinstance(data, memoryview)
+        with Image.open(io.BytesIO(data)) as decoded:
+            assert decoded.format == "WEBP"
+            assert decoded.convert("RGBA").tobytes() == (
+                render_shop(self.LAYOUT).tobytes()
+            )
+        assert list(isolated_cwd.iterdir()) == []
+
+    def test_create_image_writes_render_image_bytes(self, isolated_cwd):
+        """Test that the saved file holds exactly the in-memory encoding."""
+        (isolated_cwd / "output").mkdir()
+
+        create_image(self.LAYOUT, "testuser", show=False)
+
+        saved = (isolated_cwd / "output" / "testuser.png").read_bytes()
+        assert saved == bytes(render_image(self.LAYOUT))
+
+    def test_configure_output_rejects_unknown_settings(self):
+        """Test that only output settings can be overridden."""
+        with pytest.raises(ValueError):
+            configure_output({"API_URL": "http://example.com"})
+
+
+class TestBulkRender:
+    """Tests for the optional NumPy renderer in bedwarsshop.bulkrender."""
+
+    LONG = "invisibility_potion_(30_seconds)"
+
+    def test_blend_matches_pillow_paste(self):
+        """Test that blending through a mask is bit-exact with Pillow."""
+        np = pytest.importorskip("numpy")
+        from bedwarsshop.bulkrender import blend
+
+        rng = np.random.default_rng(0)
+        pixels = rng.integers(0, 256, (256, 256, 4), dtype=np.uint8)
+        pixels[::5, :, 3] = 0
+        mask = np.tile(np.arange(256, dtype=np.uint8), (256, 1))
+        for ink in [(255, 255, 255, 204), (200, 100, 50, 255), (1, 2, 3, 0)]:
+            expected = Image.fromarray(pixels.copy())
+            expected.paste(ink, (0, 0), Image.fromarray(mask))
+            region = pixels.copy()
+            blend(region, ink, mask)
+            assert np.array_equal(region, np.asarray(expected))
+
+    def test_render_shops_matches_render_shop(self):
+        """Test that the NumPy renderer is pixel-identical to Pillow."""
+        np = pytest.importorskip("numpy")
+        from bedwarsshop.bulkrender import render_shops, shop_shape
+
+        long = self.LONG
+        layouts = [
+            [
+                [long, "null", long, "unknown_item", long, "tnt", long],
+                ["stone_sword", long, "null", "null", "unknown_item", "wool", "x"],
+                ["null"] * 6 + ["unknown_item"],
+            ],
+            [["null"] * 7] * 3,
+            [["bow", "arrow", "wool", "tnt", "ladder", "shears", "fireball"]] * 3,
+        ]
+
+        shops = render_shops(layouts)
+
+        assert shops.shape == (3, *shop_shape())
+        for shop, layout in zip(shops, layouts, strict=True):
+            assert np.array_equal(shop, np.asarray(render_shop(layout)))
+
+    def test_render_batch_keeps_order(self, mocker):
+        """Test that batches are rendered in chunks and yielded in order."""
+        pytest.importorskip("numpy")
+        from bedwarsshop import bulkrender
+
+        spy = mocker.spy(bulkrender, "render_shops")
+        layouts = [[[item] * 7] * 3 for item in ["tnt", "wool", "null"]]
+
+        images = list(bulkrender.render_batch(layouts, batch_size=2))
+
+        assert [len(call.args[0]) for call in spy.call_args_list] == [2, 1]
+        for image, layout in zip(images, layouts, strict=True):
+            assert image.tobytes() == render_shop(layout).tobytes()
@@ -0,0 +1,303 @@
+"""Tests for bedwarsshop.history module."""
+
+import json
+import multiprocessing
+
+import pytest
+from click.testing import CliRunner
+
+from bedwarsshop import constants as c
+from bedwarsshop.bedwarsshop import cli
+from bedwarsshop.cache import get_cache
+from bedwarsshop.helpers import fetch_player_data, split_favourites
+from bedwarsshop.history import DELTA, KEYFRAME, RECORD, SnapshotStore, get_history
+from bedwarsshop.layout import Layout
+from tests.fakeapi import DEFAULT_LAYOUT, player_uuid
+
+OLD = split_favourites(DEFAULT_LAYOUT)
+
+
+def changed(step):
+    """OLD with slot `step % 21` emptied, a distinct layout per step."""
+    layout = [row[:] for row in OLD]
+    y, x = divmod(step % 21, 7)
+    layout[y][x] = "null"
+    return layout
+
+
+@pytest.fixture
+def store(temp_dir):
+    store = SnapshotStore(temp_dir / "history", shards=2)
+    yield store
+    store.close()
+
+
+def write_players(directory, writer, players):
+    """Records players that are new to the shard, from another process."""
+    store = SnapshotStore(directory, shards=1)
+    try:
+        for step in range(players):
+            store.record(f"{writer}-{step}", changed(step), step)
+            store.record(f"{writer}-{step}", changed(step + 1), step + 1)
+    finally:
+        store.close()
+
+
+def kinds(shard):
+    """Kinds of the snapshot records of a shard, in file order."""
+    return [
+        RECORD.unpack_from(shard.map, offset)[0]
+        for offsets in shard.offsets
+        for offset in offsets
+    ]
+
+
+class TestSnapshotStore:
+    """Tests for SnapshotStore class."""
+
+    def test_record_and_history(self, store):
+        """Test that changed layouts are stored and unchanged ones skipped."""
+        assert store.record("Player", OLD, 100)
+        assert not store.record("player", Layout.from_rows(OLD), 200)
+        assert store.record("PLAYER", changed(3), 300)
+
+        history = store.history("player")
+
+        assert [t for t, _ in history] == [100, 300]
+        assert [layout.to_rows() for _, layout in history] == [OLD, changed(3)]
+        assert store.history("nobody") == []
+
+    def test_deltas_and_keyframes(self, store, monkeypatch):
+        """Test that snapshots decode across deltas and keyframes."""
+        monkeypatch.setattr(c, "HISTORY_KEYFRAME_INTERVAL", 4)
+        for step in range(10):
+            store.record("player", changed(step), step)
+
+        shard, _ = store.shard("player")
+        shard._ensure_mapped()
+
+        assert kinds(shard) == [KEYFRAME, DELTA, DELTA, DELTA] * 2 + [KEYFRAME, DELTA]
+        for step in range(10):
+            assert store.at("player", step).to_rows() == changed(step)
+
+    def test_at_point_in_time(self, store):
+        """Test lookups between, before and after snapshots."""
+        store.record("player", OLD, 100)
+        store.record("player", changed(5), 200)
+
+        assert store.at("player", 99) is None
+        assert store.at("player", 150).to_rows() == OLD
+        assert store.at("player", 200).to_rows() == changed(5)
+        assert store.latest("player").to_rows() == changed(5)
+        assert store.latest("nobody") is None
+
+    def test_older_snapshot_rejected(self, store):
+        """Test that snapshots cannot be written out of order."""
+        store.record("player", OLD, 100)
+
+        with pytest.raises(ValueError, match="older"):
+            store.record("player", changed(1), 50)
+
+    def test_reopen_rebuilds_index(self, store, temp_dir):
+        """Test that a new store reads what another one wrote."""
+        store.record("player", OLD, 100)
+        store.record("player", changed(20), 200)
+        store.record("other", changed(2), 150)
+        reader = SnapshotStore(temp_dir / "history", shards=2)
+        try:
+            assert reader.at("player", 100).to_rows() == OLD
+            assert reader.latest("other").to_rows() == changed(2)
+            # records appended after the reader opened are picked up
+            store.record("player", OLD, 300)
+            assert reader.latest("player").to_rows() == OLD
+            assert not reader.record("player", OLD, 400)
+        finally:
+            reader.close()
+
+    def test_unknown_items(self, store, temp_dir):
+        """Test that items missing from ICONS_DICT round trip by name."""
+        layout = [row[:] for row in OLD]
+        layout[2][6] = "mystery_item"
+        store.record("player", layout, 100)
+        store.close()
+
+        reopened = SnapshotStore(temp_dir / "history", shards=2)
+        try:
+            assert reopened.latest("player").to_rows() == layout
+        finally:
+            reopened.close()
+
+    def test_truncated_record_dropped(self, store, temp_dir):
+        """Test that a torn write at the end of a shard is dropped."""
+        store.record("player", OLD, 100)
+        shard, _ = store.shard("player")
+        store.close()
+        with shard.path.open("ab") as file:
+            file.write(RECORD.pack(DELTA, 10) + b"\x00\x00")
+
+        reopened = SnapshotStore(temp_dir / "history", shards=2)
+        try:
+            assert reopened.latest("player").to_rows() == OLD
+            assert reopened.record("player", changed(4), 200)
+            assert [t for t, _ in reopened.history("player")] == [100, 200]
+        finally:
+            reopened.close()
+
+    def test_scan(self, store):
+        """Test that a scan reads every snapshot of every player in order."""
+        for step in range(3):
+            store.record("a", changed(step), step)
+            store.record("b", changed(step + 10), step)
+
+        snapshots = sorted(
+            (name, t, layout.to_rows()) for name, t, layout in store.scan()
+        )
+
+        assert snapshots == [
+            (name, step, changed(step + offset))
+            for name, offset in [("a", 0), ("b", 10)]
+            for step in range(3)
+        ]
+
+    def test_keyframe_interval_changed(self, store, temp_dir, monkeypatch):
+        """Test that shards decode after HISTORY_KEYFRAME_INTERVAL changed."""
+        for step in range(10):
+            store.record("player", changed(step), step)
+        store.close()
+        monkeypatch.setattr(c, "HISTORY_KEYFRAME_INTERVAL", 4)
+
+        reopened = SnapshotStore(temp_dir / "history", shards=2)
+        try:
+            for step in range(10, 13):
+                reopened.record("player", changed(step), step)
+            shard, _ = reopened.shard("player")
+            shard._ensure_mapped()
+
+            assert kinds(shard) == [KEYFRAME] + [DELTA] * 9 + [KEYFRAME, DELTA, DELTA]
+            for step in range(13):
+                assert reopened.at("player", step).to_rows() == changed(step)
+        finally:
+            reopened.close()
+
+    def test_concurrent_processes(self, temp_dir):
+        """Test that processes writing one shard do not interleave ids."""
+        directory = temp_dir / "history"
+        writers = [
+            multiprocessing.Process(target=write_players, args=(directory, w, 200))
+            for w in ["a", "b", "c"]
+        ]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+
+        reader = SnapshotStore(directory, shards=1)
+        try:
+            assert [writer.exitcode for writer in writers] == [0, 0, 0]
+            for w in ["a", "b", "c"]:
+                for step in range(200):
+                    history = reader.history(f"{w}-{step}")
+                    assert [t for t, _ in history] == [step, step + 1]
+                    assert history[1][1].to_rows() == changed(step + 1)
+        finally:
+            reader.close()
+
+    def test_empty_file_gets_header(self, temp_dir):
+        """Test that a shard another process created but not filled opens."""
+        (temp_dir / "history").mkdir()
+        (temp_dir / "history" / "shard-000.snap").touch()
+
+        store = SnapshotStore(temp_dir / "history", shards=1)
+        try:
+            assert store.record("player", OLD, 100)
+            assert store.latest("player").to_rows() == OLD
+        finally:
+            store.close()
+
+    def test_corrupt_shard(self, store):
+        """Test that a record referring to an unknown player is rejected."""
+        store.record("player", OLD, 100)
+        shard, _ = store.shard("player")
+        with shard.path.open("ab") as file:
+            file.write(RECORD.pack(KEYFRAME, 29) + bytes(29))
+            file.write(RECORD.pack(KEYFRAME, 29) + b"\x07" + bytes(28))
+
+        with pytest.raises(ValueError, match="unknown player id 7"):
+            store.latest("player")
+        with pytest.raises(ValueError, match="unknown player id 7"):
+            store.record("player", changed(1), 200)
+
+    def test_invalid_layout(self, store):
+        """Test that layouts of the wrong size are rejected."""
+        with pytest.raises(ValueError, match="21 slots"):
+            store.record("player", OLD[:2], 100)
+
+
+class TestRecordHistory:
+    """Tests for recording the history of fetched players."""
+
+    def test_fetch_records_changes(self, fake_hypixel, mocker):
+        """Test that API fetches record a snapshot by uuid when it changed."""
+        mocker.patch.object(get_cache(), "get", return_value=None)
+        fetch_player_data("testuser")
+        fetch_player_data("testuser")
+        fake_hypixel.players["testuser"] = ",".join(
+            name for row in changed(0) for name in row
+        )
+        fetch_player_data("testuser")
+
+        history = get_history().history(player_uuid("testuser"))
+
+        assert len(fake_hypixel.requests) == 3
+        assert [layout.to_rows() for _, layout in history] == [OLD, changed(0)]
+
+    def test_corrupt_history_is_logged(self, fake_hypixel, mocker):
+        """Test that a corrupt shard does not fail the fetch."""
+        record = mocker.patch.object(get_history(), "record")
+        record.side_effect = ValueError("Corrupt record")
+        error = mocker.patch("bedwarsshop.helpers.logging.error")
+
+        assert fetch_player_data("testuser")["success"]
+        assert "Corrupt record" in error.call_args.args[0]
+
+    def test_disabled(self, fake_hypixel, monkeypatch):
+        """Test that nothing is recorded with HISTORY_ENABLED off."""
+        monkeypatch.setattr(c, "HISTORY_ENABLED", False)
+
+        fetch_player_data("testuser")
+
+        assert get_history().history(player_uuid("testuser")) == []
+
+
+class TestHistoryCommand:
+    """Tests for the history CLI command."""
+
+    def test_lists_changes(self, isolated_cwd, mock_api_key):
+        """Test that snapshots are listed with their changes."""
+        get_history().record("player", OLD, 100)
+        get_history().record("player", changed(0), 200)
+
+        result = CliRunner().invoke(cli, ["history", "Player"])
+
+        assert result.exit_code == 0
+        lines = result.output.splitlines()
+        assert lines[0].endswith("first snapshot")
+        assert lines[1].endswith("0 added, 1 removed, 0 moved")
+
+    def test_at(self, isolated_cwd, mock_api_key):
+        """Test that --at prints the layout in effect as JSON."""
+        get_history().record("player", OLD, 100)
+
+        result = CliRunner().invoke(
+            cli, ["history", "player", "--at", "2030-01-01 00:00:00"]
+        )
+
+        assert result.exit_code == 0
+        assert json.loads(result.output) == OLD
+
+    def test_no_history(self, isolated_cwd, mock_api_key):
+        """Test that players without snapshots are an error."""
+        result = CliRunner().invoke(cli, ["history", "nobody"])
+
+        assert result.exit_code != 0
+        assert "No history recorded for nobody" in result.output
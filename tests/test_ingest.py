@@ -0,0 +1,125 @@
+"""Tests for bedwarsshop.ingest module."""
+
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from bedwarsshop.bedwarsshop import cli
+from bedwarsshop.helpers import (
+    get_cached_player_data,
+    parse_player_data,
+    split_favourites,
+)
+from bedwarsshop.ingest import ingest_dump, parse_record, read_lines
+from tests.fakeapi import DEFAULT_LAYOUT, player_document
+
+
+@pytest.fixture
+def dump(isolated_cwd):
+    """A dump with good, failing and awkward records."""
+    escaped = player_document("escaped", "tnt,wool,\\u0061rrow" + ",null" * 18)
+    records = [
+        json.dumps(player_document("alice")),
+        json.dumps(player_document("bob", "tnt" + ",null" * 20)),
+        json.dumps(player_document("nobody", None)),
+        json.dumps({"success": False, "cause": "Invalid API key"}),
+        "{not json",
+        "",
+        json.dumps(escaped).replace("\\\\u0061", "\\u0061"),
+        json.dumps(player_document("carol"), indent=None, separators=(",", ":")),
+    ]
+    path = isolated_cwd / "players.ndjson"
+    # no newline after the last record
+    path.write_text("\n".join(records))
+    return path
+
+
+class TestReadLines:
+    """Tests for read_lines function."""
+
+    def test_read_lines(self, temp_dir):
+        """Test that lines are split without newlines and blanks skipped."""
+        path = temp_dir / "lines"
+        path.write_bytes(b"a\n\nbc\n  \nd")
+
+        assert [line for line, _ in read_lines(path)] == [b"a", b"bc", b"d"]
+        assert list(read_lines(path))[-1][1] == path.stat().st_size
+
+    def test_read_lines_empty_file(self, temp_dir):
+        """Test that an empty file has no lines."""
+        path = temp_dir / "empty"
+        path.write_bytes(b"")
+
+        assert list(read_lines(path)) == []
+
+
+class TestParseRecord:
+    """Tests for parse_record function."""
+
+    @pytest.mark.parametrize("favourites", [DEFAULT_LAYOUT, "tnt" + ",null" * 20, None])
+    def test_matches_parse_player_data(self, favourites):
+        """Test that records give the same layout as parse_player_data."""
+        document = player_document("alice", favourites)
+
+        name, entry, reason = parse_record(json.dumps(document).encode())
+
+        if favourites is None:
+            assert (name, entry, reason) == (None, None, "no quick shop")
+        else:
+            assert name == "alice"
+            assert entry["uuid"] == document["player"]["uuid"]
+            layout = split_favourites(entry["favourites_2"])
+            assert layout == parse_player_data(document)
+
+    def test_repeated_fields_decode_the_record(self, mocker):
+        """Test that an ambiguous line falls back to the full document."""
+        document = player_document("alice")
+        document["player"]["guild"] = {"displayname": "Guild"}
+        loads = mocker.spy(json, "loads")
+
+        name, _, _ = parse_record(json.dumps(document).encode())
+
+        assert name == "alice"
+        loads.assert_called_once()
+
+
+class TestIngestDump:
+    """Tests for ingest_dump function."""
+
+    def test_ingest_into_cache(self, dump):
+        """Test that every good record is cached and failures are counted."""
+        report = ingest_dump(dump, batch_size=2)
+
+        assert report.records == 7
+        assert report.stored == 4
+        assert report.failures == {
+            "no quick shop": 1,
+            "unsuccessful response": 1,
+            "invalid JSON": 1,
+        }
+        assert report.bytes == dump.stat().st_size
+        players = get_cached_player_data(["alice", "Bob", "escaped", "carol"])
+        assert parse_player_data(players["Bob"])[0][:2] == ["tnt", "null"]
+        assert parse_player_data(players["escaped"])[0][:3] == ["tnt", "wool", "arrow"]
+
+    def test_ingest_and_render(self, dump, isolated_cwd):
+        """Test that records can be rendered without touching the cache."""
+        (isolated_cwd / "output").mkdir()
+
+        report = ingest_dump(dump, cache=False, render=True, render_workers=1)
+
+        assert (report.stored, report.rendered) == (0, 4)
+        assert (isolated_cwd / "output" / "bob.png").exists()
+        assert not (isolated_cwd / "cache").exists()
+        assert (
+            ingest_dump(dump, cache=False, render=True, render_workers=1).skipped == 4
+        )
+
+    def test_ingest_command(self, dump):
+        """Test that the ingest command prints the summary."""
+        result = CliRunner().invoke(cli, ["ingest", str(dump), "--render"])
+
+        assert result.exit_code == 0
+        assert "Ingested 7 records, 4 cached, 4 rendered" in result.output
+        assert "invalid JSON: 1" in result.output
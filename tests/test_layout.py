@@ -0,0 +1,104 @@
+"""Tests for bedwarsshop.layout module."""
+
+import pickle
+import sys
+
+import pytest
+
+from bedwarsshop.helpers import create_image, render_image
+from bedwarsshop.layout import MAX_ITEMS, ItemRegistry, Layout, items
+from bedwarsshop.render import layout_hash
+
+ROWS = [
+    ["stone_sword", "bridge_egg", "null", "bow", "arrow", "tnt", "end_stone"],
+    ["iron_sword", "null", "null", "wooden_pickaxe", "water_bucket", "ladder", "null"],
+    ["wool", "golden_apple", "magic_milk", "null", "diamond_boots", "null", "mystery"],
+]
+
+
+class TestItemRegistry:
+    """Tests for the ItemRegistry class."""
+
+    def test_known_items_have_fixed_ids(self):
+        """Test that null is 0 and known items follow in order."""
+        registry = ItemRegistry(["tnt", "wool"])
+
+        assert [registry.id(name) for name in ["null", "tnt", "wool"]] == [0, 1, 2]
+
+    def test_unknown_items_are_interned(self):
+        """Test that a new item gets the next id and keeps it."""
+        registry = ItemRegistry(["tnt"])
+
+        assert registry.id("mystery") == 2
+        assert registry.id("mystery") == 2
+        assert registry.name(2) == "mystery"
+
+    def test_registry_is_bounded_to_a_byte(self):
+        """Test that more than MAX_ITEMS distinct items is an error."""
+        registry = ItemRegistry(f"item{i}" for i in range(MAX_ITEMS - 1))
+
+        with pytest.raises(ValueError):
+            registry.id("one_too_many")
+
+
+class TestLayout:
+    """Tests for the Layout class."""
+
+    def test_round_trip(self):
+        """Test that the nested list form survives a round trip."""
+        layout = Layout.from_rows(ROWS)
+
+        assert layout.to_rows() == ROWS
+        assert list(layout) == ROWS
+        assert Layout.from_favourites(",".join(sum(ROWS, []))) == layout
+
+    def test_layout_is_compact(self):
+        """Test that a layout is 21 bytes of ids and no instance dict."""
+        layout = Layout.from_rows(ROWS)
+
+        assert len(layout.slots) == 21
+        assert layout.slots[0] == items.id("stone_sword")
+        assert not hasattr(layout, "__dict__")
+        assert sys.getsizeof(layout) + sys.getsizeof(layout.slots) < 128
+
+    def test_equality_and_hashing(self):
+        """Test that equal layouts are interchangeable as dict keys."""
+        changed = [row[:] for row in ROWS]
+        changed[0][0] = "wooden_sword"
+
+        assert Layout.from_rows(ROWS) == Layout.from_rows(ROWS)
+        assert Layout.from_rows(ROWS) != Layout.from_rows(changed)
+        assert len({Layout.from_rows(ROWS), Layout.from_rows(ROWS)}) == 1
+        assert Layout.from_rows(ROWS) != ROWS
+
+    def test_row_and_column_views(self):
+        """Test access to single rows, columns and slots."""
+        layout = Layout.from_rows(ROWS)
+
+        assert layout.row(1) == ROWS[1]
+        assert layout.column(6) == ["end_stone", "null", "mystery"]
+        assert layout[2, 1] == "golden_apple"
+
+    def test_pickles_by_name(self):
+        """Test that a pickled layout does not depend on process-local ids."""
+        layout = Layout.from_rows(ROWS)
+
+        assert pickle.loads(pickle.dumps(layout)) == layout
+
+    @pytest.mark.parametrize(
+        "rows", [ROWS[:2], [row[:6] for row in ROWS], [*ROWS[:2], ROWS[2] + ["x"]]]
+    )
+    def test_rejects_other_shapes(self, rows):
+        """Test that only 3 rows of 7 slots make a layout."""
+        with pytest.raises(ValueError):
+            Layout.from_rows(rows)
+
+    def test_renders_like_the_list_form(self, isolated_cwd):
+        """Test that rendering and hashing accept both forms alike."""
+        (isolated_cwd / "output").mkdir()
+        layout = Layout.from_rows(ROWS)
+
+        assert layout_hash(layout) == layout_hash(ROWS)
+        assert bytes(render_image(layout)) == bytes(render_image(ROWS))
+        assert create_image(ROWS, "testuser", show=False) is True
+        assert create_image(layout, "testuser", show=False) is False
@@ -0,0 +1,141 @@
+"""Tests for bedwarsshop.metrics module."""
+
+import json
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from bedwarsshop.bedwarsshop import cli
+from bedwarsshop.metrics import Metrics
+
+
+@pytest.fixture
+def registry():
+    registry = Metrics()
+    registry.enable()
+    return registry
+
+
+class TestMetrics:
+    """Tests for Metrics class."""
+
+    def test_counters_and_stages(self, registry):
+        """Test that counters add up and stages are timed."""
+        registry.count("cache_hits")
+        registry.count("cache_hits", 2)
+        registry.count("http_responses", status=200)
+        with registry.timer("render_shop"):
+            time.sleep(0.01)
+        timed = registry.timed("render_shop")(lambda: "done")
+
+        assert timed() == "done"
+        report = registry.report()
+        assert report["counters"] == {
+            "cache_hits": 3,
+            'http_responses{status="200"}': 1,
+        }
+        stage = report["stages"]["render_shop"]
+        assert stage["count"] == 2
+        assert stage["max_s"] >= 0.01
+        assert stage["total_s"] == pytest.approx(stage["mean_s"] * 2)
+
+    def test_histogram_buckets(self, registry):
+        """Test that buckets are cumulative with an upper bound inclusive."""
+        for seconds in [0.001, 0.002, 0.3, 20]:
+            registry.observe("http_request_seconds", seconds)
+
+        histogram = registry.report()["histograms"]["http_request_seconds"]
+
+        assert histogram["count"] == 4
+        assert histogram["buckets"]["0.001"] == 1
+        assert histogram["buckets"]["0.0025"] == 2
+        assert histogram["buckets"]["0.5"] == 3
+        assert histogram["buckets"]["+Inf"] == 4
+
+    def test_prometheus(self, registry):
+        """Test the text exposition of counters and histograms."""
+        registry.count("http_responses", status=429)
+        registry.observe("serve_request_seconds", 0.02)
+
+        lines = registry.prometheus().splitlines()
+
+        assert "# TYPE bedwarsshop_http_responses_total counter" in lines
+        assert 'bedwarsshop_http_responses_total{status="429"} 1' in lines
+        assert "# TYPE bedwarsshop_serve_request_seconds histogram" in lines
+        assert 'bedwarsshop_serve_request_seconds_bucket{le="0.01"} 0' in lines
+        assert 'bedwarsshop_serve_request_seconds_bucket{le="+Inf"} 1' in lines
+        assert "bedwarsshop_serve_request_seconds_count 1" in lines
+
+    def test_registered_values(self, registry):
+        """Test that registered values are read into both reports."""
+        stats = {"hits": 3, "bytes": 1024}
+        registry.register("tiles", lambda: dict(stats), counters=["hits"])
+        stats["hits"] = 5
+
+        report = registry.report()
+        lines = registry.prometheus().splitlines()
+
+        assert report["counters"] == {"tiles_hits": 5}
+        assert report["gauges"] == {"tiles_bytes": 1024}
+        assert "# TYPE bedwarsshop_tiles_bytes gauge" in lines
+        assert "bedwarsshop_tiles_bytes 1024" in lines
+        assert "# TYPE bedwarsshop_tiles_hits_total counter" in lines
+        assert "bedwarsshop_tiles_hits_total 5" in lines
+
+    def test_disabled_records_nothing(self, registry):
+        """Test that a disabled registry is cheap and stays empty."""
+        registry.disable()
+        timed = registry.timed("stage")(lambda: None)
+
+        start = time.perf_counter()
+        for _ in range(100_000):
+            registry.count("calls")
+            timed()
+        per_call = (time.perf_counter() - start) / 100_000
+
+        assert registry.report()["counters"] == {}
+        assert registry.report()["stages"] == {}
+        assert per_call < 5e-6
+
+
+class TestProfileOption:
+    """Tests for the --profile, --cprofile and --tracemalloc options."""
+
+    def test_profile_report(self, fake_hypixel, mock_api_key, temp_dir):
+        """Test that a render writes its stage timings and counters."""
+        result = CliRunner().invoke(
+            cli,
+            ["alice", "--profile", "profile.json", "--tracemalloc"],
+        )
+
+        assert result.exit_code == 0
+        report = json.loads((temp_dir / "profile.json").read_text())
+        for stage in ["get_player_data", "render_shop", "encode_image"]:
+            assert report["stages"][stage]["count"] == 1
+        assert report["counters"]["cache_misses"] == 1
+        # the name is resolved to a uuid first
+        assert report["counters"]["uuid_lookups"] == 1
+        assert report["counters"]['http_responses{status="200"}'] == 2
+        assert report["histograms"]["http_request_seconds"]["count"] == 2
+        assert report["counters"]["tile_cache_misses"] == 21
+        assert report["gauges"]["tile_cache_entries"] == 21
+        assert report["gauges"]["tile_cache_bytes"] > 0
+        assert report["tracemalloc"]["peak_bytes"] > 0
+
+    def test_cprofile(self, fake_hypixel, mock_api_key, temp_dir):
+        """Test that cProfile statistics are saved."""
+        pstats = pytest.importorskip("pstats")
+
+        result = CliRunner().invoke(cli, ["alice", "--cprofile", "render.prof"])
+
+        assert result.exit_code == 0
+        stats = pstats.Stats(str(temp_dir / "render.prof"))
+        assert any(name == "render_shop" for _, _, name in stats.stats)
+
+    def test_tracemalloc_needs_profile(self):
+        """Test that --tracemalloc alone is rejected."""
+        result = CliRunner().invoke(cli, ["alice", "--tracemalloc"])
+
+        assert result.exit_code == 2
+        assert "--tracemalloc needs --profile" in result.output
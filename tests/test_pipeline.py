@@ -0,0 +1,146 @@
+"""Tests for bedwarsshop.pipeline module."""
+
+import asyncio
+
+from bedwarsshop.pipeline import (
+    fetch_and_render,
+    get_player_data_async,
+    stream_layouts,
+)
+from tests.fakeapi import player_uuid
+
+
+async def collect(stream):
+    """Drain an async iterator into a list."""
+    return [item async for item in stream]
+
+
+class TestGetPlayerDataAsync:
+    """Tests for get_player_data_async function."""
+
+    def test_get_player_data_async(self, fake_hypixel):
+        """Test that a player is fetched from the API."""
+        data = asyncio.run(get_player_data_async("testuser"))
+
+        assert data["success"] is True
+        assert fake_hypixel.requests[0][1] == {"uuid": player_uuid("testuser")}
+
+    def test_get_player_data_async_shares_cache(self, fake_hypixel):
+        """Test that the async path reuses the same cache."""
+        asyncio.run(get_player_data_async("testuser"))
+        asyncio.run(get_player_data_async("testuser"))
+
+        assert len(fake_hypixel.requests) == 1
+
+
+class TestStreamLayouts:
+    """Tests for stream_layouts function."""
+
+    def test_stream_layouts_resolves_every_player(self, fake_hypixel):
+        """Test that every name produces a parsed layout."""
+        names = [f"player{i}" for i in range(20)]
+
+        results = dict(asyncio.run(collect(stream_layouts(names, limit=8))))
+
+        assert set(results) == set(names)
+        assert all(layout[0][0] == "stone_sword" for layout in results.values())
+
+    def test_stream_layouts_bounds_in_flight_requests(self, fake_hypixel):
+        """Test that no more than `limit` requests run at once."""
+        fake_hypixel.latency = 0.02
+        names = [f"player{i}" for i in range(30)]
+
+        asyncio.run(collect(stream_layouts(names, limit=4)))
+
+        assert 1 < fake_hypixel.max_in_flight <= 4
+
+    def test_stream_layouts_retries_rate_limits(self, fake_hypixel):
+        """Test that players answered with 429 are retried."""
+        fake_hypixel.throttle = 5
+        names = [f"player{i}" for i in range(10)]
+
+        results = dict(asyncio.run(collect(stream_layouts(names, limit=4))))
+
+        assert all(results[name] is not None for name in names)
+        assert len(fake_hypixel.requests) == 15
+
+    def test_stream_layouts_reports_unparsable_players(self, fake_hypixel):
+        """Test that a player without Bedwars stats yields None."""
+        fake_hypixel.players = {"nobedwars": None}
+
+        results = dict(asyncio.run(collect(stream_layouts(["nobedwars", "ok"]))))
+
+        assert results["nobedwars"] is None
+        assert results["ok"] is not None
+
+    def test_stream_layouts_yields_before_batch_is_done(self, fake_hypixel):
+        """Test that results stream out while later players are pending."""
+        fake_hypixel.latency = 0.05
+        names = [f"player{i}" for i in range(12)]
+
+        async def first():
+            stream = stream_layouts(names, limit=2)
+            item = await anext(stream)
+            seen = len(fake_hypixel.requests)
+            await stream.aclose()
+            return item, seen
+
+        (name, layout), seen = asyncio.run(first())
+
+        assert layout is not None
+        assert seen < len(names)
+
+    def test_cancelled_stream_spares_concurrent_stream(self, fake_hypixel):
+        """Test that cancelling one stream does not fail another's lookups."""
+        fake_hypixel.latency = 0.1
+
+        async def main():
+            first = asyncio.create_task(collect(stream_layouts(["alice"])))
+            await asyncio.sleep(0.02)
+            second = asyncio.create_task(collect(stream_layouts(["alice"])))
+            await asyncio.sleep(0.02)
+            first.cancel()
+            return await asyncio.wait_for(second, 5)
+
+        [(name, layout)] = asyncio.run(main())
+
+        assert name == "alice"
+        assert layout is not None
+        assert len(fake_hypixel.requests) == 1
+
+
+class TestFetchAndRender:
+    """Tests for fetch_and_render function."""
+
+    def test_fetch_and_render(self, fake_hypixel):
+        """Test that layouts are handed to the renderer as they arrive."""
+        fake_hypixel.players = {"nobedwars": None}
+        rendered = []
+
+        outcome = asyncio.run(
+            fetch_and_render(
+                ["alice", "bob", "nobedwars"],
+                render=lambda layout, name: rendered.append(name) or True,
+            )
+        )
+
+        assert outcome == {"alice": True, "bob": True, "nobedwars": False}
+        assert sorted(rendered) == ["alice", "bob"]
+
+    def test_fetch_and_render_reports_unchanged_images(self, fake_hypixel):
+        """Test that an image create_image left unchanged is not counted."""
+        first = asyncio.run(fetch_and_render(["alice"]))
+        second = asyncio.run(fetch_and_render(["alice"]))
+
+        assert first == {"alice": True}
+        assert second == {"alice": False}
+
+    def test_fetch_and_render_records_render_errors(self, fake_hypixel):
+        """Test that a failing render is reported, not raised."""
+
+        def render(layout, name):
+            raise OSError("disk full")
+
+        outcome = asyncio.run(fetch_and_render(["alice"], render=render))
+
+        assert outcome == {"alice": False}
@@ -0,0 +1,242 @@
+"""Tests for bedwarsshop.render module."""
+
+from PIL import Image, ImageChops, ImageDraw
+
+from bedwarsshop import constants as c
+from bedwarsshop import render
+from bedwarsshop.atlas import icon_atlas
+
+
+def draw_grid_directly(image):
+    """Reference grid drawn straight onto the image, line by line."""
+    draw = ImageDraw.Draw(image)
+    for x in range(0, 7):
+        draw.line((x * 320, 0, x * 320, 3 * 320), fill=c.LINE_COLOR, width=c.LINE_WIDTH)
+    draw.line(
+        (7 * 320 - c.LINE_WIDTH, 0, 7 * 320 - c.LINE_WIDTH, 3 * 320),
+        fill=c.LINE_COLOR,
+        width=c.LINE_WIDTH,
+    )
+    for y in range(0, 3):
+        draw.line((0, y * 320, 7 * 320, y * 320), fill=c.LINE_COLOR, width=c.LINE_WIDTH)
+    draw.line(
+        (0, 3 * 320 - c.LINE_WIDTH, 7 * 320, 3 * 320 - c.LINE_WIDTH),
+        fill=c.LINE_COLOR,
+        width=c.LINE_WIDTH,
+    )
+
+
+class TestCanvas:
+    """Tests for the shop canvas."""
+
+    def test_new_canvas_matches_background(self):
+        """Test that a new canvas is the full size and background color."""
+        canvas = render.new_canvas()
+        assert canvas.mode == "RGBA"
+        assert canvas.size == (7 * 320, 3 * 320)
+        assert canvas.getpixel((100, 100)) == c.BACKGROUND_COLOR
+
+
+class TestGrid:
+    """Tests for the cached grid overlay."""
+
+    def test_grid_matches_direct_drawing(self):
+        """Test that the cached grid is pixel-identical to drawn lines."""
+        background = Image.new("RGBA", (7 * 320, 3 * 320), (10, 20, 30, 40))
+        expected = background.copy()
+        draw_grid_directly(expected)
+
+        render.draw_grid(background)
+
+        assert ImageChops.difference(background, expected).getbbox() is None
+
+    def test_grid_overlay_is_cached(self):
+        """Test that the grid overlay is drawn once per geometry."""
+        render.draw_grid(render.new_canvas())
+        render.draw_grid(render.new_canvas())
+        assert render.grid_overlay.cache_info().misses == 1
+
+
+class TestFonts:
+    """Tests for font lookup."""
+
+    def test_font_is_loaded_once(self, mocker):
+        """Test that repeated lookups reuse the loaded font."""
+        spy = mocker.spy(render.ImageFont, "truetype")
+        render.open_font(render.resolve_font(c.FONT_SIZE), c.FONT_SIZE)
+        calls = spy.call_count
+        render.open_font(render.resolve_font(c.FONT_SIZE), c.FONT_SIZE)
+        assert spy.call_count == calls
+
+    def test_missing_fonts_fall_back_to_default(self, monkeypatch):
+        """Test that hosts without any configured font get the default font."""
+        monkeypatch.setattr(c, "FONTS", ["no-such-font.ttf"])
+        assert render.resolve_font(c.FONT_SIZE) is None
+        assert render.open_font(None, c.FONT_SIZE) is not None
+
+    def test_missing_fonts_warn_once(self, monkeypatch, mocker):
+        """Test that the fallback is only looked up and reported once."""
+        monkeypatch.setattr(c, "FONTS", ["no-such-font.ttf"])
+        warning = mocker.patch("bedwarsshop.render.logging.warning")
+        for _ in range(3):
+            render.draw_label(render.new_canvas(), "stone_sword", 0, 0)
+        warning.assert_called_once()
+
+
+class TestLabels:
+    """Tests for the label tile cache."""
+
+    def test_label_matches_direct_drawing(self):
+        """Test that a cached label is pixel-identical to drawn text."""
+        font = render.open_font(render.resolve_font(c.FONT_SIZE), c.FONT_SIZE)
+        background = Image.new("RGBA", (7 * 320, 3 * 320), (10, 20, 30, 40))
+        expected = background.copy()
+        for x, item in enumerate(["stone_sword", "invisibility_potion_(30_seconds)"]):
+            ImageDraw.Draw(expected).text(
+                (x * 320 + 10, 330),
+                item.replace("_", " "),
+                fill=c.TEXT_COLOR,
+                font=font,
+            )
+            render.draw_label(background, item, x, 1)
+
+        assert ImageChops.difference(background, expected).getbbox() is None
+
+    def test_long_label_keeps_overflow(self):
+        """Test that labels wider than a cell are not clipped."""
+        tile = render.label_tile(
+            "invisibility potion (30 seconds)",
+            render.resolve_font(c.FONT_SIZE),
+            c.FONT_SIZE,
+            c.TEXT_COLOR,
+        )
+        _, box, _ = tile
+        assert box[2] > 320
+
+    def test_labels_are_rendered_once(self):
+        """Test that each distinct label is only rasterized once."""
+        canvas = render.new_canvas()
+        for x in range(7):
+            render.draw_label(canvas, "tnt", x, 0)
+        info = render.label_tile.cache_info()
+        assert info.misses == 1
+        assert info.hits == 6
+
+    def test_render_label_bypasses_cache(self):
+        """Test that uncached labels match cached ones and stay out of it."""
+        args = ("tnt", render.resolve_font(c.FONT_SIZE), c.FONT_SIZE, c.TEXT_COLOR)
+
+        color, box, mask = render.render_label(*args)
+
+        assert render.label_tile.cache_info().currsize == 0
+        _, cached_box, cached_mask = render.label_tile(*args)
+        assert box == cached_box
+        assert mask.tobytes() == cached_mask.tobytes()
+
+    def test_label_cache_is_bounded(self):
+        """Test that the label cache is LRU-bounded."""
+        assert render.label_tile.cache_info().maxsize == render.LABEL_CACHE_SIZE
+
+
+class TestCellSize:
+    """Tests for rendering at other cell sizes."""
+
+    def test_scaled_lengths(self, monkeypatch):
+        """Test that lengths scale with the cell size and stay visible."""
+        assert render.scaled(30) == 30
+        monkeypatch.setattr(c, "CELL_SIZE", 80)
+        assert render.scaled(30) == 8
+        assert render.scaled(2) == 1
+
+    def test_small_cells_render_small_shops(self, monkeypatch):
+        """Test that the canvas, slots and grid follow the cell size."""
+        monkeypatch.setattr(c, "CELL_SIZE", 80)
+        icons = icon_atlas(80)
+        image = render.new_canvas()
+        render.draw_slot(image, "tnt", icons["tnt"], 1, 0)
+        render.draw_grid(image)
+
+        assert image.size == (7 * 80, 3 * 80)
+        assert image.getpixel((80, 40)) == c.LINE_COLOR
+        assert image.getpixel((81, 40)) != c.LINE_COLOR
+        tile = render.slot_tile("tnt", icons["tnt"])
+        assert tile.size == (80, 80)
+
+
+class TestLayoutHash:
+    """Tests for layout_hash function."""
+
+    def test_layout_hash_is_stable(self):
+        """Test that equal layouts hash the same."""
+        layout = [["stone_sword"] * 7, ["null"] * 7, ["tnt"] * 7]
+        copy = [list(row) for row in layout]
+        assert render.layout_hash(layout) == render.layout_hash(copy)
+
+    def test_layout_hash_changes_with_layout(self):
+        """Test that moving an item changes the hash."""
+        layout = [["stone_sword"] + ["null"] * 6] + [["null"] * 7] * 2
+        moved = [["null", "stone_sword"] + ["null"] * 5] + [["null"] * 7] * 2
+        assert render.layout_hash(layout) != render.layout_hash(moved)
+
+    def test_layout_hash_changes_with_output_settings(self, monkeypatch):
+        """Test that another cell size or format changes the hash."""
+        layout = [["tnt"] * 7] * 3
+        before = render.layout_hash(layout)
+        monkeypatch.setattr(c, "CELL_SIZE", 160)
+        smaller = render.layout_hash(layout)
+        monkeypatch.setattr(c, "OUTPUT_FORMAT", "webp")
+        assert len({before, smaller, render.layout_hash(layout)}) == 3
+
+    def test_layout_hash_changes_with_settings(self, monkeypatch):
+        """Test that a different text color changes the hash."""
+        layout = [["tnt"] * 7] * 3
+        before = render.layout_hash(layout)
+        monkeypatch.setattr(c, "TEXT_COLOR", (255, 0, 0))
+        assert render.layout_hash(layout) != before
+
+
+class TestSlotTiles:
+    """Tests for the composited slot tile cache."""
+
+    def test_slots_match_drawing_in_place(self):
+        """Test that overflowing labels next to any kind of slot look the same."""
+        icons = icon_atlas()
+        long = "invisibility_potion_(30_seconds)"
+        layout = [
+            [long, "null", long, "unknown_item", long, "tnt", long],
+            ["stone_sword", long, "null", "null", "unknown_item", "wool", "null"],
+            ["null"] * 7,
+        ]
+        expected = render.new_canvas()
+        for y, row in enumerate(layout):
+            for x, item in enumerate(row):
+                if item == "null":
+                    continue
+                if item in icons:
+                    expected.paste(icons[item], (x * 320, y * 320))
+                render.draw_label(expected, item, x, y)
+
+        image = render.new_canvas()
+        for y, row in enumerate(layout):
+            for x, item in enumerate(row):
+                if item != "null":
+                    render.draw_slot(image, item, icons.get(item), x, y)
+
+        assert ImageChops.difference(expected, image).getbbox() is None
+
+    def test_slot_tiles_are_built_once(self):
+        """Test that a repeated item reuses its tile."""
+        icon = icon_atlas()["tnt"]
+        assert render.slot_tile("tnt", icon) is render.slot_tile("tnt", icon)
+        stats = render.slot_tiles.stats()
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    def test_tile_cache_stays_under_budget(self):
+        """Test that the oldest tiles are evicted beyond the byte budget."""
+        tiles = render.TileCache(max_bytes=250)
+        for key in range(5):
+            tiles.get(key, lambda: (Image.new("L", (10, 10)), 100))
+
+        stats = tiles.stats()
+        assert (stats["entries"], stats["bytes"], stats["evictions"]) == (2, 200, 3)
+        assert list(tiles.tiles) == [3, 4]
@@ -0,0 +1,114 @@
+"""Tests for bedwarsshop.server module."""
+
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+from PIL import Image
+
+from bedwarsshop.server import ShopServer
+from tests.fakeapi import player_uuid
+
+
+@pytest.fixture
+def shop_server(fake_hypixel):
+    """A render server on a free port, fetching from the stand-in API."""
+    with ShopServer(port=0, workers=4) as server:
+        yield server
+
+
+def player_requests(fake_hypixel, player_name):
+    uuid = player_uuid(player_name)
+    return [r for r in fake_hypixel.requests if r[1].get("uuid") == uuid]
+
+
+class TestShopServer:
+    """End-to-end tests of the render server."""
+
+    def test_serves_shop_image(self, shop_server):
+        """Test that a player's shop is served as a PNG with its hash."""
+        response = requests.get(f"{shop_server.url}/shop/alice.png", timeout=10)
+
+        assert response.status_code == 200
+        assert response.headers["Content-Type"] == "image/png"
+        assert response.headers["ETag"].strip('"')
+        with Image.open(io.BytesIO(response.content)) as image:
+            assert image.size == (7 * 320, 3 * 320)
+
+    def test_if_none_match_is_not_modified(self, shop_server):
+        """Test that a matching ETag is answered with 304 and no render."""
+        url = f"{shop_server.url}/shop/alice.png"
+        etag = requests.get(url, timeout=10).headers["ETag"]
+
+        response = requests.get(url, headers={"If-None-Match": etag}, timeout=10)
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+        assert shop_server.renders == 1
+
+    def test_if_none_match_skips_evicted_render(self, shop_server):
+        """Test that a 304 for an image no longer cached renders nothing."""
+        url = f"{shop_server.url}/shop/alice.png"
+        etag = requests.get(url, timeout=10).headers["ETag"]
+        shop_server.images.clear()
+
+        response = requests.get(url, headers={"If-None-Match": etag}, timeout=10)
+
+        assert response.status_code == 304
+        assert shop_server.renders == 1
+        assert shop_server.images.stats()["entries"] == 0
+
+    def test_concurrent_requests_are_coalesced(self, shop_server, fake_hypixel):
+        """Test that simultaneous requests share one fetch and one render."""
+        fake_hypixel.latency = 0.3
+        barrier = threading.Barrier(8)
+
+        def fetch(_):
+            barrier.wait()
+            return requests.get(f"{shop_server.url}/shop/bob.png", timeout=10)
+
+        with ThreadPoolExecutor(8) as pool:
+            responses = list(pool.map(fetch, range(8)))
+
+        assert {response.status_code for response in responses} == {200}
+        assert len({response.content for response in responses}) == 1
+        assert len(player_requests(fake_hypixel, "bob")) == 1
+        assert shop_server.renders == 1
+        assert shop_server.coalesced >= 7
+
+    def test_player_without_shop_is_not_found(self, shop_server, fake_hypixel):
+        """Test that a player without Bedwars stats is a 404."""
+        fake_hypixel.players["nobody"] = None
+
+        response = requests.get(f"{shop_server.url}/shop/nobody.png", timeout=10)
+
+        assert response.status_code == 404
+
+    @pytest.mark.parametrize(
+        "path", ["/shop/alice.gif", "/shop/../alice.png", "/players/alice.png", "/"]
+    )
+    def test_unknown_paths_are_not_found(self, shop_server, fake_hypixel, path):
+        """Test that only shop image paths are served."""
+        response = requests.get(f"{shop_server.url}{path}", timeout=10)
+
+        assert response.status_code == 404
+        assert fake_hypixel.requests == []
+
+    def test_metrics_endpoint(self, shop_server):
+        """Test that request and pipeline metrics are exposed to Prometheus."""
+        requests.get(f"{shop_server.url}/shop/alice.png", timeout=10)
+        requests.get(f"{shop_server.url}/shop/bad name.png", timeout=10)
+
+        response = requests.get(f"{shop_server.url}/metrics", timeout=10)
+
+        assert response.status_code == 200
+        assert response.headers["Content-Type"].startswith("text/plain")
+        assert 'bedwarsshop_serve_responses_total{status="200"} 1' in response.text
+        assert 'bedwarsshop_serve_responses_total{status="404"} 1' in response.text
+        assert "bedwarsshop_serve_request_seconds_count 2" in response.text
+        assert "bedwarsshop_cache_misses_total 1" in response.text
+        assert "bedwarsshop_tile_cache_misses_total 21" in response.text
+        assert "# TYPE bedwarsshop_tile_cache_bytes gauge" in response.text
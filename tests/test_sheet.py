@@ -0,0 +1,149 @@
+"""Tests for bedwarsshop.sheet module."""
+
+import io
+import random
+
+import pytest
+from click.testing import CliRunner
+from PIL import Image, ImageChops
+
+from bedwarsshop import constants as c
+from bedwarsshop import sheet
+from bedwarsshop.bedwarsshop import cli
+from bedwarsshop.helpers import render_shop
+from bedwarsshop.render import scaled
+
+
+@pytest.fixture
+def small_cells(monkeypatch):
+    monkeypatch.setattr(c, "CELL_SIZE", 40)
+
+
+def players(count):
+    names = list(c.ICONS_DICT)
+    rng = random.Random(count)
+    return [
+        (f"player{i}", [rng.choices(names, k=7) for _ in range(3)])
+        for i in range(count)
+    ]
+
+
+class TestPNGStreamWriter:
+    """Tests for PNGStreamWriter class."""
+
+    def test_rows_written_in_blocks(self):
+        """Test that a PNG written in blocks decodes to the original image."""
+        image = Image.frombytes("RGBA", (37, 23), random.randbytes(37 * 23 * 4))
+        buffer = io.BytesIO()
+
+        writer = sheet.PNGStreamWriter(buffer, image.size)
+        for top, bottom in [(0, 5), (5, 6), (6, 23)]:
+            writer.write(image.crop((0, top, image.width, bottom)))
+        writer.close()
+
+        with Image.open(buffer) as decoded:
+            assert decoded.mode == "RGBA"
+            assert decoded.tobytes() == image.tobytes()
+
+    def test_wrong_rows(self):
+        """Test that rows of the wrong width or number are rejected."""
+        writer = sheet.PNGStreamWriter(io.BytesIO(), (10, 10))
+
+        with pytest.raises(ValueError):
+            writer.write(Image.new("RGBA", (11, 5)))
+        with pytest.raises(ValueError):
+            writer.write(Image.new("RGBA", (10, 11)))
+        writer.write(Image.new("RGBA", (10, 5)))
+        with pytest.raises(ValueError, match="Wrote 5 of 10 rows"):
+            writer.close()
+
+
+class TestSheet:
+    """Tests for the sheet renderers."""
+
+    def test_geometry(self, small_cells):
+        """Test that shops fill rows of the given number of columns."""
+        gap = scaled(c.SHEET_GAP)
+        strip = gap + scaled(c.SHEET_HEADER_HEIGHT) + 3 * 40
+
+        assert sheet.sheet_geometry(5, 2) == (
+            (2 * (7 * 40 + gap) + gap, 3 * strip + gap),
+            strip,
+            2,
+        )
+        assert sheet.sheet_geometry(1, 8)[2] == 1
+        with pytest.raises(ValueError):
+            sheet.sheet_geometry(0)
+
+    def test_shops_and_headers(self, small_cells):
+        """Test that every shop is drawn as rendered alone, under its name."""
+        sheet_players = players(5)
+
+        image = sheet.render_sheet(sheet_players, columns=2)
+
+        _, strip, _ = sheet.sheet_geometry(5, 2)
+        gap, header = scaled(c.SHEET_GAP), scaled(c.SHEET_HEADER_HEIGHT)
+        for i, (_, layout) in enumerate(sheet_players):
+            left = gap + (i % 2) * (7 * 40 + gap)
+            top = (i // 2) * strip + gap
+            shop = image.crop((left, top + header, left + 7 * 40, top + header + 120))
+            assert ImageChops.difference(shop, render_shop(layout)).getbbox() is None
+            name = image.crop((left, top, left + 7 * 40, top + header))
+            assert name.getchannel("A").getbbox() is not None
+
+    def test_write_sheet_streams_strips(self, small_cells, mocker):
+        """Test that the streamed PNG matches and no full canvas is made."""
+        sheet_players = players(7)
+        expected = sheet.render_sheet(sheet_players, columns=3)
+        new_image = mocker.spy(sheet.Image, "new")
+        buffer = io.BytesIO()
+
+        size = sheet.write_sheet(sheet_players, buffer, columns=3)
+
+        _, strip, _ = sheet.sheet_geometry(7, 3)
+        for call in new_image.call_args_list:
+            new_size = call.kwargs["size"] if "size" in call.kwargs else call.args[1]
+            assert new_size[1] < 2 * strip
+        with Image.open(buffer) as decoded:
+            assert decoded.size == size == expected.size
+            assert decoded.tobytes() == expected.tobytes()
+
+
+class TestFetchLayouts:
+    """Tests for fetch_layouts function."""
+
+    def test_failing_player_left_out(self, mocker, sample_player_data):
+        """Test that an exception for one player does not abort the sheet."""
+        mocker.patch("bedwarsshop.sheet.get_cached_player_data", return_value={})
+
+        def get_player_data(name):
+            if name == "broken":
+                raise ConnectionError("connection reset")
+            return sample_player_data
+
+        mocker.patch("bedwarsshop.batch.get_player_data", get_player_data)
+
+        players, failures = sheet.fetch_layouts(["first", "broken", "last"])
+
+        assert [name for name, _ in players] == ["first", "last"]
+        assert "connection reset" in failures["broken"]
+
+
+class TestSheetCommand:
+    """Tests for the sheet command."""
+
+    def test_sheet_command(self, fake_hypixel, mock_api_key, temp_dir):
+        """Test that players are fetched and drawn in the given order."""
+        fake_hypixel.players["nobody"] = None
+
+        result = CliRunner().invoke(
+            cli,
+            ["sheet", "alice", "nobody", "bob", "--cell-size", "40", "-o", "s.png"],
+        )
+
+        assert result.exit_code == 0
+        assert "Sheet of 2 players" in result.output
+        assert "1 left out" in result.output
+        with Image.open(temp_dir / "s.png") as image:
+            size, _, _ = sheet.sheet_geometry(2)
+            assert image.size == size
@@ -0,0 +1,188 @@
+"""Tests for bedwarsshop.singleflight module."""
+
+import asyncio
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from bedwarsshop import helpers
+from bedwarsshop.pipeline import get_player_data_async
+from bedwarsshop.singleflight import SingleFlight
+from tests.fakeapi import player_uuid
+
+
+class TestSingleFlight:
+    """Tests for the SingleFlight class."""
+
+    def test_sequential_calls_all_run(self):
+        """Test that calls that do not overlap are not deduplicated."""
+        flight = SingleFlight()
+
+        assert [flight.do("key", abs, -i) for i in range(3)] == [0, 1, 2]
+        assert flight.stats() == {"executed": 3, "deduplicated": 0, "in_flight": 0}
+
+    def test_concurrent_calls_share_one_result(self):
+        """Test that overlapping calls for a key run the function once."""
+        flight = SingleFlight()
+        barrier = threading.Barrier(8)
+        calls = []
+
+        def work():
+            calls.append(1)
+            time.sleep(0.2)
+            return object()
+
+        def call(_):
+            barrier.wait()
+            return flight.do("key", work)
+
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(call, range(8)))
+
+        assert len(calls) == 1
+        assert len({id(result) for result in results}) == 1
+        assert flight.stats() == {"executed": 1, "deduplicated": 7, "in_flight": 0}
+
+    def test_exceptions_reach_every_caller(self):
+        """Test that a failing call raises in the waiting callers too."""
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def fail():
+            started.set()
+            time.sleep(0.1)
+            raise ValueError("boom")
+
+        with ThreadPoolExecutor(2) as pool:
+            leader = pool.submit(flight.do, "key", fail)
+            started.wait()
+            waiter = pool.submit(flight.do, "key", fail)
+            for future in (leader, waiter):
+                with pytest.raises(ValueError, match="boom"):
+                    future.result()
+        assert flight.stats()["in_flight"] == 0
+
+    def test_stress_hot_keys(self):
+        """Test many threads hammering a few hot keys."""
+        flight = SingleFlight()
+        running = Counter()
+        overlaps = []
+        lock = threading.Lock()
+        rng = random.Random(0)
+        keys = [rng.choice("abc") for _ in range(2000)]
+
+        def work(key):
+            with lock:
+                running[key] += 1
+                overlaps.append(running[key])
+            time.sleep(0.001)
+            with lock:
+                running[key] -= 1
+            return key.upper()
+
+        with ThreadPoolExecutor(32) as pool:
+            results = list(pool.map(lambda key: flight.do(key, work, key), keys))
+
+        stats = flight.stats()
+        assert results == [key.upper() for key in keys]
+        assert max(overlaps) == 1
+        assert stats["executed"] == len(overlaps)
+        assert stats["executed"] + stats["deduplicated"] == len(keys)
+        assert stats["deduplicated"] > len(keys) // 2
+        assert stats["in_flight"] == 0
+
+    def test_do_async_shares_one_result(self):
+        """Test that overlapping tasks for a key await the function once."""
+        flight = SingleFlight()
+        calls = Counter()
+
+        async def work(key):
+            calls[key] += 1
+            await asyncio.sleep(0.05)
+            return key
+
+        async def main():
+            return await asyncio.gather(
+                *(flight.do_async(key, work, key) for key in "ab" * 50)
+            )
+
+        assert asyncio.run(main()) == list("ab" * 50)
+        assert calls == {"a": 1, "b": 1}
+        assert flight.stats()["deduplicated"] == 98
+
+    def test_cancelled_waiter_keeps_the_call(self):
+        """Test that cancelling a waiting task does not cancel the call."""
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def main():
+            leader = asyncio.create_task(flight.do_async("key", work))
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(flight.do_async("key", work))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            return await leader
+
+        assert asyncio.run(main()) == "done"
+
+    def test_cancelled_leader_keeps_the_call(self):
+        """Test that cancelling the task that started a call spares waiters."""
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def main():
+            leader = asyncio.create_task(flight.do_async("key", work))
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(flight.do_async("key", work))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await waiter
+
+        assert asyncio.run(main()) == "done"
+        assert flight.stats() == {"executed": 1, "deduplicated": 1, "in_flight": 0}
+
+
+class TestPlayerLookups:
+    """Tests that player lookups are deduplicated."""
+
+    def test_concurrent_lookups_share_one_request(self, fake_hypixel):
+        """Test that threads fetching one player send one API request."""
+        fake_hypixel.latency = 0.2
+        barrier = threading.Barrier(8)
+
+        def lookup(name):
+            barrier.wait()
+            return helpers.get_player_data(name)
+
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lookup, ["alice", "Alice", "ALICE", "bob"] * 2))
+
+        assert all(result["success"] for result in results)
+        uuids = Counter(query["uuid"] for _, query, _ in fake_hypixel.requests)
+        assert uuids == {player_uuid("alice"): 1, player_uuid("bob"): 1}
+        assert sorted(name for names in fake_hypixel.lookups for name in names) == [
+            "alice",
+            "bob",
+        ]
+
+    def test_async_lookups_share_one_request(self, fake_hypixel):
+        """Test that tasks fetching one player send one API request."""
+        fake_hypixel.latency = 0.1
+
+        async def main():
+            return await asyncio.gather(
+                *(get_player_data_async("carol") for _ in range(10))
+            )
+
+        assert all(result["success"] for result in asyncio.run(main()))
+        assert len(fake_hypixel.requests) == 1
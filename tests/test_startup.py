@@ -0,0 +1,82 @@
+"""Startup time tests, run in fresh interpreters."""
+
+import os
+import subprocess
+import sys
+
+from bedwarsshop.cache import get_cache
+from tests.fakeapi import player_document
+
+# cumulative import time of the CLI module, well above the ~60 ms it takes
+# on a laptop so that slow CI machines pass, well below the ~350 ms it took
+# with every dependency imported up front
+IMPORT_BUDGET_US = 200_000
+HEAVY_MODULES = ["requests", "PIL", "asyncio", "dotenv", "http.server", "numpy"]
+
+
+def run_python(code, cwd=None, env=None):
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=cwd,
+        env=env,
+    )
+
+
+def import_time_us(stderr, module):
+    """Cumulative import time of a module from the -X importtime output."""
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        if name.strip() == module:
+            return int(cumulative)
+    raise AssertionError(f"{module} was not imported")
+
+
+class TestStartup:
+    """Tests that the CLI only imports what a command needs."""
+
+    def test_import_time(self):
+        """Test that importing the CLI stays within the budget."""
+        code = "import bedwarsshop.bedwarsshop"
+        # the fastest of a few runs, so that a busy machine does not fail it
+        best = min(
+            import_time_us(run_python(code).stderr, "bedwarsshop.bedwarsshop")
+            for _ in range(3)
+        )
+
+        assert best < IMPORT_BUDGET_US
+
+    def test_help_imports_no_heavy_modules(self):
+        """Test that --help loads no HTTP, imaging or asyncio modules."""
+        result = run_python(
+            "import sys\n"
+            "from bedwarsshop.bedwarsshop import cli\n"
+            "try:\n"
+            "    cli(['--help'])\n"
+            "except SystemExit:\n"
+            "    pass\n"
+            f"print(*[m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+        )
+
+        assert result.stdout.splitlines()[-1] == ""
+
+    def test_cached_render_does_not_import_requests(self, isolated_cwd):
+        """Test that rendering a cached player never loads requests."""
+        get_cache().put("alice", player_document("alice"))
+        env = {**os.environ, "HYPIXEL_API_KEY": "test-api-key-12345"}
+
+        result = run_python(
+            "import sys\n"
+            "from bedwarsshop.bedwarsshop import cli\n"
+            "cli(['alice', '--quiet'], standalone_mode=False)\n"
+            "print('requests' in sys.modules)",
+            cwd=isolated_cwd,
+            env=env,
+        )
+
+        assert result.stdout.split()[-1] == "False"
+        assert (isolated_cwd / "output" / "alice.png").exists()
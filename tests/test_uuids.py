@@ -0,0 +1,172 @@
+"""Tests for bedwarsshop.uuids module."""
+
+import pytest
+
+from bedwarsshop import constants as c
+from bedwarsshop.cache import PlayerCache, SQLiteCache, get_cache
+from bedwarsshop.helpers import get_cached_player_data, get_player_data
+from bedwarsshop.uuids import (
+    UUIDIndex,
+    get_uuid_index,
+    is_uuid,
+    resolve_uuid,
+    resolve_uuids,
+    seed_uuid_index,
+)
+from tests.fakeapi import player_document, player_uuid
+
+
+@pytest.fixture
+def index(temp_dir):
+    return UUIDIndex(temp_dir / "uuids.sqlite3", ttl=60, missing_ttl=10)
+
+
+def mojang_names(fake_hypixel):
+    """Every name sent to the Mojang stand-in, in order."""
+    return [name for names in fake_hypixel.lookups for name in names]
+
+
+class TestUUIDIndex:
+    """Tests for UUIDIndex class."""
+
+    def test_lookup_is_case_insensitive(self, index):
+        """Test that stored names are found under any case."""
+        index.put_many([("Alice", "a" * 32, 100), ("nobody", None, 100)])
+
+        assert index.lookup(["ALICE", "alice", "bob"]) == {}
+        index.ttl = index.missing_ttl = None
+        assert index.lookup(["ALICE", "alice", "nobody", "bob"]) == {
+            "ALICE": "a" * 32,
+            "alice": "a" * 32,
+            "nobody": None,
+        }
+
+    def test_stale_names_are_left_out(self, index, mocker):
+        """Test that resolved and missing names expire separately."""
+        index.put_many([("alice", "a" * 32, 1000), ("nobody", None, 1000)])
+        mocker.patch("bedwarsshop.uuids.time.time", return_value=1030)
+
+        assert index.lookup(["alice", "nobody"]) == {"alice": "a" * 32}
+
+    def test_later_resolution_wins(self, index):
+        """Test that an older resolution does not replace a newer one."""
+        index.ttl = None
+        index.put_many([("alice", "new", 200), ("alice", "old", 100)])
+
+        assert index.lookup(["alice"]) == {"alice": "new"}
+
+    def test_names_of_renamed_player(self, index):
+        """Test that every name of a uuid is listed, newest first."""
+        index.put_many([("old", "a" * 32, 100), ("New", "a" * 32, 200)])
+
+        assert index.names("a" * 32) == ["new", "old"]
+
+    def test_is_uuid(self):
+        """Test that uuids are told apart from player names."""
+        assert is_uuid(player_uuid("alice"))
+        assert not is_uuid("alice")
+        assert not is_uuid("g" * 32)
+
+
+class TestSeedUUIDIndex:
+    """Tests for seed_uuid_index function."""
+
+    @pytest.mark.parametrize("backend", [PlayerCache, SQLiteCache])
+    def test_moves_named_entries_to_uuids(self, index, temp_dir, backend):
+        """Test that named entries are indexed and moved to their uuid."""
+        cache = backend(temp_dir / "cache", ttl=None)
+        cache.put("OldName", player_document("oldname", uuid="a" * 32))
+        cache.put("newname", player_document("newname", "tnt", uuid="a" * 32))
+        cache.put("nobody", {"success": True, "player": None})
+        cache.put("b" * 32, player_document("bob"))
+
+        assert seed_uuid_index(index, cache) == 2
+        index.ttl = None
+        assert index.lookup(["oldname", "newname"]) == dict.fromkeys(
+            ["oldname", "newname"], "a" * 32
+        )
+        entries = dict(cache.entries())
+        assert set(entries) == {"a" * 32, "b" * 32, "nobody"}
+        assert entries["a" * 32]["favourites_2"] == "tnt"
+
+    def test_new_index_is_seeded_from_cache(self, isolated_cwd):
+        """Test that the shared index is filled when it is created."""
+        get_cache().put("alice", player_document("alice"))
+
+        assert get_uuid_index().lookup(["alice"]) == {"alice": player_uuid("alice")}
+        assert get_cache().get(player_uuid("alice")) is not None
+
+
+class TestResolveUUIDs:
+    """Tests for resolving names through the index and the Mojang API."""
+
+    def test_resolves_in_batches(self, fake_hypixel):
+        """Test that unknown names are looked up ten at a time, once."""
+        names = [f"player_{i}" for i in range(25)]
+
+        uuids = resolve_uuids(names)
+
+        assert uuids == {name: player_uuid(name) for name in names}
+        assert [len(lookup) for lookup in fake_hypixel.lookups] == [10, 10, 5]
+        assert resolve_uuids([name.upper() for name in names[:3]]) == {
+            name.upper(): player_uuid(name) for name in names[:3]
+        }
+        assert len(fake_hypixel.lookups) == 3
+
+    def test_missing_names_are_remembered(self, fake_hypixel):
+        """Test that names without an account are not looked up again."""
+        fake_hypixel.unknown = {"ghost"}
+
+        assert resolve_uuid("ghost") is None
+        assert resolve_uuid("Ghost") is None
+        assert mojang_names(fake_hypixel) == ["ghost"]
+
+    def test_lookups_can_be_disabled(self, fake_hypixel, monkeypatch):
+        """Test that only the index is used with UUID_LOOKUP_ENABLED off."""
+        monkeypatch.setattr(c, "UUID_LOOKUP_ENABLED", False)
+
+        assert resolve_uuid("alice") is None
+        assert fake_hypixel.lookups == []
+
+
+class TestFetchByUUID:
+    """Tests that players are cached and fetched once, by uuid."""
+
+    def test_case_variants_share_one_fetch(self, fake_hypixel):
+        """Test that case variants of a name are fetched once."""
+        for name in ["Alice", "alice", "ALICE"]:
+            assert get_player_data(name)["player"]["uuid"] == player_uuid("alice")
+
+        assert fake_hypixel.requests[0][1] == {"uuid": player_uuid("alice")}
+        assert len(fake_hypixel.requests) == 1
+        assert get_cache().get(player_uuid("alice")) is not None
+
+    def test_renamed_player_is_not_fetched_again(self, fake_hypixel):
+        """Test that the old and new name of a player share the cache."""
+        get_player_data("Alice")
+        fake_hypixel.uuids["newalice"] = player_uuid("alice")
+
+        assert get_player_data("NewAlice")["player"]["uuid"] == player_uuid("alice")
+        assert mojang_names(fake_hypixel) == ["alice", "newalice"]
+        assert len(fake_hypixel.requests) == 1
+        assert get_uuid_index().names(player_uuid("alice")) == ["newalice", "alice"]
+
+    def test_unresolved_names_are_fetched_by_name(self, fake_hypixel, monkeypatch):
+        """Test that a name fetched without a uuid is found by uuid later."""
+        monkeypatch.setattr(c, "UUID_LOOKUP_ENABLED", False)
+
+        get_player_data("alice")
+        get_player_data("Alice")
+
+        assert [query for _, query, _ in fake_hypixel.requests] == [{"name": "alice"}]
+        assert resolve_uuid("ALICE") == player_uuid("alice")
+
+    def test_cached_players_are_resolved_together(self, fake_hypixel):
+        """Test that a bulk cache read resolves all names in one lookup."""
+        get_cache().put(player_uuid("alice"), player_document("alice"))
+
+        players = get_cached_player_data(["Alice", "bob", "carol"])
+
+        assert list(players) == ["Alice"]
+        assert fake_hypixel.lookups == [["alice", "bob", "carol"]]
+        assert fake_hypixel.requests == []